@@ -0,0 +1,173 @@
+"""Пропускная способность приложения с разными вариантами CORS.
+
+Варианты:
+
+- none — без CORS;
+- legacy — как было: CORSMiddleware из Starlette и поверх него
+  BaseHTTPMiddleware, переписывающий заголовки (прежний
+  CORSDebugMiddleware);
+- asgi — CORSMiddleware из shared/cors.py.
+
+Приложение вызывается напрямую по ASGI, без сети и HTTP-парсера, так
+что разница между вариантами — это стоимость самого middleware.
+Гоняются обычные GET с Origin и предварительные OPTIONS-запросы.
+
+Запуск:
+    python -m benchmarks.cors --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from shared.cors import ALLOWED_ORIGINS, CORSMiddleware
+from shared.responses import ORJSONResponse
+from .db_pool import percentile
+
+ORIGIN = b"http://localhost:5173"
+
+
+class LegacyHeadersMiddleware(BaseHTTPMiddleware):
+    """Прежний отладочный слой: короткий ответ на OPTIONS и перезапись заголовков."""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method == "OPTIONS":
+            response = Response(status_code=200)
+        else:
+            response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = request.headers.get("origin", ALLOWED_ORIGINS[0])
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+        response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, Accept, Origin, X-Requested-With"
+        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range"
+        response.headers["Access-Control-Max-Age"] = "3600"
+        return response
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    @app.get("/hives/{hive_id}")
+    async def read_hive(hive_id: int):
+        return {"id": hive_id, "name": "Hive"}
+
+    if variant == "legacy":
+        app.add_middleware(
+            StarletteCORSMiddleware,
+            allow_origins=ALLOWED_ORIGINS,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+            expose_headers=["*"],
+            max_age=3600,
+        )
+        app.add_middleware(LegacyHeadersMiddleware)
+    elif variant == "asgi":
+        app.add_middleware(CORSMiddleware, allow_origins=ALLOWED_ORIGINS)
+    return app
+
+
+def make_scope(method: str) -> Dict:
+    headers = [(b"host", b"testserver"), (b"origin", ORIGIN), (b"accept", b"application/json")]
+    if method == "OPTIONS":
+        headers += [
+            (b"access-control-request-method", b"GET"),
+            (b"access-control-request-headers", b"authorization"),
+        ]
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": "/hives/1",
+        "raw_path": b"/hives/1",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+
+async def call(app: FastAPI, method: str) -> int:
+    status = 0
+    body_sent = False
+
+    async def receive():
+        # Как сервер: тело один раз, дальше ждём отключения клиента
+        nonlocal body_sent
+        if body_sent:
+            await asyncio.Event().wait()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(make_scope(method), receive, send)
+    return status
+
+
+async def measure(app: FastAPI, method: str, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started_at = time.perf_counter()
+            status = await call(app, method)
+            latencies.append(time.perf_counter() - started_at)
+            if status != 200:
+                raise AssertionError(f"{method} returned {status}")
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        "rps": round(requests / elapsed),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run(requests: int, concurrency: int) -> List[Dict]:
+    results = []
+    for variant in ("none", "legacy", "asgi"):
+        app = build_app(variant)
+        # Без CORS предварительный запрос получает 405 от роутера — не меряем
+        methods = ["GET"] if variant == "none" else ["GET", "OPTIONS"]
+        for method in methods:
+            await measure(app, method, min(requests, 1000), concurrency)  # прогрев
+            result = {"variant": variant, "method": method, **await measure(app, method, requests, concurrency)}
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Нагрузочный прогон пула соединений при разных размерах пула.
+
+Каждый из --concurrency воркеров в цикле берёт соединение и выполняет
+запрос длительностью --query-ms (pg_sleep), имитируя типичный запрос
+сервиса. Для каждого размера пула печатается пропускная способность,
+перцентили задержки и время ожидания соединения.
+
+Запуск:
+    DATABASE_URL=postgresql://... python -m benchmarks.db_pool \\
+        --pool-sizes 2,5,10,20 --concurrency 50 --query-ms 5 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from shared.config import settings
+from shared.database import SQLALCHEMY_DATABASE_URL, create_app_engine, pool_wait_stats
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def run_once(pool_size: int, max_overflow: int, concurrency: int,
+                   query_ms: float, duration: float) -> Dict[str, float]:
+    settings.DB_POOL_SIZE = pool_size
+    settings.DB_MAX_OVERFLOW = max_overflow
+    engine = create_app_engine(SQLALCHEMY_DATABASE_URL)
+    query = text("SELECT pg_sleep(:seconds)")
+    latencies: List[float] = []
+    errors = 0
+
+    # Прогрев: открываем соединения пула до замера
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    stats = pool_wait_stats["primary"]
+    stats.reset()
+
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started_at = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(query, {"seconds": query_ms / 1000})
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    await engine.dispose()
+
+    checkouts = stats.checkouts or 1
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "avg_pool_wait_ms": round(stats.wait_total / checkouts * 1000, 3),
+        "max_pool_wait_ms": round(stats.wait_max * 1000, 3),
+        "pool_timeouts": stats.timeouts,
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, float]]:
+    results = []
+    for pool_size in [int(size) for size in args.pool_sizes.split(",")]:
+        result = await run_once(
+            pool_size, args.max_overflow, args.concurrency, args.query_ms, args.duration
+        )
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", default="2,5,10,20")
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
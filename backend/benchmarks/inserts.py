@@ -0,0 +1,136 @@
+"""Сравнение вставки через add + commit + refresh и INSERT ... RETURNING.
+
+Каждая вставка — отдельная сессия, как в обработчике запроса. Для обеих
+стратегий печатаются задержка (p50/p95/p99), пропускная способность и
+число обращений к БД на вставку: SQL-запросы и управление транзакцией
+(BEGIN/COMMIT/ROLLBACK).
+
+Бенчмарк создаёт и удаляет собственную таблицу bench_inserts.
+
+Запуск:
+    DATABASE_URL=postgresql://... python -m benchmarks.inserts --count 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List
+
+from sqlalchemy import Column, Float, Integer, String, event, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+
+from shared.database import SQLALCHEMY_DATABASE_URL, TimestampMixin, create_app_engine
+from .db_pool import percentile
+
+BenchBase = declarative_base()
+
+
+class BenchRow(BenchBase, TimestampMixin):
+    __tablename__ = "bench_inserts"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+
+
+async def insert_with_refresh(sessionmaker: async_sessionmaker, i: int) -> BenchRow:
+    async with sessionmaker() as db:
+        row = BenchRow(name=f"row-{i}", value=i)
+        db.add(row)
+        await db.commit()
+        await db.refresh(row)
+        return row
+
+
+async def insert_returning(sessionmaker: async_sessionmaker, i: int) -> BenchRow:
+    async with sessionmaker() as db:
+        result = await db.execute(
+            insert(BenchRow).values(name=f"row-{i}", value=i).returning(BenchRow)
+        )
+        row = result.scalar_one()
+        await db.commit()
+        return row
+
+
+STRATEGIES = {
+    "add_commit_refresh": insert_with_refresh,
+    "insert_returning": insert_returning,
+}
+
+
+async def run(count: int, concurrency: int) -> List[Dict[str, float]]:
+    engine = create_app_engine(SQLALCHEMY_DATABASE_URL)
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    calls: Counter = Counter()
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_statement(*args) -> None:
+        calls["statements"] += 1
+
+    for name in ("begin", "commit", "rollback"):
+        event.listen(engine.sync_engine, name, lambda *args, _name=name: calls.update([_name]))
+
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+
+    results = []
+    try:
+        for strategy, insert_row in STRATEGIES.items():
+            # Прогрев пула и кэша подготовленных выражений
+            for i in range(min(50, count)):
+                await insert_row(sessionmaker, i)
+            calls.clear()
+
+            latencies: List[float] = []
+            queue = iter(range(count))
+
+            async def worker() -> None:
+                for i in queue:
+                    started_at = time.perf_counter()
+                    await insert_row(sessionmaker, i)
+                    latencies.append(time.perf_counter() - started_at)
+
+            started_at = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started_at
+
+            result = {
+                "strategy": strategy,
+                "inserts": count,
+                "concurrency": concurrency,
+                "throughput_rps": round(count / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "statements_per_insert": round(calls["statements"] / count, 2),
+                "transaction_calls_per_insert": round(
+                    (calls["begin"] + calls["commit"] + calls["rollback"]) / count, 2
+                ),
+            }
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(BenchBase.metadata.drop_all)
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.count, args.concurrency))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""Нагрузочные сценарии для четырёх сервисов.
+
+Сценарии:
+
+- ingest — поток показаний от шлюза: POST /measurements/;
+- dashboard — просмотр панели: ульи, датчики, показания, тревоги,
+  карточка улья и статистика датчика;
+- login — всплеск входов: POST /token;
+- alerts — создание тревог: POST /alerts/;
+- notifications — список уведомлений, шаблонов и настроек.
+
+Цель — либо запущенные сервисы (docker compose, адреса по умолчанию
+из README), либо приложения в этом же процессе (--in-process): запросы
+идут через httpx.ASGITransport, startup-обработчики выполняются. В обоих
+случаях нужна БД с применёнными миграциями; в режиме --in-process её
+адрес берётся из DATABASE_URL.
+
+Перед прогоном создаются пользователи с ульями, датчиками и
+настройками уведомлений. Каждый сценарий идёт --duration секунд с
+--concurrency параллельными клиентами; на сценарий печатаются
+пропускная способность, p50/p95/p99, статусы и разбивка по эндпоинтам.
+
+Ответы 429 (лимиты на вход) не входят в задержки и пропускную
+способность, а считаются отдельно в throttled: все клиенты идут с
+одного адреса, и без поднятых лимитов сценарий login мерил бы только
+отказы. --login-limits N поднимает лимиты auth до N входов в минуту
+(и такого же запаса) — в режиме --in-process через переменные
+окружения LOGIN_* до импорта приложений. Сервисам в docker compose
+эти переменные задаются при запуске auth_service.
+Результаты с хэшем коммита сохраняются в --output, а --compare
+печатает изменения относительно прошлого файла.
+
+Запуск:
+    python -m benchmarks.load --scenarios ingest,dashboard --duration 30 --output load.json
+    DATABASE_URL=postgresql://... python -m benchmarks.load --in-process --login-limits 1000000 --compare load.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .db_pool import percentile
+
+SERVICES = ("auth", "hive", "monitoring", "notification")
+DEFAULT_URLS = {
+    "auth": "http://localhost:8000",
+    "hive": "http://localhost:8001",
+    "monitoring": "http://localhost:8002",
+    "notification": "http://localhost:8003",
+}
+PASSWORD = "load-test-password"
+LOGIN_LIMIT_SETTINGS = ("LOGIN_IP_BURST", "LOGIN_IP_PER_MINUTE", "LOGIN_ACCOUNT_BURST", "LOGIN_ACCOUNT_PER_MINUTE")
+# Доля 429, при которой результат сценария не о скорости, а о лимитах
+THROTTLED_WARNING_SHARE = 0.1
+
+
+@dataclass
+class LoadUser:
+    username: str
+    token: str = ""
+    hive_ids: List[int] = field(default_factory=list)
+    # (sensor_id, hive_id)
+    sensors: List[tuple] = field(default_factory=list)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+class Recorder:
+    """Задержки и статусы запросов сценария; ответы 429 только считаются."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.by_endpoint: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.throttled = 0
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str,
+                      endpoint: str, **kwargs) -> Optional[httpx.Response]:
+        started_at = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[type(e).__name__] += 1
+            return None
+        elapsed = time.perf_counter() - started_at
+        self.statuses[response.status_code] += 1
+        if response.status_code == 429:
+            self.throttled += 1
+            return response
+        self.latencies.append(elapsed)
+        self.by_endpoint[endpoint].append(elapsed)
+        return response
+
+
+class Target:
+    """HTTP-клиенты к сервисам: по сети или к приложениям в процессе."""
+
+    def __init__(self, urls: Dict[str, str], in_process: bool):
+        self.urls = urls
+        self.in_process = in_process
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self._stack = AsyncExitStack()
+
+    async def __aenter__(self) -> "Target":
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        for name in SERVICES:
+            if self.in_process:
+                app = _load_app(name)
+                # Lifespan сервиса: фоновые задачи, шина инвалидации
+                await self._stack.enter_async_context(app.router.lifespan_context(app))
+                client = httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app), base_url=f"http://{name}", timeout=30
+                )
+            else:
+                client = httpx.AsyncClient(base_url=self.urls[name], limits=limits, timeout=30)
+            self.clients[name] = await self._stack.enter_async_context(client)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._stack.aclose()
+
+
+def _load_app(name: str):
+    return importlib.import_module(f"services.{name}.main").app
+
+
+async def _login(auth: httpx.AsyncClient, username: str) -> str:
+    # Лимиты на вход действуют и при подготовке: ждём, сколько просят
+    while True:
+        response = await auth.post("/token", data={"username": username, "password": PASSWORD})
+        if response.status_code != 429:
+            response.raise_for_status()
+            return response.json()["access_token"]
+        await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+
+
+async def prepare(target: Target, users: int, sensors_per_user: int) -> List[LoadUser]:
+    """Пользователи с ульем, датчиками и настройками уведомлений."""
+    auth, hive, monitoring, notification = (target.clients[name] for name in SERVICES)
+    run_id = uuid.uuid4().hex[:8]
+    prepared = []
+    for i in range(users):
+        user = LoadUser(username=f"load_{run_id}_{i}")
+        response = await auth.post("/users/", json={
+            "username": user.username,
+            "email": f"{user.username}@example.com",
+            "password": PASSWORD,
+        })
+        response.raise_for_status()
+        user.token = await _login(auth, user.username)
+
+        response = await hive.post("/hives/", headers=user.headers, json={
+            "name": f"Load hive {i}",
+            "location": "Load test apiary",
+            "queen_year": 2024,
+            "frames_count": 10,
+            "latitude": 55.0 + i / 1000,
+            "longitude": 37.0 + i / 1000,
+        })
+        response.raise_for_status()
+        hive_id = response.json()["id"]
+        user.hive_ids.append(hive_id)
+
+        for j in range(sensors_per_user):
+            response = await monitoring.post("/sensors/", headers=user.headers, json={
+                "name": f"Sensor {j}",
+                "sensor_type": random.choice(["temperature", "humidity", "weight"]),
+                "hive_id": hive_id,
+            })
+            response.raise_for_status()
+            user.sensors.append((response.json()["id"], hive_id))
+
+        response = await notification.post("/settings/", headers=user.headers, json={})
+        response.raise_for_status()
+        prepared.append(user)
+    return prepared
+
+
+Step = Callable[[Target, LoadUser, Recorder], Awaitable[None]]
+
+
+async def ingest_step(target: Target, user: LoadUser, recorder: Recorder) -> None:
+    sensor_id, _ = random.choice(user.sensors)
+    await recorder.request(target.clients["monitoring"], "POST", "/measurements/", "POST /measurements/",
+                           headers=user.headers, json={
+                               "sensor_id": sensor_id,
+                               "value": round(random.uniform(15, 40), 2),
+                               "battery_level": round(random.uniform(20, 100), 1),
+                           })
+
+
+async def dashboard_step(target: Target, user: LoadUser, recorder: Recorder) -> None:
+    hive, monitoring = target.clients["hive"], target.clients["monitoring"]
+    hive_id = user.hive_ids[0]
+    sensor_id, _ = random.choice(user.sensors)
+    headers = user.headers
+    await recorder.request(hive, "GET", "/hives/", "GET /hives/", headers=headers)
+    await recorder.request(hive, "GET", f"/hives/{hive_id}", "GET /hives/{hive_id}", headers=headers)
+    await recorder.request(monitoring, "GET", "/sensors/", "GET /sensors/", headers=headers)
+    await recorder.request(monitoring, "GET", "/measurements/", "GET /measurements/",
+                           headers=headers, params={"limit": 100})
+    await recorder.request(monitoring, "GET", f"/sensors/{sensor_id}/stats/", "GET /sensors/{id}/stats/",
+                           headers=headers)
+    await recorder.request(monitoring, "GET", "/alerts/", "GET /alerts/", headers=headers)
+
+
+async def login_step(target: Target, user: LoadUser, recorder: Recorder) -> None:
+    await recorder.request(target.clients["auth"], "POST", "/token", "POST /token",
+                           data={"username": user.username, "password": PASSWORD})
+
+
+async def alerts_step(target: Target, user: LoadUser, recorder: Recorder) -> None:
+    sensor_id, hive_id = random.choice(user.sensors)
+    await recorder.request(target.clients["monitoring"], "POST", "/alerts/", "POST /alerts/",
+                           headers=user.headers, json={
+                               "alert_type": "temperature",
+                               "message": "Temperature out of range",
+                               "sensor_id": sensor_id,
+                               "hive_id": hive_id,
+                           })
+
+
+async def notifications_step(target: Target, user: LoadUser, recorder: Recorder) -> None:
+    notification = target.clients["notification"]
+    headers = user.headers
+    await recorder.request(notification, "GET", "/notifications/", "GET /notifications/", headers=headers)
+    await recorder.request(notification, "GET", "/templates/", "GET /templates/", headers=headers)
+    await recorder.request(notification, "GET", "/settings/me/", "GET /settings/me/", headers=headers)
+
+
+SCENARIOS: Dict[str, Step] = {
+    "ingest": ingest_step,
+    "dashboard": dashboard_step,
+    "login": login_step,
+    "alerts": alerts_step,
+    "notifications": notifications_step,
+}
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_scenario(target: Target, users: List[LoadUser], name: str,
+                       concurrency: int, duration: float) -> Dict:
+    step = SCENARIOS[name]
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(worker: int) -> None:
+        user = users[worker % len(users)]
+        while time.perf_counter() < deadline:
+            await step(target, user, recorder)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+
+    answered = len(recorder.latencies) + recorder.throttled
+    if answered and recorder.throttled / answered >= THROTTLED_WARNING_SHARE:
+        print(f"warning: {name}: {recorder.throttled} of {answered} responses throttled (429), "
+              f"raise the login limits (--login-limits or LOGIN_* on auth_service)", file=sys.stderr)
+    failed = sum(n for code, n in recorder.statuses.items() if code >= 500) + sum(recorder.errors.values())
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(recorder.latencies) / elapsed, 1),
+        **_summary(recorder.latencies),
+        "throttled": recorder.throttled,
+        "failed": failed,
+        "statuses": {str(code): n for code, n in sorted(recorder.statuses.items())},
+        "errors": dict(recorder.errors),
+        "endpoints": {endpoint: _summary(values) for endpoint, values in recorder.by_endpoint.items()},
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous: Dict, current: Dict) -> None:
+    """Изменение пропускной способности и p95 по сценариям."""
+    before = {result["scenario"]: result for result in previous["scenarios"]}
+    print(f"compare {previous['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    for result in current["scenarios"]:
+        old = before.get(result["scenario"])
+        if old is None:
+            continue
+        changes = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if old[key]:
+                changes.append(f"{key} {old[key]} -> {result[key]} ({(result[key] / old[key] - 1) * 100:+.1f}%)")
+        print(f"  {result['scenario']}: " + ", ".join(changes))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    urls = {name: getattr(args, f"{name}_url") for name in SERVICES}
+    async with Target(urls, args.in_process) as target:
+        users = await prepare(target, args.users, args.sensors)
+        results = []
+        for name in args.scenarios:
+            result = await run_scenario(target, users, name, args.concurrency, args.duration)
+            print(json.dumps({k: v for k, v in result.items() if k != "endpoints"}))
+            results.append(result)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.utcnow().isoformat(),
+            "target": "in-process" if args.in_process else urls,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "users": args.users,
+            "login_limits": args.login_limits,
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Через запятую: " + ", ".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=20, help="Секунд на сценарий")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--sensors", type=int, default=5, help="Датчиков на пользователя")
+    parser.add_argument("--in-process", action="store_true", help="Приложения в этом процессе через ASGI")
+    parser.add_argument("--login-limits", type=int,
+                        help="Лимит входов в минуту и запас для auth (только с --in-process; "
+                             "для docker compose задайте LOGIN_* у auth_service)")
+    for name in SERVICES:
+        parser.add_argument(f"--{name}-url", default=DEFAULT_URLS[name])
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.login_limits is not None:
+        if not args.in_process:
+            parser.error("--login-limits needs --in-process; set LOGIN_* on auth_service for docker compose")
+        # Лимитер auth создаётся при импорте services.auth.main
+        for name in LOGIN_LIMIT_SETTINGS:
+            os.environ[name] = str(args.login_limits)
+    # Прошлый прогон читаем до записи: --output может указывать на тот же файл
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if previous is not None:
+        compare(previous, report)
+
+
+if __name__ == "__main__":
+    main()
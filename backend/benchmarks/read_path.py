@@ -0,0 +1,136 @@
+"""Чтение большого списка показаний: ORM-объекты против строк Core.
+
+- orm — select(Model) в сессии, ORM-объекты с identity map, затем
+  list_response (валидация pydantic и сериализация);
+- core_rows — только нужные колонки на соединении без сессии, строки
+  Core сразу в JSON через rows_response.
+
+Для каждого варианта печатаются задержка (p50), процессорное время и
+пик памяти Python (tracemalloc) на один ответ. Сравниваются и сами
+ответы — они должны совпадать байт в байт.
+
+Бенчмарк создаёт и удаляет собственную таблицу bench_measurements.
+
+Запуск:
+    DATABASE_URL=postgresql://... python -m benchmarks.read_path --rows 100000
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import Column, Float, Integer, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from starlette.responses import Response
+
+from services.monitoring import schemas
+from shared.database import SQLALCHEMY_DATABASE_URL, TimestampMixin, create_app_engine
+from shared.responses import list_response, rows_response
+from .db_pool import percentile
+
+BenchBase = declarative_base()
+
+
+class BenchMeasurement(BenchBase, TimestampMixin):
+    __tablename__ = "bench_measurements"
+
+    id = Column(Integer, primary_key=True)
+    sensor_id = Column(Integer, nullable=False)
+    value = Column(Float)
+    battery_level = Column(Float)
+
+
+COLUMNS = [BenchMeasurement.__table__.c[name] for name in schemas.MeasurementResponse.model_fields]
+
+
+async def read_orm(engine: AsyncEngine, limit: int) -> Response:
+    sessionmaker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessionmaker() as db:
+        result = await db.execute(select(BenchMeasurement).order_by(BenchMeasurement.id).limit(limit))
+        return list_response(schemas.MeasurementResponse, result.scalars().all())
+
+
+async def read_core_rows(engine: AsyncEngine, limit: int) -> Response:
+    async with engine.connect() as conn:
+        result = await conn.execute(select(*COLUMNS).order_by(BenchMeasurement.id).limit(limit))
+        return rows_response(result.all())
+
+
+STRATEGIES: Dict[str, Callable[[AsyncEngine, int], Awaitable[Response]]] = {
+    "orm": read_orm,
+    "core_rows": read_core_rows,
+}
+
+
+async def run(rows: int, repeat: int) -> List[Dict[str, float]]:
+    engine = create_app_engine(SQLALCHEMY_DATABASE_URL)
+    async with engine.begin() as conn:
+        await conn.run_sync(BenchBase.metadata.drop_all)
+        await conn.run_sync(BenchBase.metadata.create_all)
+        await conn.execute(
+            text(
+                "INSERT INTO bench_measurements (sensor_id, value, battery_level, created_at)"
+                " SELECT i % 50, 20 + (i % 100) / 10.0, 100 - (i % 1000) / 10.0,"
+                " now() - make_interval(secs => i)"
+                " FROM generate_series(1, :rows) AS i"
+            ),
+            {"rows": rows},
+        )
+
+    results = []
+    expected = None
+    try:
+        for strategy, read in STRATEGIES.items():
+            await read(engine, rows)  # прогрев
+            latencies: List[float] = []
+            cpu_times: List[float] = []
+            peaks: List[int] = []
+            for _ in range(repeat):
+                tracemalloc.start()
+                started_at, cpu_started_at = time.perf_counter(), time.process_time()
+                response = await read(engine, rows)
+                latencies.append(time.perf_counter() - started_at)
+                cpu_times.append(time.process_time() - cpu_started_at)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            if expected is None:
+                expected = response.body
+            elif response.body != expected:
+                raise AssertionError(f"{strategy} returned a different payload")
+
+            result = {
+                "strategy": strategy,
+                "rows": rows,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "cpu_ms": round(percentile(cpu_times, 50) * 1000, 1),
+                "peak_mb": round(percentile(peaks, 50) / 2**20, 1),
+                "bytes": len(response.body),
+            }
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(BenchBase.metadata.drop_all)
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.rows, args.repeat))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Сериализация списка показаний: путь FastAPI по умолчанию и list_response.
+
+Сравниваются три варианта ответа со списком MeasurementResponse из
+ORM-объектов:
+
+- stdlib_json — как было: model_validate на каждый объект, затем
+  response_model (повторная валидация и преобразование в dict) и
+  JSONResponse со стандартным json;
+- orjson_default — то же, но с ORJSONResponse по умолчанию;
+- list_response — одна валидация через TypeAdapter и сериализация
+  сразу в байты (shared/responses.py).
+
+БД не нужна: ORM-объекты создаются в памяти.
+
+Запуск:
+    python -m benchmarks.serialization --count 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import Response
+
+from services.monitoring import models, schemas
+from shared.responses import ORJSONResponse, list_response
+from .db_pool import percentile
+
+RESPONSE_FIELD = create_response_field(name="response", type_=List[schemas.MeasurementResponse])
+
+# serialize_response асинхронная; один цикл на весь прогон, чтобы не
+# мерить создание event loop
+loop = asyncio.new_event_loop()
+
+
+def make_measurements(count: int) -> List[models.Measurement]:
+    started_at = datetime(2024, 5, 1)
+    return [
+        models.Measurement(
+            id=i,
+            sensor_id=i % 50,
+            value=20 + (i % 100) / 10,
+            battery_level=100 - (i % 1000) / 10,
+            created_at=started_at + timedelta(seconds=i),
+            updated_at=None,
+        )
+        for i in range(count)
+    ]
+
+
+def fastapi_default(response_class: type) -> Callable[[list], Response]:
+    """Путь обычного эндпоинта с response_model."""
+    def render(objs: list) -> Response:
+        content = [schemas.MeasurementResponse.model_validate(m) for m in objs]
+        serialized = loop.run_until_complete(
+            serialize_response(field=RESPONSE_FIELD, response_content=content)
+        )
+        return response_class(serialized)
+
+    return render
+
+
+STRATEGIES = {
+    "stdlib_json": fastapi_default(JSONResponse),
+    "orjson_default": fastapi_default(ORJSONResponse),
+    "list_response": lambda objs: list_response(schemas.MeasurementResponse, objs),
+}
+
+
+def run(count: int, repeat: int) -> List[Dict[str, float]]:
+    objs = make_measurements(count)
+    expected = None
+    results = []
+    for strategy, render in STRATEGIES.items():
+        render(objs)  # прогрев
+        timings: List[float] = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            response = render(objs)
+            timings.append(time.perf_counter() - started_at)
+
+        # Все варианты должны отдавать одинаковые данные
+        body = json.loads(response.body)
+        if expected is None:
+            expected = body
+        elif body != expected:
+            raise AssertionError(f"{strategy} returned a different payload")
+
+        result = {
+            "strategy": strategy,
+            "items": count,
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p95_ms": round(percentile(timings, 95) * 1000, 3),
+            "bytes": len(response.body),
+        }
+        print(json.dumps(result))
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Сохранить результаты в JSON-файл")
+    args = parser.parse_args()
+
+    results = run(args.count, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ from services.auth.models import User
 from services.hive.models import Hive, Inspection
 from services.monitoring.models import Sensor, Measurement, Alert
 from services.notification.models import NotificationTemplate, NotificationSettings, Notification
+from shared.auth import TokenRevocation
+from shared.deletion import DeletionJob
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
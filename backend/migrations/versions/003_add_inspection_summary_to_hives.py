@@ -0,0 +1,61 @@
+"""add denormalized inspection summary to hives
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('hives', sa.Column('last_inspection_at', sa.DateTime(), nullable=True))
+    op.add_column('hives', sa.Column('last_inspection_status', sa.String(), nullable=True))
+    op.add_column('hives', sa.Column('inspection_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('hives', sa.Column('avg_temperature', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('avg_humidity', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('avg_weight', sa.Float(), nullable=True))
+    op.create_index('ix_inspections_hive_id_created_at', 'inspections', ['hive_id', 'created_at'], unique=False)
+
+    # Заполняем сводку для уже существующих осмотров
+    op.execute("""
+        UPDATE hives SET
+            inspection_count = s.inspection_count,
+            avg_temperature = s.avg_temperature,
+            avg_humidity = s.avg_humidity,
+            avg_weight = s.avg_weight,
+            last_inspection_at = s.last_inspection_at,
+            last_inspection_status = (
+                SELECT i.status FROM inspections i
+                WHERE i.hive_id = hives.id
+                ORDER BY i.created_at DESC, i.id DESC
+                LIMIT 1
+            )
+        FROM (
+            SELECT hive_id,
+                   count(id) AS inspection_count,
+                   avg(temperature) AS avg_temperature,
+                   avg(humidity) AS avg_humidity,
+                   avg(weight) AS avg_weight,
+                   max(created_at) AS last_inspection_at
+            FROM inspections
+            GROUP BY hive_id
+        ) AS s
+        WHERE hives.id = s.hive_id
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_inspections_hive_id_created_at', table_name='inspections')
+    op.drop_column('hives', 'avg_weight')
+    op.drop_column('hives', 'avg_humidity')
+    op.drop_column('hives', 'avg_temperature')
+    op.drop_column('hives', 'inspection_count')
+    op.drop_column('hives', 'last_inspection_status')
+    op.drop_column('hives', 'last_inspection_at')
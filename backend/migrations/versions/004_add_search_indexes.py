@@ -0,0 +1,45 @@
+"""add trigram and full-text search indexes for hives and inspections
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_index(op.f('ix_hives_user_id'), 'hives', ['user_id'], unique=False)
+    op.create_index(
+        'ix_hives_name_trgm', 'hives', ['name'],
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_hives_location_trgm', 'hives', ['location'],
+        postgresql_using='gin', postgresql_ops={'location': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_hives_description_trgm', 'hives', ['description'],
+        postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'},
+    )
+    op.create_index(
+        'ix_inspections_notes_tsv', 'inspections',
+        [sa.text("to_tsvector('simple', notes)")],
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    op.drop_index('ix_inspections_notes_tsv', table_name='inspections')
+    op.drop_index('ix_hives_description_trgm', table_name='hives')
+    op.drop_index('ix_hives_location_trgm', table_name='hives')
+    op.drop_index('ix_hives_name_trgm', table_name='hives')
+    op.drop_index(op.f('ix_hives_user_id'), table_name='hives')
@@ -0,0 +1,33 @@
+"""add coordinates and geohash grid cell to hives
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('hives', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('geohash', sa.String(length=9), nullable=True))
+    op.create_index(
+        'ix_hives_geohash', 'hives', ['geohash'],
+        postgresql_ops={'geohash': 'varchar_pattern_ops'},
+    )
+    op.create_index('ix_hives_latitude_longitude', 'hives', ['latitude', 'longitude'])
+
+
+def downgrade():
+    op.drop_index('ix_hives_latitude_longitude', table_name='hives')
+    op.drop_index('ix_hives_geohash', table_name='hives')
+    op.drop_column('hives', 'geohash')
+    op.drop_column('hives', 'longitude')
+    op.drop_column('hives', 'latitude')
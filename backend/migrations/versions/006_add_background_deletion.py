@@ -0,0 +1,58 @@
+"""add deletion jobs and deleting flags for background cascade deletion
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('hives', sa.Column('deleting', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.add_column('sensors', sa.Column('deleting', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    op.create_table(
+        'deletion_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('current_step', sa.String(), nullable=True),
+        sa.Column('deleted_rows', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error_message', sa.String(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_deletion_jobs_id'), 'deletion_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_deletion_jobs_status'), 'deletion_jobs', ['status'], unique=False)
+
+    # Индексы для пакетного удаления по внешним ключам
+    op.create_index('ix_measurements_sensor_id_created_at', 'measurements', ['sensor_id', 'created_at'], unique=False)
+    op.create_index('ix_alerts_sensor_id', 'alerts', ['sensor_id'], unique=False)
+    op.create_index('ix_alerts_hive_id', 'alerts', ['hive_id'], unique=False)
+    op.create_index('ix_sensors_hive_id', 'sensors', ['hive_id'], unique=False)
+    op.create_index(op.f('ix_sensors_user_id'), 'sensors', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_sensors_user_id'), table_name='sensors')
+    op.drop_index('ix_sensors_hive_id', table_name='sensors')
+    op.drop_index('ix_alerts_hive_id', table_name='alerts')
+    op.drop_index('ix_alerts_sensor_id', table_name='alerts')
+    op.drop_index('ix_measurements_sensor_id_created_at', table_name='measurements')
+    op.drop_index(op.f('ix_deletion_jobs_status'), table_name='deletion_jobs')
+    op.drop_index(op.f('ix_deletion_jobs_id'), table_name='deletion_jobs')
+    op.drop_table('deletion_jobs')
+    op.drop_column('sensors', 'deleting')
+    op.drop_column('hives', 'deleting')
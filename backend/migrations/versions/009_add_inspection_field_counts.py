@@ -0,0 +1,50 @@
+"""add per-field non-null inspection counts to hives
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+FIELDS = ('temperature', 'humidity', 'weight')
+
+
+def upgrade():
+    for field in FIELDS:
+        op.add_column('hives', sa.Column(f'{field}_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Знаменатели средних — только непустые значения, как у avg().
+    # Средние пересчитываются заново: прежняя формула учитывала пустые как нули
+    op.execute("""
+        UPDATE hives SET
+            temperature_count = s.temperature_count,
+            humidity_count = s.humidity_count,
+            weight_count = s.weight_count,
+            avg_temperature = s.avg_temperature,
+            avg_humidity = s.avg_humidity,
+            avg_weight = s.avg_weight
+        FROM (
+            SELECT hive_id,
+                   count(temperature) AS temperature_count,
+                   count(humidity) AS humidity_count,
+                   count(weight) AS weight_count,
+                   avg(temperature) AS avg_temperature,
+                   avg(humidity) AS avg_humidity,
+                   avg(weight) AS avg_weight
+            FROM inspections
+            GROUP BY hive_id
+        ) AS s
+        WHERE hives.id = s.hive_id
+    """)
+
+
+def downgrade():
+    for field in reversed(FIELDS):
+        op.drop_column('hives', f'{field}_count')
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,22 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-for-jwt"  # В продакшене должен быть безопасный ключ
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # Как часто сервисы перечитывают список отозванных токенов
+    REVOCATION_REFRESH_SECONDS: int = 15
+    # Кэш пользователей по токену: сколько секунд доверять снимку без похода в БД
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAXSIZE: int = 10000
+    # Пул потоков для bcrypt: число потоков и максимум ожидающих операций
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Общие для всех воркеров лимиты входа; без Redis — в памяти процесса
+    REDIS_URL: Optional[str] = None
+    # Token bucket на вход: размер корзины и пополнение в минуту
+    LOGIN_IP_BURST: int = 20
+    LOGIN_IP_PER_MINUTE: int = 30
+    LOGIN_ACCOUNT_BURST: int = 5
+    LOGIN_ACCOUNT_PER_MINUTE: int = 5
 
 
 settings = Settings() 
\ No newline at end of file
@@ -29,7 +29,7 @@ def setup_cors(app):
         ])
         # НЕ используем "*" для избежания CORS проблем с credentials
     
-    logger.info(f"🔧 Auth Service: Setting up CORS with origins: {allowed_origins}")
+    logger.info("Setting up CORS with origins: %s", allowed_origins)
     
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+
+class PasswordHashingBusy(Exception):
+    """Очередь на хеширование переполнена — запрос нужно повторить позже."""
+
+
+class PasswordHasher:
+    """bcrypt в отдельном ограниченном пуле потоков.
+
+    Хеширование не блокирует event loop, а число ожидающих операций
+    ограничено max_pending: при всплеске логинов лишние запросы сразу
+    получают отказ, вместо того чтобы копиться и тормозить остальные.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int, max_pending: int):
+        self._context = context
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise PasswordHashingBusy()
+
+        self._pending += 1
+        queued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            return fn(*args), started_at, time.perf_counter()
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+
+        wait = started_at - queued_at
+        self._completed += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        self._run_total += finished_at - started_at
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self._context.verify, password, hashed_password)
+
+    def stats(self) -> Dict[str, float]:
+        completed = self._completed or 1
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._wait_total / completed * 1000, 3),
+            "max_wait_ms": round(self._wait_max * 1000, 3),
+            "avg_run_ms": round(self._run_total / completed * 1000, 3),
+        }
@@ -1,23 +1,77 @@
+import logging
 from datetime import timedelta
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db
+from shared.lifecycle import setup_lifecycle
+from shared.log import setup_logging
+from shared.metrics import setup_metrics
+from shared.profiler import setup_query_profiler
+from shared.ratelimit import RateLimiter, retry_after_header
+from shared.responses import ORJSONResponse, list_response, model_response
 from . import schemas
-from .service import UserService
+from .service import SessionService, UserService, password_hasher
+from .hashing import PasswordHashingBusy
 from .config import settings
 from .cors import setup_cors
 from . import models
 
-app = FastAPI(title="Auth Service", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(default_response_class=ORJSONResponse, title="Auth Service", version="1.0.0")
+
+# Настраиваем логирование
+setup_logging(app, "auth")
+
+# Метрики Prometheus: GET /metrics
+setup_metrics(app)
+
+# Профилировщик SQL, если включён SQL_PROFILER_ENABLED
+setup_query_profiler(app)
 
 # Настраиваем CORS
 setup_cors(app)
 
+# Фоновые задачи и /metrics/*; отозванные токены auth проверяет по своей БД
+setup_lifecycle(app, revocations=False)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 user_service = UserService()
+session_service = SessionService()
+
+# Лимиты проверяются до поиска пользователя и bcrypt, так что перебор
+# паролей отсекается без нагрузки на БД и пул хеширования
+login_limiter = RateLimiter(settings.REDIS_URL, prefix="auth:login")
+login_limiter.add_bucket("ip", settings.LOGIN_IP_BURST, settings.LOGIN_IP_PER_MINUTE)
+login_limiter.add_bucket("account", settings.LOGIN_ACCOUNT_BURST, settings.LOGIN_ACCOUNT_PER_MINUTE)
+
+
+async def enforce_login_limits(request: Request, login: str) -> None:
+    checks = [("account", login.strip().lower())]
+    if request.client is not None:
+        checks.insert(0, ("ip", request.client.host))
+    for bucket, key in checks:
+        allowed, retry_after = await login_limiter.take(bucket, key)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts, please retry later",
+                headers={"Retry-After": retry_after_header(retry_after)},
+            )
+
+
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy) -> JSONResponse:
+    # Пул bcrypt перегружен — просим клиента повторить, не блокируя остальных
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication is temporarily overloaded, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/health")
@@ -26,25 +80,28 @@ async def health() -> dict:
     return {"status": "healthy", "service": "auth"}
 
 
-@app.post("/token")
-async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: AsyncSession = Depends(get_db)
-):
-    user = await user_service.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+@app.get("/metrics/password-hashing")
+async def password_hashing_metrics() -> dict:
+    """Состояние пула хеширования паролей"""
+    return password_hasher.stats()
+
+
+@app.get("/metrics/login-throttling")
+async def login_throttling_metrics() -> dict:
+    """Счётчики лимитов на вход"""
+    return login_limiter.stats()
+
+
+def issue_tokens(user: models.User, refresh_token: str) -> dict:
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = user_service.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=user_service.token_claims(user), expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": int(access_token_expires.total_seconds()),
         "user": {
             "id": user.id,
             "email": user.email,
@@ -55,11 +112,55 @@ async def login_for_access_token(
     }
 
 
+@app.post("/token")
+async def login_for_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_db)
+):
+    await enforce_login_limits(request, form_data.username)
+    user = await user_service.authenticate_user(db, form_data.username, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    refresh_token = await session_service.create_session(
+        db, user.id, user_agent=request.headers.get("user-agent")
+    )
+    return issue_tokens(user, refresh_token)
+
+
+@app.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(
+    body: schemas.RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Новая пара токенов по refresh-токену, без проверки пароля"""
+    rotated = await session_service.rotate(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = rotated
+    return issue_tokens(user, refresh_token)
+
+
+@app.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    body: schemas.RefreshRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    await session_service.revoke_by_token(db, body.refresh_token)
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> models.User:
-    print("Getting current user with token:", token)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -67,13 +168,13 @@ async def get_current_user(
     )
     try:
         user = await user_service.get_current_user(db, token)
-        print("Found user:", user)
         if user is None:
-            print("User is None, raising exception")
             raise credentials_exception
         return user
-    except Exception as e:
-        print("Error in get_current_user:", str(e))
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error in get_current_user")
         raise credentials_exception
 
 
@@ -102,28 +203,22 @@ async def create_user(
             status_code=400,
             detail="Username already registered"
         )
-    return await user_service.create_user(db=db, user=user)
+    db_user = await user_service.create_user(db=db, user=user)
+    return model_response(schemas.User, db_user)
 
 
 @app.get("/users/me", response_model=schemas.User)
 async def read_users_me(
     current_user: models.User = Depends(get_current_user)
 ):
-    print("Current user:", current_user)
-    return schemas.User(
-        id=current_user.id,
-        email=current_user.email,
-        username=current_user.username,
-        is_active=current_user.is_active,
-        is_superuser=current_user.is_superuser
-    )
+    return model_response(schemas.User, current_user)
 
 
 @app.get("/users/", response_model=List[schemas.User])
 async def read_users(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: schemas.User = Depends(get_current_active_user)
 ):
     if not current_user.is_superuser:
@@ -131,7 +226,8 @@ async def read_users(
             status_code=403,
             detail="Not enough permissions"
         )
-    return await user_service.get_all(db, skip=skip, limit=limit)
+    users = await user_service.get_all(db, skip=skip, limit=limit)
+    return list_response(schemas.User, users)
 
 
 @app.get("/users/{user_id}", response_model=schemas.User)
@@ -148,7 +244,7 @@ async def read_user(
     db_user = await user_service.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return model_response(schemas.User, db_user)
 
 
 @app.put("/users/{user_id}", response_model=schemas.User)
@@ -166,15 +262,17 @@ async def update_user(
     db_user = await user_service.update_user(db, user_id, user_update)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+    return model_response(schemas.User, db_user)
 
 
 @app.post("/change-password")
 async def change_password(
+    request: Request,
     password_data: schemas.PasswordChange,
     current_user: schemas.User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
+    await enforce_login_limits(request, current_user.username)
     user = await user_service.authenticate_user(
         db, current_user.username, password_data.current_password
     )
@@ -189,4 +287,23 @@ async def change_password(
         current_user.id,
         schemas.UserUpdate(password=password_data.new_password)
     )
-    return {"message": "Password changed successfully"}
\ No newline at end of file
+    return {"message": "Password changed successfully"}
+
+
+@app.get("/sessions", response_model=List[schemas.SessionInfo])
+async def read_sessions(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    sessions = await session_service.get_active_sessions(db, current_user.id)
+    return list_response(schemas.SessionInfo, sessions)
+
+
+@app.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_session(
+    session_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: schemas.User = Depends(get_current_active_user)
+):
+    if not await session_service.revoke(db, current_user.id, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
 from shared.database import Base, TimestampMixin
 
 
@@ -10,4 +10,16 @@ class User(Base, TimestampMixin):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
-    is_superuser = Column(Boolean, default=False) 
\ No newline at end of file
+    is_superuser = Column(Boolean, default=False)
+
+
+class UserSession(Base, TimestampMixin):
+    """Сессия с refresh-токеном. Хранится только HMAC секрета токена."""
+    __tablename__ = "user_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+    user_agent = Column(String, nullable=True)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel, EmailStr, Field
 from shared.base_models import BaseSchema
@@ -25,9 +26,23 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
     user: User
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class SessionInfo(BaseSchema):
+    id: int
+    user_agent: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    expires_at: datetime
+
+
 class TokenData(BaseModel):
     username: Optional[str] = None 
     
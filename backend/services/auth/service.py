@@ -1,18 +1,70 @@
-from typing import Optional
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy import select
+from sqlalchemy import or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
+from shared.auth import revoke_user_tokens
+from shared.invalidation import bus
+from shared.lru import TTLCache
 from shared.service import BaseService
 from . import models, schemas
 from .config import settings
+from .hashing import PasswordHasher
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 logger = logging.getLogger(__name__)
 
+# Кэш снимков пользователей по токену, общий для всех экземпляров UserService.
+# Значение — (снимок, поколение пользователя на момент кэширования).
+_user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+# Поколение пользователя увеличивается при изменении, что делает
+# недействительными все закэшированные для него токены.
+_user_generations: Dict[int, int] = {}
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    """Сбрасывает закэшированные снимки пользователя во всех процессах."""
+    _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+    bus.publish([f"user:{user_id}"])
+
+
+def _on_remote_invalidation(tags: List[str]) -> None:
+    for tag in tags:
+        kind, _, user_id = tag.partition(":")
+        if kind == "user" and user_id.isdigit():
+            _user_generations[int(user_id)] = _user_generations.get(int(user_id), 0) + 1
+
+
+bus.add_handler(_on_remote_invalidation, _user_cache.clear)
+
+
+def _refresh_token_hash(secret: str) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), secret.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def _parse_refresh_token(token: str) -> Optional[Tuple[int, str]]:
+    """Refresh-токен имеет вид "<id сессии>.<секрет>"."""
+    session_id, _, secret = token.partition(".")
+    if not session_id.isdigit() or not secret:
+        return None
+    return int(session_id), secret
+
 
 class UserService(BaseService[models.User]):
     def __init__(self):
@@ -31,25 +83,37 @@ class UserService(BaseService[models.User]):
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_user_by_login(self, db: AsyncSession, login: str) -> Optional[models.User]:
+        """Пользователь по username или email одним запросом.
+
+        Если логин совпал с username одного пользователя и email другого,
+        приоритет у username — как и при прежнем поиске в два запроса.
+        """
+        query = (
+            select(self.model)
+            .filter(or_(self.model.username == login, self.model.email == login))
+            .order_by((self.model.username == login).desc())
+            .limit(1)
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
     async def create_user(self, db: AsyncSession, user: schemas.UserCreate) -> models.User:
-        hashed_password = self.get_password_hash(user.password)
-        db_user = models.User(
+        hashed_password = await self.get_password_hash(user.password)
+        return await self.create(
+            db,
             email=user.email,
             username=user.username,
             hashed_password=hashed_password,
             is_active=True,
             is_superuser=False
         )
-        db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
-        return db_user
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await password_hasher.verify(plain_password, hashed_password)
 
-    def get_password_hash(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def get_password_hash(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
     async def authenticate_user(
         self, db: AsyncSession, username: str, password: str
@@ -65,31 +129,32 @@ class UserService(BaseService[models.User]):
         Returns:
             Пользователь если аутентификация успешна, иначе None
         """
-        logger.info(f"🔐 Attempting to authenticate user: {username}")
-        
-        # Сначала пытаемся найти по username
-        user = await self.get_user_by_username(db, username)
-        
-        # Если не нашли по username, пытаемся найти по email
-        if not user:
-            logger.info(f"👤 User not found by username, trying email: {username}")
-            user = await self.get_user_by_email(db, username)
-        
+        user = await self.get_user_by_login(db, username)
         if not user:
-            logger.warning(f"❌ User not found: {username}")
+            logger.info("Login failed: unknown user %s", username)
             return None
-            
-        if not self.verify_password(password, user.hashed_password):
-            logger.warning(f"❌ Invalid password for user: {username}")
+
+        if not await self.verify_password(password, user.hashed_password):
+            logger.info("Login failed: invalid password for %s", username)
             return None
-            
+
         if not user.is_active:
-            logger.warning(f"❌ User is not active: {username}")
+            logger.info("Login failed: inactive user %s", username)
             return None
-            
-        logger.info(f"✅ User authenticated successfully: {user.username} (ID: {user.id})")
+
+        logger.info("User authenticated: %s (ID: %s)", user.username, user.id)
         return user
 
+    def token_claims(self, user: models.User) -> dict:
+        """Подписанные claims, по которым другие сервисы узнают пользователя без БД."""
+        return {
+            "sub": user.username,
+            "uid": user.id,
+            "email": user.email,
+            "active": user.is_active,
+            "su": user.is_superuser,
+        }
+
     def create_access_token(
         self, data: dict, expires_delta: Optional[timedelta] = None
     ) -> str:
@@ -98,7 +163,8 @@ class UserService(BaseService[models.User]):
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"exp": expire})
+        # Дробный iat, чтобы токен, выпущенный сразу после отзыва, не считался отозванным
+        to_encode.update({"exp": expire, "iat": time.time()})
         encoded_jwt = jwt.encode(
             to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
         )
@@ -108,7 +174,20 @@ class UserService(BaseService[models.User]):
         self,
         db: AsyncSession,
         token: str,
-    ) -> Optional[models.User]:
+    ) -> Optional[schemas.User]:
+        """Пользователь по токену.
+
+        Снимок пользователя кэшируется по токену не дольше
+        USER_CACHE_TTL_SECONDS и срока действия токена, так что обычный
+        запрос обходится без декодирования JWT и запроса к users.
+        """
+        cached = _user_cache.get(token)
+        if cached is not None:
+            snapshot, generation = cached
+            if _user_generations.get(snapshot.id, 0) == generation:
+                return snapshot
+            _user_cache.pop(token)
+
         try:
             payload = jwt.decode(
                 token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -129,14 +208,174 @@ class UserService(BaseService[models.User]):
         if not user.is_active:
             logger.warning(f"❌ User is not active: {username}")
             return None
-            
-        return user
+
+        snapshot = schemas.User.model_validate(user)
+        expires_in = payload.get("exp", 0) - time.time()
+        _user_cache.set(
+            token, (snapshot, _user_generations.get(user.id, 0)), ttl=expires_in
+        )
+        return snapshot
 
     async def update_user(
         self, db: AsyncSession, user_id: int, user_update: schemas.UserUpdate
     ) -> Optional[models.User]:
+        # Отзыв пишет в token_revocations с внешним ключом на users.id,
+        # поэтому сначала проверяем, что пользователь есть
+        user = await self.get(db, user_id)
+        if user is None:
+            return None
+
         update_data = user_update.model_dump(exclude_unset=True)
         if "password" in update_data:
-            update_data["hashed_password"] = self.get_password_hash(update_data.pop("password"))
-        
-        return await super().update(db, user_id, **update_data)
\ No newline at end of file
+            update_data["hashed_password"] = await self.get_password_hash(update_data.pop("password"))
+
+        # Флаги подписаны в токене (claim "su"), и другие сервисы им верят
+        superuser_changed = (
+            "is_superuser" in update_data and update_data["is_superuser"] != user.is_superuser
+        )
+        if update_data.get("is_active") is False or "hashed_password" in update_data or superuser_changed:
+            # Старые токены перестают приниматься другими сервисами
+            await revoke_user_tokens(db, user_id)
+            await SessionService().revoke_all(db, user_id)
+
+        user = await super().update(db, user_id, **update_data)
+        invalidate_user_cache(user_id)
+        return user
+
+
+class SessionService(BaseService[models.UserSession]):
+    """Сессии с refresh-токенами.
+
+    Продление сессии — поиск по первичному ключу и сравнение HMAC вместо
+    проверки пароля через bcrypt. При каждом продлении секрет меняется;
+    повторное предъявление уже использованного токена считается утечкой
+    и отзывает сессию целиком.
+    """
+
+    def __init__(self):
+        super().__init__(models.UserSession)
+
+    def _expires_at(self) -> datetime:
+        return datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    async def create_session(
+        self, db: AsyncSession, user_id: int, user_agent: Optional[str] = None
+    ) -> str:
+        """Создаёт сессию и возвращает refresh-токен."""
+        secret = secrets.token_urlsafe(32)
+        session = models.UserSession(
+            user_id=user_id,
+            token_hash=_refresh_token_hash(secret),
+            expires_at=self._expires_at(),
+            user_agent=user_agent,
+        )
+        db.add(session)
+        await db.commit()
+        return f"{session.id}.{secret}"
+
+    async def rotate(
+        self, db: AsyncSession, refresh_token: str
+    ) -> Optional[Tuple[models.User, str]]:
+        """Проверяет refresh-токен и выдаёт вместо него новый.
+
+        Returns:
+            (пользователь, новый refresh-токен) или None, если токен недействителен
+        """
+        parsed = _parse_refresh_token(refresh_token)
+        if parsed is None:
+            return None
+        session_id, secret = parsed
+
+        query = (
+            select(self.model, models.User)
+            .join(models.User, models.User.id == self.model.user_id)
+            .filter(self.model.id == session_id)
+        )
+        row = (await db.execute(query)).one_or_none()
+        if row is None:
+            return None
+        session, user = row
+
+        now = datetime.utcnow()
+        if session.revoked_at is not None or session.expires_at <= now:
+            return None
+
+        token_hash = _refresh_token_hash(secret)
+        if not hmac.compare_digest(session.token_hash, token_hash):
+            logger.warning("Refresh token reuse detected for session %s", session_id)
+            await self.revoke(db, session.user_id, session_id)
+            await db.commit()
+            return None
+
+        if not user.is_active:
+            return None
+
+        new_secret = secrets.token_urlsafe(32)
+        # Условие по старому хешу не даёт двум параллельным запросам
+        # продлить сессию одним и тем же токеном
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == session_id)
+            .where(self.model.token_hash == token_hash)
+            .where(self.model.revoked_at.is_(None))
+            .values(
+                token_hash=_refresh_token_hash(new_secret),
+                expires_at=self._expires_at(),
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount != 1:
+            return None
+        return user, f"{session_id}.{new_secret}"
+
+    async def revoke(self, db: AsyncSession, user_id: int, session_id: int) -> bool:
+        """Отзывает одну сессию пользователя. Выполняется в транзакции вызывающего кода."""
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == session_id)
+            .where(self.model.user_id == user_id)
+            .where(self.model.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def revoke_by_token(self, db: AsyncSession, refresh_token: str) -> bool:
+        parsed = _parse_refresh_token(refresh_token)
+        if parsed is None:
+            return False
+        session_id, secret = parsed
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == session_id)
+            .where(self.model.token_hash == _refresh_token_hash(secret))
+            .where(self.model.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    async def revoke_all(self, db: AsyncSession, user_id: int) -> None:
+        """Отзывает все сессии пользователя. Выполняется в транзакции вызывающего кода."""
+        await db.execute(
+            update(self.model)
+            .where(self.model.user_id == user_id)
+            .where(self.model.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get_active_sessions(
+        self, db: AsyncSession, user_id: int
+    ) -> List[models.UserSession]:
+        query = (
+            select(self.model)
+            .filter(self.model.user_id == user_id)
+            .filter(self.model.revoked_at.is_(None))
+            .filter(self.model.expires_at > datetime.utcnow())
+            .order_by(self.model.updated_at.desc())
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
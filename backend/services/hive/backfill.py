@@ -0,0 +1,54 @@
+"""Пересчёт денормализованной сводки осмотров в таблице hives.
+
+Запуск:
+    python -m services.hive.backfill [--batch-size 500]
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from shared.database import SessionLocal
+from . import models
+from .service import recalculate_hive_summaries
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill(batch_size: int = 500) -> int:
+    """Пересчитывает сводку пачками по id, каждая пачка — отдельная транзакция."""
+    processed = 0
+    last_id = 0
+    while True:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(models.Hive.id)
+                .filter(models.Hive.id > last_id)
+                .order_by(models.Hive.id)
+                .limit(batch_size)
+            )
+            hive_ids = result.scalars().all()
+            if not hive_ids:
+                break
+            await recalculate_hive_summaries(db, hive_ids)
+            await db.commit()
+
+        processed += len(hive_ids)
+        last_id = hive_ids[-1]
+        logger.info("Recalculated inspection summary for %d hives", processed)
+    return processed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    total = asyncio.run(backfill(args.batch_size))
+    logger.info("Done, %d hives processed", total)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,50 @@
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Query, UploadFile, File, BackgroundTasks, status
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_conn, get_read_db
+from shared.lifecycle import setup_lifecycle
+from shared.log import setup_logging
+from shared.metrics import setup_metrics
+from shared.profiler import setup_query_profiler
+from shared.responses import ModelResponse, ORJSONResponse, list_response, model_response, rows_response
+from shared.auth import TokenUser, get_current_active_user
 from shared.cors import setup_cors
-from services.auth.service import UserService
-from services.auth import schemas as auth_schemas
+from shared.base_models import DeletionJobResponse
+from shared.deletion import get_deletion_job, run_deletion_job
+# Модель users нужна для разрешения внешних ключей на users.id
+from services.auth import models as auth_models  # noqa: F401
 from . import schemas
-from .service import HiveService, InspectionService
-from .config import SECRET_KEY, ALGORITHM
+from .service import (
+    HiveService,
+    InspectionService,
+    DEFAULT_INSPECTIONS_LIMIT,
+    MAX_INSPECTIONS_BATCH,
+    parse_inspections_csv,
+)
 
-app = FastAPI(title="Hive Service", version="1.0.0")
+app = FastAPI(default_response_class=ORJSONResponse, title="Hive Service", version="1.0.0")
 
 # Включаем автоматическое перенаправление слешей
 app.router.redirect_slashes = True
 
-# Настраиваем CORS
-setup_cors(app)
+# Настраиваем логирование
+setup_logging(app, "hive")
 
-hive_service = HiveService()
-inspection_service = InspectionService()
-user_service = UserService()
+# Метрики Prometheus: GET /metrics
+setup_metrics(app)
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://localhost:8001/token")
+# Профилировщик SQL, если включён SQL_PROFILER_ENABLED
+setup_query_profiler(app)
 
+# Настраиваем CORS
+setup_cors(app)
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> auth_schemas.User:
-    try:
-        user = await user_service.get_current_user(db, token)
-        if user is None:
-            raise HTTPException(status_code=401, detail="Could not validate credentials")
-        return user
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
-
+# Фоновые задачи и /metrics/*
+setup_lifecycle(app, deletion_entities=["hive"])
 
-async def get_current_active_user(
-    current_user: auth_schemas.User = Depends(get_current_user)
-) -> auth_schemas.User:
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+hive_service = HiveService()
+inspection_service = InspectionService()
 
 
 @app.get("/health")
@@ -57,38 +57,91 @@ async def health() -> dict:
 async def create_hive(
     hive: schemas.HiveCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.HiveResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     db_hive = await hive_service.create_hive(db=db, hive=hive, user_id=current_user.id)
-    return schemas.HiveResponse.model_validate(db_hive)
+    return model_response(schemas.HiveResponse, db_hive)
 
 
 @app.get("/hives", response_model=List[schemas.HiveResponse])
 @app.get("/hives/", response_model=List[schemas.HiveResponse])
 async def read_hives(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.HiveResponse]:
-    print(f"Handling GET /hives request for user {current_user.id}")
-    hives = await hive_service.get_hives_by_user(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    hives = await hive_service.list_hives(
         db, user_id=current_user.id, skip=skip, limit=limit
     )
-    print(f"Found {len(hives)} hives for user {current_user.id}")
-    return [schemas.HiveResponse.model_validate(hive) for hive in hives]
+    return list_response(schemas.HiveResponse, hives)
+
+
+@app.get("/geo/hives/bbox", response_model=List[schemas.HiveResponse])
+async def read_hives_in_bbox(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ORJSONResponse:
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    hives = await hive_service.get_hives_in_bbox(
+        db, current_user.id, (min_lat, min_lon, max_lat, max_lon), limit=limit
+    )
+    return rows_response(hives)
+
+
+@app.get("/geo/hives/nearby", response_model=List[schemas.HiveNearbyResult])
+async def read_nearby_hives(
+    lat: float,
+    lon: float,
+    k: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="Invalid coordinates")
+    hives = await hive_service.get_nearby_hives(
+        db, current_user.id, lat, lon, k=k
+    )
+    return list_response(schemas.HiveNearbyResult, hives)
+
+
+@app.get("/search/hives", response_model=List[schemas.HiveSearchResult])
+async def search_hives(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    hives = await hive_service.search_hives(
+        db, user_id=current_user.id, query=q, limit=limit
+    )
+    return list_response(schemas.HiveSearchResult, hives)
 
 
 @app.get("/hives/{hive_id}", response_model=schemas.HiveWithStats)
 async def read_hive(
     hive_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.HiveWithStats:
-    hive = await hive_service.get_hive_with_stats(db, hive_id, current_user.id)
+    inspections_skip: int = Query(0, ge=0),
+    inspections_limit: int = Query(DEFAULT_INSPECTIONS_LIMIT, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    hive = await hive_service.get_hive_with_stats(
+        db,
+        hive_id,
+        current_user.id,
+        inspections_skip=inspections_skip,
+        inspections_limit=inspections_limit,
+    )
     if hive is None:
         raise HTTPException(status_code=404, detail="Hive not found")
-    return schemas.HiveWithStats.model_validate(hive)
+    return model_response(schemas.HiveWithStats, hive)
 
 
 @app.put("/hives/{hive_id}", response_model=schemas.HiveResponse)
@@ -96,26 +149,24 @@ async def update_hive(
     hive_id: int,
     hive: schemas.HiveUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.HiveResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     db_hive = await hive_service.get(db, hive_id)
     if db_hive is None:
         raise HTTPException(status_code=404, detail="Hive not found")
     if db_hive.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    updated_hive = await hive_service.update(
-        db, hive_id, **hive.model_dump(exclude_unset=True)
-    )
-    return schemas.HiveResponse.model_validate(updated_hive)
+    updated_hive = await hive_service.update_hive(db, db_hive, hive)
+    return model_response(schemas.HiveResponse, updated_hive)
 
 
 @app.post("/inspections/", response_model=schemas.InspectionResponse)
 async def create_inspection(
     inspection: schemas.InspectionCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.InspectionResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     # Проверяем, что улей принадлежит пользователю
     hive = await hive_service.get(db, inspection.hive_id)
     if not hive or hive.user_id != current_user.id:
@@ -124,39 +175,144 @@ async def create_inspection(
     db_inspection = await inspection_service.create_inspection(
         db=db, inspection=inspection, user_id=current_user.id
     )
-    return schemas.InspectionResponse.model_validate(db_inspection)
+    return model_response(schemas.InspectionResponse, db_inspection)
+
+
+async def _create_inspections_batch(
+    db: AsyncSession,
+    inspections: List[schemas.InspectionBatchItem],
+    user_id: int,
+):
+    if len(inspections) > MAX_INSPECTIONS_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many inspections, maximum is {MAX_INSPECTIONS_BATCH}",
+        )
+
+    # Проверяем принадлежность всех ульев одним запросом
+    hive_ids = {i.hive_id for i in inspections}
+    owned = await hive_service.get_owned_hive_ids(db, hive_ids, user_id)
+    missing = hive_ids - owned
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Hives not found: {', '.join(map(str, sorted(missing)))}",
+        )
+
+    return await inspection_service.create_inspections(
+        db=db, inspections=inspections, user_id=user_id
+    )
+
+
+@app.post("/inspections/batch", response_model=List[schemas.InspectionResponse])
+async def create_inspections_batch(
+    batch: schemas.InspectionBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    db_inspections = await _create_inspections_batch(
+        db, batch.inspections, current_user.id
+    )
+    return list_response(schemas.InspectionResponse, db_inspections)
+
+
+@app.post("/inspections/import", response_model=dict)
+async def import_inspections(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> dict:
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+        inspections = parse_inspections_csv(content)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid CSV: {e}")
+
+    db_inspections = await _create_inspections_batch(db, inspections, current_user.id)
+    return {
+        "status": "success",
+        "message": f"Imported {len(db_inspections)} inspections",
+        "count": len(db_inspections),
+    }
+
+
+@app.put("/inspections/{inspection_id}", response_model=schemas.InspectionResponse)
+async def update_inspection(
+    inspection_id: int,
+    inspection: schemas.InspectionUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    db_inspection = await inspection_service.update_inspection(
+        db, inspection_id, inspection, user_id=current_user.id
+    )
+    if db_inspection is None:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    return model_response(schemas.InspectionResponse, db_inspection)
+
+
+@app.delete("/inspections/{inspection_id}", response_model=dict)
+async def delete_inspection(
+    inspection_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> dict:
+    deleted = await inspection_service.delete_inspection(
+        db, inspection_id, user_id=current_user.id
+    )
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    return {"status": "success", "message": "Inspection deleted successfully"}
 
 
 @app.get("/hives/{hive_id}/inspections/", response_model=List[schemas.InspectionResponse])
 async def read_inspections(
     hive_id: int,
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.InspectionResponse]:
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ORJSONResponse:
     # Проверяем, что улей принадлежит пользователю
-    hive = await hive_service.get(db, hive_id)
-    if not hive or hive.user_id != current_user.id:
+    if not await hive_service.get_owned_hive_ids(db, [hive_id], current_user.id):
         raise HTTPException(status_code=404, detail="Hive not found")
     
     inspections = await inspection_service.get_inspections_by_hive(
         db, hive_id=hive_id, user_id=current_user.id, skip=skip, limit=limit
     )
-    return [schemas.InspectionResponse.model_validate(inspection) for inspection in inspections]
+    return rows_response(inspections)
 
 
-@app.delete("/hives/{hive_id}", response_model=dict)
+@app.delete(
+    "/hives/{hive_id}",
+    response_model=DeletionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def delete_hive(
     hive_id: int,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> dict:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     db_hive = await hive_service.get(db, hive_id)
     if db_hive is None:
         raise HTTPException(status_code=404, detail="Hive not found")
     if db_hive.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    
-    await hive_service.delete(db, hive_id)
-    return {"status": "success", "message": "Hive deleted successfully"}
\ No newline at end of file
+
+    # Улей скрывается сразу, данные удаляются пачками в фоне
+    job = await hive_service.schedule_delete(db, hive_id, current_user.id)
+    background_tasks.add_task(run_deletion_job, job.id)
+    return model_response(DeletionJobResponse, job, status_code=status.HTTP_202_ACCEPTED)
+
+
+@app.get("/deletions/{job_id}", response_model=DeletionJobResponse)
+async def read_deletion_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    job = await get_deletion_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return model_response(DeletionJobResponse, job)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, DateTime, Index, func, literal_column, false
 from sqlalchemy.orm import relationship
 import enum
 from shared.database import Base, TimestampMixin
+from shared.geo import GEOHASH_PRECISION
 
 
 class HiveStatus(str, enum.Enum):
@@ -10,6 +11,11 @@ class HiveStatus(str, enum.Enum):
     MAINTENANCE = "maintenance"
 
 
+# Конфигурация полнотекстового поиска по заметкам осмотров.
+# Выражение должно совпадать с индексом ix_inspections_notes_tsv.
+SEARCH_TS_CONFIG = literal_column("'simple'")
+
+
 class Hive(Base, TimestampMixin):
     __tablename__ = "hives"
 
@@ -20,13 +26,39 @@ class Hive(Base, TimestampMixin):
     status = Column(String, default="healthy")  # теперь healthy по умолчанию
     queen_year = Column(Integer)
     frames_count = Column(Integer)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # Улей ожидает фонового каскадного удаления (см. shared/deletion.py)
+    deleting = Column(Boolean, default=False, server_default=false(), nullable=False)
+
+    # Координаты и геохеш-ячейка (B-tree индекс вместо PostGIS)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(GEOHASH_PRECISION), nullable=True)
+
+    # Денормализованная сводка по осмотрам, поддерживается при записи осмотров
+    last_inspection_at = Column(DateTime, nullable=True)
+    last_inspection_status = Column(String, nullable=True)
+    inspection_count = Column(Integer, default=0, server_default="0", nullable=False)
+    avg_temperature = Column(Float, nullable=True)
+    avg_humidity = Column(Float, nullable=True)
+    avg_weight = Column(Float, nullable=True)
+    # Число осмотров с непустым значением — знаменатели средних
+    temperature_count = Column(Integer, default=0, server_default="0", nullable=False)
+    humidity_count = Column(Integer, default=0, server_default="0", nullable=False)
+    weight_count = Column(Integer, default=0, server_default="0", nullable=False)
 
     # Relationships
     inspections = relationship("Inspection", back_populates="hive")
 
-    # Статистические поля будут добавляться динамически в сервисе
-    # Не определяем их здесь как атрибуты класса
+    __table_args__ = (
+        # Триграммные индексы для поиска (расширение pg_trgm)
+        Index("ix_hives_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_hives_location_trgm", "location", postgresql_using="gin", postgresql_ops={"location": "gin_trgm_ops"}),
+        Index("ix_hives_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        # Префиксные запросы по ячейкам сетки
+        Index("ix_hives_geohash", "geohash", postgresql_ops={"geohash": "varchar_pattern_ops"}),
+        Index("ix_hives_latitude_longitude", "latitude", "longitude"),
+    )
 
 
 class Inspection(Base, TimestampMixin):
@@ -42,4 +74,13 @@ class Inspection(Base, TimestampMixin):
     user_id = Column(Integer, ForeignKey("users.id"))
 
     # Relationships
-    hive = relationship("Hive", back_populates="inspections")
\ No newline at end of file
+    hive = relationship("Hive", back_populates="inspections")
+
+    __table_args__ = (
+        Index("ix_inspections_hive_id_created_at", "hive_id", "created_at"),
+        Index(
+            "ix_inspections_notes_tsv",
+            func.to_tsvector(SEARCH_TS_CONFIG, notes),
+            postgresql_using="gin",
+        ),
+    )
@@ -1,6 +1,6 @@
 from typing import Optional, List
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime, timezone
 from shared.base_models import BaseSchema
 from enum import Enum
 
@@ -23,6 +23,23 @@ class InspectionCreate(InspectionBase):
     hive_id: int
 
 
+class InspectionBatchItem(InspectionCreate):
+    # Время осмотра, записанного офлайн; по умолчанию — время загрузки
+    created_at: Optional[datetime] = None
+
+    @field_validator("created_at")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Колонка хранит наивное время UTC; "...Z" и "+03:00" приводим к нему
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class InspectionBatchCreate(BaseSchema):
+    inspections: List[InspectionBatchItem]
+
+
 class InspectionUpdate(BaseSchema):
     temperature: Optional[float] = None
     humidity: Optional[float] = None
@@ -30,6 +47,14 @@ class InspectionUpdate(BaseSchema):
     notes: Optional[str] = None
     status: Optional[StatusEnum] = None
 
+    @field_validator("temperature", "humidity", "weight")
+    @classmethod
+    def reject_null(cls, value: Optional[float]) -> float:
+        # Поле можно не передавать, но не обнулять: в ответе оно обязательно
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
 
 class InspectionResponse(InspectionBase):
     id: int
@@ -46,6 +71,8 @@ class HiveBase(BaseSchema):
     queen_year: int
     frames_count: int
     description: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 
 class HiveCreate(HiveBase):
@@ -59,25 +86,39 @@ class HiveUpdate(BaseSchema):
     queen_year: Optional[int] = None
     frames_count: Optional[int] = None
     description: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 
 class HiveResponse(HiveBase):
     id: int
     user_id: int
+    geohash: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
+    inspection_count: int = 0
+    last_inspection_at: Optional[datetime] = None
+    last_inspection_status: Optional[StatusEnum] = None
+    avg_temperature: Optional[float] = None
+    avg_humidity: Optional[float] = None
+    avg_weight: Optional[float] = None
 
     class Config:
         from_attributes = True
         exclude = {"inspections"}
 
 
+class HiveSearchResult(HiveResponse):
+    rank: float
+
+
+class HiveNearbyResult(HiveResponse):
+    distance_km: float
+
+
 class HiveWithInspections(HiveResponse):
     inspections: List[InspectionResponse] = []
 
 
 class HiveWithStats(HiveWithInspections):
-    avg_temperature: Optional[float] = None
-    avg_humidity: Optional[float] = None
-    avg_weight: Optional[float] = None
     last_inspection_date: Optional[datetime] = None
\ No newline at end of file
@@ -1,13 +1,42 @@
-from typing import List, Optional
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+import csv
+import io
+import math
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Set, Union
 
+from pydantic import ValidationError
+from sqlalchemy import select, update, func, case, and_, or_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from shared.cache import cache, user_tag
+from shared.responses import list_adapter
+from shared.geo import BBox, bbox_around, geohash_encode, haversine_km
+from shared.deletion import DeletionJob, schedule_deletion
 from shared.service import BaseService
 from . import models, schemas
 
 ALLOWED_STATUSES = {"healthy", "warning", "critical"}
 
+# Сколько последних осмотров отдавать вместе с карточкой улья по умолчанию
+DEFAULT_INSPECTIONS_LIMIT = 20
+
+# Максимальное число осмотров в одном пакетном запросе/импорте
+MAX_INSPECTIONS_BATCH = 1000
+
+# Поиск ближайших ульев: начальный и максимальный радиус расширения окна
+NEARBY_INITIAL_RADIUS_KM = 5.0
+NEARBY_MAX_RADIUS_KM = 2000.0
+
+# Минимальная длина поискового запроса (короче — триграммы бесполезны)
+MIN_SEARCH_LENGTH = 2
+
+INSPECTION_CSV_FIELDS = ("hive_id", "temperature", "humidity", "weight", "notes", "status", "created_at")
+
+HIVE_LIST = list_adapter(schemas.HiveResponse)
+
 def validate_status(status: Optional[str]) -> str:
     """Гарантирует, что статус всегда один из допустимых."""
     if status and status in ALLOWED_STATUSES:
@@ -15,21 +44,201 @@ def validate_status(status: Optional[str]) -> str:
     return "healthy"
 
 
+def _running_avg(column, count, added_count: int, added_sum: float):
+    """Новое среднее после добавления added_count значений к count имеющимся.
+
+    count — число непустых значений поля, как у avg() в SQL.
+    """
+    return (func.coalesce(column, 0) * count + added_sum) / (count + added_count)
+
+
+async def apply_inspections_to_summary(
+    db: AsyncSession, inspections: Iterable[models.Inspection]
+) -> None:
+    """Инкрементально обновляет сводку ульев после добавления осмотров.
+
+    Осмотры группируются по улью, так что на каждый улей приходится
+    один UPDATE. Выполняется в транзакции вызывающего кода, коммит не делает.
+    """
+    by_hive = defaultdict(list)
+    for inspection in inspections:
+        by_hive[inspection.hive_id].append(inspection)
+
+    hive = models.Hive
+    for hive_id, hive_inspections in by_hive.items():
+        latest = max(hive_inspections, key=lambda i: i.created_at)
+        is_latest = or_(
+            hive.last_inspection_at.is_(None),
+            hive.last_inspection_at <= latest.created_at,
+        )
+        values = {
+            # Сводка не считается правкой самого улья
+            "updated_at": hive.updated_at,
+            "inspection_count": hive.inspection_count + len(hive_inspections),
+            "last_inspection_at": case(
+                (is_latest, latest.created_at), else_=hive.last_inspection_at
+            ),
+            "last_inspection_status": case(
+                (is_latest, latest.status), else_=hive.last_inspection_status
+            ),
+        }
+        for field in ("temperature", "humidity", "weight"):
+            added = [
+                getattr(i, field) for i in hive_inspections
+                if getattr(i, field) is not None
+            ]
+            if added:
+                column = getattr(hive, f"avg_{field}")
+                count = getattr(hive, f"{field}_count")
+                values[f"avg_{field}"] = _running_avg(column, count, len(added), sum(added))
+                values[f"{field}_count"] = count + len(added)
+
+        await db.execute(
+            update(hive)
+            .where(hive.id == hive_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def recalculate_hive_summaries(
+    db: AsyncSession, hive_ids: Optional[Iterable[int]] = None
+) -> None:
+    """Пересчитывает сводку осмотров по таблице inspections.
+
+    Используется при изменении/удалении осмотров и для бэкфилла.
+    Без hive_ids пересчитываются все ульи. Коммит не делает.
+    """
+    hive = models.Hive
+    inspection = models.Inspection
+
+    def per_hive(*columns):
+        return (
+            select(*columns)
+            .filter(inspection.hive_id == hive.id)
+            .correlate(hive)
+        )
+
+    latest = per_hive().order_by(
+        inspection.created_at.desc(), inspection.id.desc()
+    ).limit(1)
+
+    query = update(hive).values(
+        updated_at=hive.updated_at,
+        inspection_count=per_hive(func.count(inspection.id)).scalar_subquery(),
+        avg_temperature=per_hive(func.avg(inspection.temperature)).scalar_subquery(),
+        avg_humidity=per_hive(func.avg(inspection.humidity)).scalar_subquery(),
+        avg_weight=per_hive(func.avg(inspection.weight)).scalar_subquery(),
+        temperature_count=per_hive(func.count(inspection.temperature)).scalar_subquery(),
+        humidity_count=per_hive(func.count(inspection.humidity)).scalar_subquery(),
+        weight_count=per_hive(func.count(inspection.weight)).scalar_subquery(),
+        last_inspection_at=latest.add_columns(inspection.created_at).scalar_subquery(),
+        last_inspection_status=latest.add_columns(inspection.status).scalar_subquery(),
+    )
+    if hive_ids is not None:
+        query = query.where(hive.id.in_(list(hive_ids)))
+
+    await db.execute(query.execution_options(synchronize_session=False))
+
+
+def _geohash_for(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return geohash_encode(latitude, longitude)
+
+
+def bbox_condition(latitude, longitude, bbox: BBox):
+    """Условие попадания в прямоугольник, в т.ч. через антимеридиан."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat_condition = latitude.between(min_lat, max_lat)
+    if min_lon <= max_lon:
+        return and_(lat_condition, longitude.between(min_lon, max_lon))
+    return and_(lat_condition, or_(longitude >= min_lon, longitude <= max_lon))
+
+
+def _like_pattern(query: str) -> str:
+    """Шаблон ILIKE '%query%' с экранированием спецсимволов."""
+    escaped = query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+def _prefix_tsquery(query: str) -> Optional[str]:
+    """Префиксный tsquery для набора текста: 'qu ne' -> 'qu:* & ne:*'."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+def parse_inspections_csv(content: str) -> List[schemas.InspectionBatchItem]:
+    """Разбирает CSV с осмотрами.
+
+    Ожидается строка заголовка с колонками из INSPECTION_CSV_FIELDS
+    (notes, status и created_at необязательны). При ошибках выбрасывает
+    ValueError со списком проблемных строк.
+    """
+    reader = csv.DictReader(io.StringIO(content))
+    missing = {"hive_id", "temperature", "humidity", "weight"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+
+    items = []
+    errors = []
+    # Строка 1 — заголовок
+    for line_number, row in enumerate(reader, start=2):
+        data = {
+            field: row[field]
+            for field in INSPECTION_CSV_FIELDS
+            if row.get(field) not in (None, "")
+        }
+        try:
+            items.append(schemas.InspectionBatchItem.model_validate(data))
+        except ValidationError as e:
+            for error in e.errors():
+                field = ".".join(str(loc) for loc in error["loc"])
+                errors.append(f"line {line_number}: {field}: {error['msg']}")
+
+    if errors:
+        raise ValueError("; ".join(errors))
+    return items
+
+
 class HiveService(BaseService[models.Hive]):
     def __init__(self):
         super().__init__(models.Hive)
 
+    def cache_tags(self, hive: models.Hive) -> Iterable[str]:
+        return [user_tag("hives", hive.user_id)]
+
     async def create_hive(
         self, db: AsyncSession, hive: schemas.HiveCreate, user_id: int
     ) -> models.Hive:
         # Валидируем статус при создании улья
         hive_data = hive.model_dump()
         hive_data["status"] = validate_status(hive_data.get("status"))
-        db_hive = models.Hive(**hive_data, user_id=user_id)
-        db.add(db_hive)
-        await db.commit()
-        await db.refresh(db_hive)
-        return db_hive
+        hive_data["geohash"] = _geohash_for(hive.latitude, hive.longitude)
+        return await self.create(db, **hive_data, user_id=user_id)
+
+    async def get(self, db: AsyncSession, id: int) -> Optional[models.Hive]:
+        """Улей по id; ульи, ожидающие фонового удаления, не возвращаются."""
+        query = (
+            select(self.model)
+            .filter(self.model.id == id)
+            .filter(self.model.deleting.is_(False))
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+    async def update_hive(
+        self, db: AsyncSession, db_hive: models.Hive, hive: schemas.HiveUpdate
+    ) -> Optional[models.Hive]:
+        update_data = hive.model_dump(exclude_unset=True)
+        if "latitude" in update_data or "longitude" in update_data:
+            update_data["geohash"] = _geohash_for(
+                update_data.get("latitude", db_hive.latitude),
+                update_data.get("longitude", db_hive.longitude),
+            )
+        return await self.update(db, db_hive.id, **update_data)
 
     async def get_hives_by_user(
         self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
@@ -37,70 +246,244 @@ class HiveService(BaseService[models.Hive]):
         query = (
             select(self.model)
             .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
             .offset(skip)
             .limit(limit)
         )
         result = await db.execute(query)
         return result.scalars().all()
 
-    async def get_hive_with_stats(
-        self, db: AsyncSession, hive_id: int, user_id: int
-    ) -> Optional[models.Hive]:
-        # Get hive with inspections
+    async def list_hives(
+        self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+    ) -> List[schemas.HiveResponse]:
+        """Список ульев пользователя через кэш."""
+        async def load() -> List[schemas.HiveResponse]:
+            hives = await self.get_hives_by_user(db, user_id, skip=skip, limit=limit)
+            return [schemas.HiveResponse.model_validate(hive) for hive in hives]
+
+        return await cache.get_or_load(
+            "hive_list", f"{user_id}:{skip}:{limit}", load, HIVE_LIST,
+            tags=[user_tag("hives", user_id)],
+        )
+
+    async def get_owned_hive_ids(
+        self, db: Union[AsyncSession, AsyncConnection], hive_ids: Iterable[int], user_id: int
+    ) -> Set[int]:
+        """Возвращает те из hive_ids, что принадлежат пользователю (один запрос)."""
         query = (
-            select(self.model)
-            .filter(self.model.id == hive_id)
+            select(self.model.id)
+            .filter(self.model.id.in_(set(hive_ids)))
             .filter(self.model.user_id == user_id)
-            .options(selectinload(self.model.inspections))
+            .filter(self.model.deleting.is_(False))
         )
         result = await db.execute(query)
-        hive = result.scalar_one_or_none()
+        return set(result.scalars().all())
 
-        if not hive:
-            return None
+    async def get_hives_in_bbox(
+        self, db: Union[AsyncSession, AsyncConnection], user_id: int, bbox: BBox, limit: int = 500
+    ) -> Sequence[Row]:
+        # Строки Core под HiveResponse для rows_response: в bbox бывают тысячи ульев
+        query = (
+            select(*self.columns_for(schemas.HiveResponse))
+            .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
+            .filter(bbox_condition(self.model.latitude, self.model.longitude, bbox))
+            .order_by(self.model.geohash)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.all()
 
-        # Calculate statistics
-        stats_query = (
-            select(
-                func.avg(models.Inspection.temperature).label("avg_temperature"),
-                func.avg(models.Inspection.humidity).label("avg_humidity"),
-                func.avg(models.Inspection.weight).label("avg_weight"),
-                func.max(models.Inspection.created_at).label("last_inspection_date"),
-            )
-            .filter(models.Inspection.hive_id == hive_id)
+    async def get_nearby_hives(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        latitude: float,
+        longitude: float,
+        k: int = 10,
+    ) -> List[schemas.HiveNearbyResult]:
+        """k ближайших ульев пользователя.
+
+        Окно поиска расширяется вдвое, пока k-й найденный улей не окажется
+        внутри радиуса окна: тогда ни один более близкий улей не мог
+        остаться за пределами прямоугольника.
+        """
+        hive = self.model
+        # Приближённое расстояние для сортировки в БД (равнопромежуточная проекция).
+        # Разница долгот берётся через антимеридиан, если так короче:
+        # 179.9 и -179.9 — соседи, а не края карты
+        lon_scale = math.cos(math.radians(latitude))
+        abs_d_lon = func.abs(hive.longitude - longitude)
+        d_lon = func.least(abs_d_lon, 360 - abs_d_lon)
+        approx_distance = (
+            (hive.latitude - latitude) * (hive.latitude - latitude)
+            + d_lon * d_lon * lon_scale * lon_scale
         )
-        stats_result = await db.execute(stats_query)
-        stats = stats_result.one()
 
-        # Set hive status to latest inspection status
-        if hive.inspections:
-            latest = max(hive.inspections, key=lambda i: i.created_at)
-            hive.status = validate_status(latest.status)
-        else:
-            hive.status = "healthy"
+        radius = NEARBY_INITIAL_RADIUS_KM
+        while True:
+            bbox = bbox_around(latitude, longitude, radius)
+            query = (
+                select(hive)
+                .filter(hive.user_id == user_id)
+                .filter(hive.deleting.is_(False))
+                .filter(bbox_condition(hive.latitude, hive.longitude, bbox))
+                .order_by(approx_distance)
+                .limit(k)
+            )
+            result = await db.execute(query)
+            hives = result.scalars().all()
+            with_distance = sorted(
+                (
+                    (haversine_km(latitude, longitude, h.latitude, h.longitude), h)
+                    for h in hives
+                ),
+                key=lambda item: item[0],
+            )
+            complete = len(hives) == k and with_distance[-1][0] <= radius
+            if complete or radius >= NEARBY_MAX_RADIUS_KM:
+                break
+            radius *= 2
+
+        return [
+            schemas.HiveNearbyResult(
+                **schemas.HiveResponse.model_validate(h).model_dump(),
+                distance_km=distance,
+            )
+            for distance, h in with_distance
+        ]
+
+    async def search_hives(
+        self, db: AsyncSession, user_id: int, query: str, limit: int = 20
+    ) -> List[schemas.HiveSearchResult]:
+        """Ранжированный поиск ульев по имени, месту, описанию и заметкам осмотров.
+
+        Поля улья ищутся через ILIKE/similarity по триграммным GIN-индексам,
+        заметки — по префиксному tsquery и GIN-индексу ix_inspections_notes_tsv.
+        """
+        query = query.strip()
+        if len(query) < MIN_SEARCH_LENGTH:
+            return []
 
-        # Add statistics fields
-        setattr(hive, 'avg_temperature', stats.avg_temperature)
-        setattr(hive, 'avg_humidity', stats.avg_humidity)
-        setattr(hive, 'avg_weight', stats.avg_weight)
-        setattr(hive, 'last_inspection_date', stats.last_inspection_date)
+        hive = self.model
+        inspection = models.Inspection
+        pattern = _like_pattern(query)
 
-        return hive
+        conditions = [
+            hive.name.ilike(pattern, escape="/"),
+            hive.name.op("%")(query),
+            hive.location.ilike(pattern, escape="/"),
+            hive.description.ilike(pattern, escape="/"),
+        ]
+        rank = [
+            func.similarity(hive.name, query),
+            func.similarity(func.coalesce(hive.location, ""), query) * 0.8,
+            func.similarity(func.coalesce(hive.description, ""), query) * 0.6,
+        ]
 
-    async def delete(self, db: AsyncSession, hive_id: int) -> bool:
-        """Delete a hive by ID."""
+        notes = None
+        ts_query = _prefix_tsquery(query)
+        if ts_query:
+            tsvector = func.to_tsvector(models.SEARCH_TS_CONFIG, inspection.notes)
+            tsquery = func.to_tsquery(models.SEARCH_TS_CONFIG, ts_query)
+            notes = (
+                select(
+                    inspection.hive_id.label("hive_id"),
+                    func.max(func.ts_rank(tsvector, tsquery)).label("rank"),
+                )
+                .filter(tsvector.op("@@")(tsquery))
+                .filter(inspection.user_id == user_id)
+                .group_by(inspection.hive_id)
+                .subquery()
+            )
+            conditions.append(notes.c.hive_id.isnot(None))
+            rank.append(func.coalesce(notes.c.rank, 0) * 0.5)
+
+        rank_column = func.greatest(*rank).label("rank")
+        search_query = select(hive, rank_column)
+        if notes is not None:
+            search_query = search_query.outerjoin(notes, notes.c.hive_id == hive.id)
+        search_query = (
+            search_query
+            .filter(hive.user_id == user_id)
+            .filter(hive.deleting.is_(False))
+            .filter(or_(*conditions))
+            .order_by(rank_column.desc(), hive.id)
+            .limit(limit)
+        )
+        result = await db.execute(search_query)
+
+        return [
+            schemas.HiveSearchResult(
+                **schemas.HiveResponse.model_validate(row[0]).model_dump(),
+                rank=row.rank or 0.0,
+            )
+            for row in result
+        ]
+
+    async def get_hive_with_stats(
+        self,
+        db: AsyncSession,
+        hive_id: int,
+        user_id: int,
+        inspections_skip: int = 0,
+        inspections_limit: int = DEFAULT_INSPECTIONS_LIMIT,
+    ) -> Optional[schemas.HiveWithStats]:
+        """Улей со статистикой и последней страницей осмотров.
+
+        Статистика берётся из денормализованных полей улья, осмотры
+        подгружаются отдельным ограниченным запросом. ORM-объект улья
+        не изменяется — возвращается готовый DTO.
+        """
         hive = await self.get(db, hive_id)
-        if not hive:
-            return False
-        await db.delete(hive)
-        await db.commit()
-        return True
+        if not hive or hive.user_id != user_id:
+            return None
+
+        inspections: List[models.Inspection] = []
+        if hive.inspection_count and inspections_limit > 0:
+            inspection = models.Inspection
+            inspections_query = (
+                select(inspection)
+                .filter(inspection.hive_id == hive_id)
+                .order_by(inspection.created_at.desc(), inspection.id.desc())
+                .offset(inspections_skip)
+                .limit(inspections_limit)
+            )
+            inspections_result = await db.execute(inspections_query)
+            inspections = inspections_result.scalars().all()
+
+        # Статус улья — статус последнего осмотра (без изменения ORM-объекта)
+        if hive.inspection_count:
+            status = validate_status(hive.last_inspection_status)
+        else:
+            status = "healthy"
+
+        hive_data = schemas.HiveResponse.model_validate(hive).model_dump(exclude={"status"})
+        return schemas.HiveWithStats(
+            **hive_data,
+            status=status,
+            inspections=[schemas.InspectionResponse.model_validate(i) for i in inspections],
+            last_inspection_date=hive.last_inspection_at,
+        )
+
+    async def schedule_delete(
+        self, db: AsyncSession, hive_id: int, user_id: int
+    ) -> DeletionJob:
+        """Помечает улей как удаляемый; данные удаляются фоновой задачей."""
+        job = await schedule_deletion(db, "hive", hive_id, user_id)
+        # Вместе с ульем скрываются и его датчики
+        await cache.invalidate(user_tag("hives", user_id), user_tag("sensors", user_id))
+        return job
 
 
 class InspectionService(BaseService[models.Inspection]):
     def __init__(self):
         super().__init__(models.Inspection)
 
+    def cache_tags(self, inspection: models.Inspection) -> Iterable[str]:
+        # Осмотры меняют сводку улья, которая есть в списке ульев
+        return [user_tag("hives", inspection.user_id)]
+
     async def create_inspection(
         self, db: AsyncSession, inspection: schemas.InspectionCreate, user_id: int
     ) -> models.Inspection:
@@ -109,17 +492,91 @@ class InspectionService(BaseService[models.Inspection]):
         data = inspection.model_dump()
         data["status"] = valid_status  # перезаписываем статус
         data["user_id"] = user_id
-        db_inspection = models.Inspection(**data)
-        db.add(db_inspection)
+        db_inspection = await self.create(db, commit=False, **data)
+        await apply_inspections_to_summary(db, [db_inspection])
+        await db.commit()
+        await self.invalidate_cache([db_inspection])
+        return db_inspection
+
+    async def create_inspections(
+        self,
+        db: AsyncSession,
+        inspections: List[schemas.InspectionBatchItem],
+        user_id: int,
+    ) -> List[models.Inspection]:
+        """Создаёт пачку осмотров многострочным INSERT ... RETURNING.
+
+        Принадлежность ульев проверяется вызывающим кодом.
+        """
+        if not inspections:
+            return []
+
+        # Одинаковый набор ключей во всех строках — один INSERT на всю пачку
+        now = datetime.utcnow()
+        rows = []
+        for inspection in inspections:
+            data = inspection.model_dump()
+            data["status"] = validate_status(inspection.status)
+            data["created_at"] = inspection.created_at or now
+            data["user_id"] = user_id
+            rows.append(data)
+
+        db_inspections = await self.create_many(db, rows, commit=False)
+
+        await apply_inspections_to_summary(db, db_inspections)
+        await db.commit()
+        await self.invalidate_cache(db_inspections)
+        return db_inspections
+
+    async def update_inspection(
+        self,
+        db: AsyncSession,
+        inspection_id: int,
+        inspection: schemas.InspectionUpdate,
+        user_id: int,
+    ) -> Optional[models.Inspection]:
+        db_inspection = await self.get(db, inspection_id)
+        if not db_inspection or db_inspection.user_id != user_id:
+            return None
+
+        update_data = inspection.model_dump(exclude_unset=True)
+        if "status" in update_data:
+            update_data["status"] = validate_status(update_data["status"])
+        for field, value in update_data.items():
+            setattr(db_inspection, field, value)
+
+        await db.flush()
+        await recalculate_hive_summaries(db, [db_inspection.hive_id])
         await db.commit()
         await db.refresh(db_inspection)
+        await self.invalidate_cache([db_inspection])
         return db_inspection
 
+    async def delete_inspection(
+        self, db: AsyncSession, inspection_id: int, user_id: int
+    ) -> bool:
+        db_inspection = await self.get(db, inspection_id)
+        if not db_inspection or db_inspection.user_id != user_id:
+            return False
+
+        hive_id = db_inspection.hive_id
+        await db.delete(db_inspection)
+        await db.flush()
+        await recalculate_hive_summaries(db, [hive_id])
+        await db.commit()
+        await self.invalidate_cache([db_inspection])
+        return True
+
     async def get_inspections_by_hive(
-        self, db: AsyncSession, hive_id: int, user_id: int, skip: int = 0, limit: int = 100
-    ) -> List[models.Inspection]:
+        self,
+        db: Union[AsyncSession, AsyncConnection],
+        hive_id: int,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> Sequence[Row]:
         query = (
-            select(self.model)
+            select(*self.columns_for(schemas.InspectionResponse))
             .filter(self.model.hive_id == hive_id)
             .filter(self.model.user_id == user_id)
             .order_by(self.model.created_at.desc())
@@ -127,4 +584,4 @@ class InspectionService(BaseService[models.Inspection]):
             .limit(limit)
         )
         result = await db.execute(query)
-        return result.scalars().all()
\ No newline at end of file
+        return result.all()
\ No newline at end of file
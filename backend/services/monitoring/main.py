@@ -1,57 +1,58 @@
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import FastAPI, Depends, HTTPException, Query, BackgroundTasks, status
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy import text, select
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
-from shared.database import get_db
+from shared.database import get_db, get_read_conn, get_read_db
+from shared.lifecycle import setup_lifecycle
+from shared.log import setup_logging
+from shared.metrics import Counter, registry, setup_metrics
+from shared.profiler import setup_query_profiler
+from shared.responses import ModelResponse, ORJSONResponse, list_response, model_response, rows_response
+from shared.auth import TokenUser, get_current_active_user
 from shared.cors import setup_cors
-from services.auth.service import UserService
-from services.auth import schemas as auth_schemas
+from shared.base_models import DeletionJobResponse
+from shared.deletion import get_deletion_job, run_deletion_job
+from shared.geo import GEOHASH_PRECISION
+# Модель users нужна для разрешения внешних ключей на users.id
+from services.auth import models as auth_models  # noqa: F401
 # Импортируем модель Hive для правильной работы foreign key
 from services.hive.models import Hive
 from . import schemas, models
 from .service import SensorService, MeasurementService, AlertService
-from .config import SECRET_KEY, ALGORITHM
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Monitoring Service", version="1.0.0")
+app = FastAPI(default_response_class=ORJSONResponse, title="Monitoring Service", version="1.0.0")
+
+# Настраиваем логирование
+setup_logging(app, "monitoring")
+
+# Метрики Prometheus: GET /metrics
+setup_metrics(app)
+
+# Профилировщик SQL, если включён SQL_PROFILER_ENABLED
+setup_query_profiler(app)
 
 # Настраиваем CORS
 setup_cors(app)
 
+# Фоновые задачи и /metrics/*
+setup_lifecycle(app, deletion_entities=["sensor"])
+
 sensor_service = SensorService()
 measurement_service = MeasurementService()
 alert_service = AlertService()
-user_service = UserService()
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://localhost:8000/token")
-
-
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> auth_schemas.User:
-    try:
-        user = await user_service.get_current_user(db, token)
-        if user is None:
-            raise HTTPException(status_code=401, detail="Could not validate credentials")
-        return user
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
-
 
-async def get_current_active_user(
-    current_user: auth_schemas.User = Depends(get_current_user)
-) -> auth_schemas.User:
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
+# Поток показаний: rate() по счётчику даёт пропускную способность приёма
+measurements_ingested = Counter(
+    "measurements_ingested_total", "Measurements accepted", registry=registry,
+)
+measurements_rejected = Counter(
+    "measurements_rejected_total", "Measurements rejected", ["reason"], registry=registry,
+)
 
 
 @app.get("/health")
@@ -64,65 +65,71 @@ async def health() -> dict:
 async def create_sensor(
     sensor: schemas.SensorCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.SensorResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     try:
-        logger.debug(f"Creating sensor with data: {sensor.model_dump()}")
-        logger.debug(f"Current user: {current_user.id}")
-        
+        logger.debug("Creating sensor for hive %s, user %s", sensor.hive_id, current_user.id)
+
         # Проверяем существование улья и принадлежность его пользователю
-        hive_query = select(Hive).filter(Hive.id == sensor.hive_id, Hive.user_id == current_user.id)
+        hive_query = select(Hive).filter(
+            Hive.id == sensor.hive_id, Hive.user_id == current_user.id, Hive.deleting.is_(False)
+        )
         result = await db.execute(hive_query)
         hive = result.scalar_one_or_none()
         
         if not hive:
-            logger.warning(f"Hive not found or access denied. hive_id: {sensor.hive_id}, user_id: {current_user.id}")
+            logger.warning(
+                "Hive not found or access denied. hive_id: %s, user_id: %s",
+                sensor.hive_id,
+                current_user.id,
+            )
             raise HTTPException(status_code=404, detail="Hive not found or access denied")
         
-        logger.debug(f"Found hive: {hive.id}")
         created_sensor = await sensor_service.create_sensor(db=db, sensor=sensor, user_id=current_user.id)
-        logger.debug(f"Successfully created sensor: {created_sensor.id}")
-        return schemas.SensorResponse.model_validate(created_sensor)
-    except Exception as e:
-        logger.error(f"Error creating sensor: {str(e)}", exc_info=True)
+        logger.debug("Created sensor %s", created_sensor.id)
+        return model_response(schemas.SensorResponse, created_sensor)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Error creating sensor")
         raise
 
 
 @app.get("/sensors/", response_model=List[schemas.SensorResponse])
 async def read_sensors(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.SensorResponse]:
-    sensors = await sensor_service.get_sensors_by_user(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    sensors = await sensor_service.list_sensors(
         db, user_id=current_user.id, skip=skip, limit=limit
     )
-    return [schemas.SensorResponse.model_validate(s) for s in sensors]
+    return list_response(schemas.SensorResponse, sensors)
 
 
 @app.get("/sensors/{sensor_id}", response_model=schemas.SensorResponse)
 async def read_sensor(
     sensor_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.SensorResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     sensor = await sensor_service.get_sensor(db, sensor_id, current_user.id)
     if sensor is None:
         raise HTTPException(status_code=404, detail="Sensor not found")
-    return schemas.SensorResponse.model_validate(sensor)
+    return model_response(schemas.SensorResponse, sensor)
 
 
 @app.get("/sensors/{sensor_id}/stats/", response_model=schemas.SensorStats)
 async def read_sensor_stats(
     sensor_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.SensorStats:
-    stats = await sensor_service.get_sensor_stats(db, sensor_id, current_user.id)
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    stats = await sensor_service.get_cached_sensor_stats(db, sensor_id, current_user.id)
     if stats is None:
         raise HTTPException(status_code=404, detail="Sensor not found")
-    return stats
+    return model_response(schemas.SensorStats, stats)
 
 
 @app.get("/sensors/{sensor_id}/measurements/", response_model=List[schemas.MeasurementResponse])
@@ -130,66 +137,68 @@ async def read_sensor_measurements(
     sensor_id: int,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.MeasurementResponse]:
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ORJSONResponse:
     # Проверяем, что датчик принадлежит пользователю
-    sensor = await sensor_service.get_sensor(db, sensor_id, current_user.id)
-    if not sensor:
+    if not await sensor_service.sensor_exists(db, sensor_id, current_user.id):
         raise HTTPException(status_code=404, detail="Sensor not found")
     
     measurements = await measurement_service.get_measurements_by_sensor(
         db, sensor_id=sensor_id, start_date=start_date, end_date=end_date, limit=limit
     )
-    return [schemas.MeasurementResponse.model_validate(m) for m in measurements]
+    return rows_response(measurements)
 
 
 @app.get("/hives/{hive_id}/sensors/", response_model=List[schemas.SensorResponse])
 async def read_hive_sensors(
     hive_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.SensorResponse]:
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     # Проверяем, что улей принадлежит пользователю
-    hive_query = select(Hive).filter(Hive.id == hive_id, Hive.user_id == current_user.id)
+    hive_query = select(Hive).filter(
+        Hive.id == hive_id, Hive.user_id == current_user.id, Hive.deleting.is_(False)
+    )
     result = await db.execute(hive_query)
     hive = result.scalar_one_or_none()
     
     if not hive:
         raise HTTPException(status_code=404, detail="Hive not found or access denied")
     
-    sensors = await sensor_service.get_sensors_by_hive(db, hive_id, current_user.id)
-    return [schemas.SensorResponse.model_validate(s) for s in sensors]
+    sensors = await sensor_service.list_hive_sensors(db, hive_id, current_user.id)
+    return list_response(schemas.SensorResponse, sensors)
 
 
 @app.post("/measurements/", response_model=schemas.MeasurementResponse)
 async def create_measurement(
     measurement: schemas.MeasurementCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.MeasurementResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     # Проверяем, что датчик принадлежит пользователю
     sensor = await sensor_service.get_sensor(db, measurement.sensor_id, current_user.id)
     if not sensor:
+        measurements_rejected.labels("unknown_sensor").inc()
         raise HTTPException(status_code=404, detail="Sensor not found")
     
     db_measurement = await measurement_service.create_measurement(db=db, measurement=measurement)
-    return schemas.MeasurementResponse.model_validate(db_measurement)
+    measurements_ingested.inc()
+    return model_response(schemas.MeasurementResponse, db_measurement)
 
 
 @app.get("/measurements/", response_model=List[schemas.MeasurementResponse])
 async def read_measurements(
     sensor_id: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.MeasurementResponse]:
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ORJSONResponse:
     if sensor_id:
         # Проверяем, что датчик принадлежит пользователю
-        sensor = await sensor_service.get_sensor(db, sensor_id, current_user.id)
-        if not sensor:
+        if not await sensor_service.sensor_exists(db, sensor_id, current_user.id):
             raise HTTPException(status_code=404, detail="Sensor not found")
         
         measurements = await measurement_service.get_measurements_by_sensor(
@@ -200,33 +209,61 @@ async def read_measurements(
             db, user_id=current_user.id, skip=skip, limit=limit
         )
     
-    return [schemas.MeasurementResponse.model_validate(m) for m in measurements]
+    return rows_response(measurements)
+
+
+@app.get("/map/cells/", response_model=List[schemas.MapCellStats])
+async def read_map_cells(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    precision: int = 5,
+    since: Optional[datetime] = None,
+    db: AsyncConnection = Depends(get_read_conn),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    if not 1 <= precision <= GEOHASH_PRECISION:
+        raise HTTPException(status_code=400, detail=f"precision must be between 1 and {GEOHASH_PRECISION}")
+    # По умолчанию — показания за последние сутки
+    if since is None:
+        since = datetime.utcnow() - timedelta(days=1)
+    cells = await measurement_service.get_cell_stats(
+        db,
+        current_user.id,
+        (min_lat, min_lon, max_lat, max_lon),
+        precision=precision,
+        since=since,
+    )
+    return list_response(schemas.MapCellStats, cells)
 
 
 @app.post("/alerts/", response_model=schemas.AlertResponse)
 async def create_alert(
     alert: schemas.AlertCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.AlertResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     # Проверяем, что датчик и улей принадлежат пользователю
     sensor = await sensor_service.get_sensor(db, alert.sensor_id, current_user.id)
     if not sensor:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
     db_alert = await alert_service.create_alert(db=db, alert=alert, user_id=current_user.id)
-    return schemas.AlertResponse.model_validate(db_alert)
+    return model_response(schemas.AlertResponse, db_alert)
 
 
 @app.get("/alerts/", response_model=List[schemas.AlertResponse])
 async def read_alerts(
     hive_id: Optional[int] = None,
     sensor_id: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.AlertResponse]:
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     if sensor_id:
         # Проверяем, что датчик принадлежит пользователю
         sensor = await sensor_service.get_sensor(db, sensor_id, current_user.id)
@@ -241,31 +278,54 @@ async def read_alerts(
             db, user_id=current_user.id, skip=skip, limit=limit
         )
     
-    return [schemas.AlertResponse.model_validate(a) for a in alerts]
+    return list_response(schemas.AlertResponse, alerts)
 
 
 @app.put("/alerts/{alert_id}/resolve/", response_model=schemas.AlertResponse)
 async def resolve_alert(
     alert_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.AlertResponse:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     alert = await alert_service.resolve_alert(db, alert_id, current_user.id)
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
-    return schemas.AlertResponse.model_validate(alert)
-
-
-@app.delete("/sensors/{sensor_id}", status_code=status.HTTP_204_NO_CONTENT)
-@app.delete("/sensors/{sensor_id}/", status_code=status.HTTP_204_NO_CONTENT)
+    return model_response(schemas.AlertResponse, alert)
+
+
+@app.delete(
+    "/sensors/{sensor_id}",
+    response_model=DeletionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+@app.delete(
+    "/sensors/{sensor_id}/",
+    response_model=DeletionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def delete_sensor(
     sensor_id: int,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-):
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     sensor = await sensor_service.get_sensor(db, sensor_id, current_user.id)
     if not sensor:
         raise HTTPException(status_code=404, detail="Sensor not found")
-    await db.delete(sensor)
-    await db.commit()
-    return None
\ No newline at end of file
+
+    # Датчик скрывается сразу, показания удаляются пачками в фоне
+    job = await sensor_service.schedule_delete(db, sensor_id, current_user.id)
+    background_tasks.add_task(run_deletion_job, job.id)
+    return model_response(DeletionJobResponse, job, status_code=status.HTTP_202_ACCEPTED)
+
+
+@app.get("/deletions/{job_id}", response_model=DeletionJobResponse)
+async def read_deletion_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    job = await get_deletion_job(db, job_id, current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return model_response(DeletionJobResponse, job)
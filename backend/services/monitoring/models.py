@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, String, Boolean
+from sqlalchemy import Column, Integer, Float, ForeignKey, String, Boolean, Index, false
 from sqlalchemy.orm import relationship
 from shared.database import Base, TimestampMixin
 
@@ -11,11 +11,17 @@ class Sensor(Base, TimestampMixin):
     name = Column(String)
     sensor_type = Column(String)  # temperature, humidity, weight, etc.
     is_active = Column(Boolean, default=True)
-    user_id = Column(Integer, ForeignKey("users.id", name="fk_sensors_user_id"))
+    user_id = Column(Integer, ForeignKey("users.id", name="fk_sensors_user_id"), index=True)
+    # Датчик ожидает фонового каскадного удаления (см. shared/deletion.py)
+    deleting = Column(Boolean, default=False, server_default=false(), nullable=False)
 
     # Relationships
     measurements = relationship("Measurement", back_populates="sensor")
 
+    __table_args__ = (
+        Index("ix_sensors_hive_id", "hive_id"),
+    )
+
 
 class Measurement(Base, TimestampMixin):
     __tablename__ = "measurements"
@@ -28,6 +34,10 @@ class Measurement(Base, TimestampMixin):
     # Relationships
     sensor = relationship("Sensor", back_populates="measurements")
 
+    __table_args__ = (
+        Index("ix_measurements_sensor_id_created_at", "sensor_id", "created_at"),
+    )
+
 
 class Alert(Base, TimestampMixin):
     __tablename__ = "alerts"
@@ -38,4 +48,9 @@ class Alert(Base, TimestampMixin):
     alert_type = Column(String)  # temperature_high, humidity_low, etc.
     message = Column(String)
     is_resolved = Column(Boolean, default=False)
-    user_id = Column(Integer, ForeignKey("users.id", name="fk_alerts_user_id"))
\ No newline at end of file
+    user_id = Column(Integer, ForeignKey("users.id", name="fk_alerts_user_id"))
+
+    __table_args__ = (
+        Index("ix_alerts_sensor_id", "sensor_id"),
+        Index("ix_alerts_hive_id", "hive_id"),
+    )
\ No newline at end of file
@@ -75,4 +75,16 @@ class SensorStats(BaseSchema):
     max_value: Optional[float]
     avg_value: Optional[float]
     battery_level: Optional[float]
-    last_measurement_time: Optional[datetime]
\ No newline at end of file
+    last_measurement_time: Optional[datetime]
+
+
+class MapCellStats(BaseSchema):
+    cell: str
+    latitude: float
+    longitude: float
+    sensor_type: str
+    hive_count: int
+    measurement_count: int
+    avg_value: Optional[float]
+    min_value: Optional[float]
+    max_value: Optional[float]
@@ -1,38 +1,52 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional, Sequence, Union
 from datetime import datetime, timedelta
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy.orm import selectinload
+from pydantic import TypeAdapter
 import logging
 
+from shared.cache import cache, user_tag
+from shared.responses import list_adapter
+from shared.geo import BBox, geohash_center
+from shared.deletion import DeletionJob, schedule_deletion
 from shared.service import BaseService
+from services.hive.models import Hive
+from services.hive.service import bbox_condition
 from . import models, schemas
 
 logger = logging.getLogger(__name__)
 
+SENSOR_LIST = list_adapter(schemas.SensorResponse)
+SENSOR_STATS = TypeAdapter(Optional[schemas.SensorStats])
+
 
 class SensorService(BaseService[models.Sensor]):
     def __init__(self):
         super().__init__(models.Sensor)
 
+    def cache_tags(self, sensor: models.Sensor) -> Iterable[str]:
+        return [user_tag("sensors", sensor.user_id), f"sensor:{sensor.id}"]
+
     async def create_sensor(
         self, db: AsyncSession, sensor: schemas.SensorCreate, user_id: int
     ) -> models.Sensor:
         try:
-            logger.debug(f"Creating sensor in database with data: {sensor.model_dump()}, user_id: {user_id}")
-            db_sensor = models.Sensor(**sensor.model_dump(), user_id=user_id)
-            logger.debug(f"Created sensor object: {db_sensor.__dict__}")
-            db.add(db_sensor)
-            await db.commit()
-            logger.debug("Successfully committed sensor to database")
-            await db.refresh(db_sensor)
-            logger.debug(f"Refreshed sensor object: {db_sensor.__dict__}")
-            return db_sensor
-        except Exception as e:
-            logger.error(f"Error in create_sensor: {str(e)}", exc_info=True)
+            return await self.create(db, **sensor.model_dump(), user_id=user_id)
+        except Exception:
+            logger.exception("Error in create_sensor")
             await db.rollback()
             raise
 
+    async def schedule_delete(
+        self, db: AsyncSession, sensor_id: int, user_id: int
+    ) -> DeletionJob:
+        """Помечает датчик как удаляемый; показания удаляются фоновой задачей."""
+        job = await schedule_deletion(db, "sensor", sensor_id, user_id)
+        await cache.invalidate(user_tag("sensors", user_id), f"sensor:{sensor_id}")
+        return job
+
     async def get_sensor(
         self, db: AsyncSession, sensor_id: int, user_id: int
     ) -> Optional[models.Sensor]:
@@ -40,16 +54,31 @@ class SensorService(BaseService[models.Sensor]):
             select(self.model)
             .filter(self.model.id == sensor_id)
             .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
         )
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
+    async def sensor_exists(
+        self, db: Union[AsyncSession, AsyncConnection], sensor_id: int, user_id: int
+    ) -> bool:
+        """Проверка принадлежности датчика без загрузки ORM-объекта."""
+        query = (
+            select(self.model.id)
+            .filter(self.model.id == sensor_id)
+            .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
+        )
+        result = await db.execute(query)
+        return result.first() is not None
+
     async def get_sensors_by_user(
         self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
     ) -> List[models.Sensor]:
         query = (
             select(self.model)
             .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
             .offset(skip)
             .limit(limit)
         )
@@ -63,21 +92,60 @@ class SensorService(BaseService[models.Sensor]):
             select(self.model)
             .filter(self.model.hive_id == hive_id)
             .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
         )
         result = await db.execute(query)
         return result.scalars().all()
 
+    async def list_sensors(
+        self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+    ) -> List[schemas.SensorResponse]:
+        """Список датчиков пользователя через кэш."""
+        async def load() -> List[schemas.SensorResponse]:
+            sensors = await self.get_sensors_by_user(db, user_id, skip=skip, limit=limit)
+            return [schemas.SensorResponse.model_validate(s) for s in sensors]
+
+        return await cache.get_or_load(
+            "sensor_list", f"user:{user_id}:{skip}:{limit}", load, SENSOR_LIST,
+            tags=[user_tag("sensors", user_id)],
+        )
+
+    async def list_hive_sensors(
+        self, db: AsyncSession, hive_id: int, user_id: int
+    ) -> List[schemas.SensorResponse]:
+        """Датчики улья через кэш. Принадлежность улья проверяет вызывающий код."""
+        async def load() -> List[schemas.SensorResponse]:
+            sensors = await self.get_sensors_by_hive(db, hive_id, user_id)
+            return [schemas.SensorResponse.model_validate(s) for s in sensors]
+
+        return await cache.get_or_load(
+            "sensor_list", f"hive:{user_id}:{hive_id}", load, SENSOR_LIST,
+            tags=[user_tag("sensors", user_id)],
+        )
+
+    async def get_cached_sensor_stats(
+        self, db: Union[AsyncSession, AsyncConnection], sensor_id: int, user_id: int
+    ) -> Optional[schemas.SensorStats]:
+        """get_sensor_stats через кэш. Новые показания кэш не сбрасывают:
+        при потоке показаний статистика обновляется раз в TTL."""
+        return await cache.get_or_load(
+            "sensor_stats", f"{user_id}:{sensor_id}",
+            lambda: self.get_sensor_stats(db, sensor_id, user_id), SENSOR_STATS,
+            tags=[f"sensor:{sensor_id}"],
+        )
+
     async def get_sensor_stats(
-        self, db: AsyncSession, sensor_id: int, user_id: int
+        self, db: Union[AsyncSession, AsyncConnection], sensor_id: int, user_id: int
     ) -> Optional[schemas.SensorStats]:
-        # Get sensor
+        # Get sensor. Только нужные колонки — запрос работает и без ORM-сессии
         sensor_query = (
-            select(self.model)
+            select(self.model.id, self.model.name, self.model.sensor_type)
             .filter(self.model.id == sensor_id)
             .filter(self.model.user_id == user_id)
+            .filter(self.model.deleting.is_(False))
         )
         sensor_result = await db.execute(sensor_query)
-        sensor = sensor_result.scalar_one_or_none()
+        sensor = sensor_result.one_or_none()
 
         if not sensor:
             return None
@@ -117,21 +185,22 @@ class MeasurementService(BaseService[models.Measurement]):
     async def create_measurement(
         self, db: AsyncSession, measurement: schemas.MeasurementCreate
     ) -> models.Measurement:
-        db_measurement = models.Measurement(**measurement.model_dump())
-        db.add(db_measurement)
-        await db.commit()
-        await db.refresh(db_measurement)
-        return db_measurement
+        return await self.create(db, **measurement.model_dump())
 
     async def get_measurements_by_sensor(
         self,
-        db: AsyncSession,
+        db: Union[AsyncSession, AsyncConnection],
         sensor_id: int,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 100
-    ) -> List[models.Measurement]:
-        query = select(self.model).filter(self.model.sensor_id == sensor_id)
+    ) -> Sequence[Row]:
+        # Списки показаний бывают большими: строки Core под MeasurementResponse
+        # вместо ORM-объектов, отдаются через rows_response
+        query = (
+            select(*self.columns_for(schemas.MeasurementResponse))
+            .filter(self.model.sensor_id == sensor_id)
+        )
 
         if start_date:
             query = query.filter(self.model.created_at >= start_date)
@@ -140,21 +209,83 @@ class MeasurementService(BaseService[models.Measurement]):
 
         query = query.order_by(self.model.created_at.desc()).limit(limit)
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.all()
 
     async def get_measurements_by_user(
-        self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
-    ) -> List[models.Measurement]:
+        self,
+        db: Union[AsyncSession, AsyncConnection],
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> Sequence[Row]:
         query = (
-            select(self.model)
+            select(*self.columns_for(schemas.MeasurementResponse))
             .join(models.Sensor, models.Sensor.id == self.model.sensor_id)
             .filter(models.Sensor.user_id == user_id)
+            .filter(models.Sensor.deleting.is_(False))
             .order_by(self.model.created_at.desc())
             .offset(skip)
             .limit(limit)
         )
         result = await db.execute(query)
-        return result.scalars().all()
+        return result.all()
+
+
+    async def get_cell_stats(
+        self,
+        db: Union[AsyncSession, AsyncConnection],
+        user_id: int,
+        bbox: BBox,
+        precision: int = 5,
+        since: Optional[datetime] = None,
+    ) -> List[schemas.MapCellStats]:
+        """Агрегаты показаний по ячейкам геохеш-сетки для карты.
+
+        Ячейка — префикс геохеша улья длиной precision.
+        """
+        # Длина префикса подставляется литералом, чтобы выражение
+        # в SELECT и GROUP BY совпадало текстуально
+        cell = func.left(Hive.geohash, literal(precision, literal_execute=True)).label("cell")
+        query = (
+            select(
+                cell,
+                models.Sensor.sensor_type,
+                func.count(func.distinct(Hive.id)).label("hive_count"),
+                func.count(self.model.id).label("measurement_count"),
+                func.avg(self.model.value).label("avg_value"),
+                func.min(self.model.value).label("min_value"),
+                func.max(self.model.value).label("max_value"),
+            )
+            .join(models.Sensor, models.Sensor.id == self.model.sensor_id)
+            .join(Hive, Hive.id == models.Sensor.hive_id)
+            .filter(Hive.user_id == user_id)
+            .filter(Hive.deleting.is_(False))
+            .filter(Hive.geohash.isnot(None))
+            .filter(bbox_condition(Hive.latitude, Hive.longitude, bbox))
+            .group_by(cell, models.Sensor.sensor_type)
+            .order_by(cell)
+        )
+        if since:
+            query = query.filter(self.model.created_at >= since)
+
+        result = await db.execute(query)
+        stats = []
+        for row in result:
+            latitude, longitude = geohash_center(row.cell)
+            stats.append(
+                schemas.MapCellStats(
+                    cell=row.cell,
+                    latitude=latitude,
+                    longitude=longitude,
+                    sensor_type=row.sensor_type,
+                    hive_count=row.hive_count,
+                    measurement_count=row.measurement_count,
+                    avg_value=row.avg_value,
+                    min_value=row.min_value,
+                    max_value=row.max_value,
+                )
+            )
+        return stats
 
 
 class AlertService(BaseService[models.Alert]):
@@ -164,11 +295,7 @@ class AlertService(BaseService[models.Alert]):
     async def create_alert(
         self, db: AsyncSession, alert: schemas.AlertCreate, user_id: int
     ) -> models.Alert:
-        db_alert = models.Alert(**alert.model_dump(), user_id=user_id)
-        db.add(db_alert)
-        await db.commit()
-        await db.refresh(db_alert)
-        return db_alert
+        return await self.create(db, **alert.model_dump(), user_id=user_id)
 
     async def get_alerts_by_sensor(
         self, db: AsyncSession, sensor_id: int, skip: int = 0, limit: int = 100
@@ -1,52 +1,44 @@
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import FastAPI, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db
+from shared.lifecycle import setup_lifecycle
+from shared.log import setup_logging
+from shared.metrics import setup_metrics
+from shared.profiler import setup_query_profiler
+from shared.responses import ModelResponse, ORJSONResponse, list_response, model_response
+from shared.auth import TokenUser, get_current_active_user
 from shared.cors import setup_cors
-from services.auth.service import UserService
-from services.auth import schemas as auth_schemas
+# Модель users нужна для разрешения внешних ключей на users.id
+from services.auth import models as auth_models  # noqa: F401
 from . import schemas
 from .service import (
     NotificationTemplateService,
     NotificationSettingsService,
     NotificationService,
 )
-from .config import SECRET_KEY, ALGORITHM
 
-app = FastAPI(title="Notification Service", version="1.0.0")
+app = FastAPI(default_response_class=ORJSONResponse, title="Notification Service", version="1.0.0")
+
+# Настраиваем логирование
+setup_logging(app, "notification")
+
+# Метрики Prometheus: GET /metrics
+setup_metrics(app)
+
+# Профилировщик SQL, если включён SQL_PROFILER_ENABLED
+setup_query_profiler(app)
 
 # Настраиваем CORS
 setup_cors(app)
 
+# Фоновые задачи и /metrics/*
+setup_lifecycle(app)
+
 template_service = NotificationTemplateService()
 settings_service = NotificationSettingsService()
 notification_service = NotificationService()
-user_service = UserService()
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://localhost:8000/token")
-
-
-async def get_current_user(
-    db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> auth_schemas.User:
-    try:
-        user = await user_service.get_current_user(db, token)
-        if user is None:
-            raise HTTPException(status_code=401, detail="Could not validate credentials")
-        return user
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
-
-
-async def get_current_active_user(
-    current_user: auth_schemas.User = Depends(get_current_user)
-) -> auth_schemas.User:
-    if not current_user.is_active:
-        raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
 
 
 @app.get("/health")
@@ -59,42 +51,42 @@ async def health() -> dict:
 async def create_template(
     template: schemas.NotificationTemplateCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.NotificationTemplate:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     db_template = await template_service.create_template(db=db, template=template)
-    return schemas.NotificationTemplate.model_validate(db_template)
+    return model_response(schemas.NotificationTemplate, db_template)
 
 
 @app.get("/templates/", response_model=List[schemas.NotificationTemplate])
 async def read_templates(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.NotificationTemplate]:
-    db_templates = await template_service.get_all(db, skip=skip, limit=limit)
-    return [schemas.NotificationTemplate.model_validate(t) for t in db_templates]
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    templates = await template_service.list_templates(db, skip=skip, limit=limit)
+    return list_response(schemas.NotificationTemplate, templates)
 
 
 @app.get("/settings/me/", response_model=schemas.NotificationSettings)
 async def read_user_settings(
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.NotificationSettings:
-    settings = await settings_service.get_user_settings(db, current_user.id)
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
+    settings = await settings_service.get_cached_user_settings(db, current_user.id)
     if not settings:
         raise HTTPException(status_code=404, detail="Settings not found")
-    return schemas.NotificationSettings.model_validate(settings)
+    return model_response(schemas.NotificationSettings, settings)
 
 
 @app.post("/settings/", response_model=schemas.NotificationSettings)
 async def create_user_settings(
     settings: schemas.NotificationSettingsCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.NotificationSettings:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     existing_settings = await settings_service.get_user_settings(db, current_user.id)
     if existing_settings:
         raise HTTPException(
@@ -104,29 +96,29 @@ async def create_user_settings(
     db_settings = await settings_service.create_settings(
         db=db, settings=settings, user_id=current_user.id
     )
-    return schemas.NotificationSettings.model_validate(db_settings)
+    return model_response(schemas.NotificationSettings, db_settings)
 
 
 @app.put("/settings/me/", response_model=schemas.NotificationSettings)
 async def update_user_settings(
     settings: schemas.NotificationSettingsUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.NotificationSettings:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     updated_settings = await settings_service.update_settings(
         db, current_user.id, settings
     )
     if not updated_settings:
         raise HTTPException(status_code=404, detail="Settings not found")
-    return schemas.NotificationSettings.model_validate(updated_settings)
+    return model_response(schemas.NotificationSettings, updated_settings)
 
 
 @app.post("/notifications/", response_model=schemas.Notification)
 async def create_notification(
     notification: schemas.NotificationCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> schemas.Notification:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     # Проверяем существование шаблона
     template = await template_service.get(db, notification.template_id)
     if not template:
@@ -135,29 +127,29 @@ async def create_notification(
     db_notification = await notification_service.create_notification(
         db=db, notification=notification, user_id=current_user.id
     )
-    return schemas.Notification.model_validate(db_notification)
+    return model_response(schemas.Notification, db_notification)
 
 
 @app.get("/notifications/", response_model=List[schemas.Notification])
 async def read_notifications(
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.Notification]:
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     db_notifications = await notification_service.get_user_notifications(
         db, current_user.id, skip=skip, limit=limit
     )
-    return [schemas.Notification.model_validate(n) for n in db_notifications]
+    return list_response(schemas.Notification, db_notifications)
 
 
 @app.get("/notifications/pending/", response_model=List[schemas.Notification])
 async def read_pending_notifications(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
-    current_user: auth_schemas.User = Depends(get_current_active_user)
-) -> List[schemas.Notification]:
+    current_user: TokenUser = Depends(get_current_active_user)
+) -> ModelResponse:
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     db_notifications = await notification_service.get_pending_notifications(db, limit=limit)
-    return [schemas.Notification.model_validate(n) for n in db_notifications]
\ No newline at end of file
+    return list_response(schemas.Notification, db_notifications)
\ No newline at end of file
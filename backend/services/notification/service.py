@@ -1,32 +1,38 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from datetime import datetime
+from pydantic import TypeAdapter
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
+from shared.cache import cache, user_tag
+from shared.responses import list_adapter
 from shared.service import BaseService
 from . import models, schemas
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_LIST = list_adapter(schemas.NotificationTemplate)
+USER_SETTINGS = TypeAdapter(Optional[schemas.NotificationSettings])
+
 
 class NotificationTemplateService(BaseService[models.NotificationTemplate]):
     def __init__(self):
         super().__init__(models.NotificationTemplate)
 
+    def cache_tags(self, template: models.NotificationTemplate) -> Iterable[str]:
+        return ["templates"]
+
     async def create_template(
         self, db: AsyncSession, template: schemas.NotificationTemplateCreate
     ) -> models.NotificationTemplate:
         try:
-            logger.debug(f"Creating template: {template.model_dump()}")
-            db_template = models.NotificationTemplate(**template.model_dump())
-            db.add(db_template)
-            await db.commit()
-            await db.refresh(db_template)
-            logger.debug(f"Template created successfully: {db_template.id}")
+            logger.debug("Creating template %s", template.name)
+            db_template = await self.create(db, **template.model_dump())
+            logger.debug("Template created successfully: %s", db_template.id)
             return db_template
-        except Exception as e:
-            logger.error(f"Error creating template: {str(e)}", exc_info=True)
+        except Exception:
+            logger.exception("Error creating template")
             await db.rollback()
             raise
 
@@ -34,35 +40,50 @@ class NotificationTemplateService(BaseService[models.NotificationTemplate]):
         self, db: AsyncSession, name: str
     ) -> Optional[models.NotificationTemplate]:
         try:
-            logger.debug(f"Getting template by name: {name}")
+            logger.debug("Getting template by name: %s", name)
             query = select(self.model).filter(self.model.name == name)
             result = await db.execute(query)
             template = result.scalar_one_or_none()
-            logger.debug(f"Template found: {template.id if template else None}")
+            logger.debug("Template found: %s", template.id if template else None)
             return template
-        except Exception as e:
-            logger.error(f"Error getting template by name: {str(e)}", exc_info=True)
+        except Exception:
+            logger.exception("Error getting template by name")
             raise
 
     async def get_all(
         self, db: AsyncSession, skip: int = 0, limit: int = 100
     ) -> List[models.NotificationTemplate]:
         try:
-            logger.debug(f"Getting all templates with skip={skip}, limit={limit}")
+            logger.debug("Getting all templates with skip=%s, limit=%s", skip, limit)
             query = select(self.model).offset(skip).limit(limit)
             result = await db.execute(query)
             templates = result.scalars().all()
-            logger.debug(f"Found {len(templates)} templates")
+            logger.debug("Found %d templates", len(templates))
             return templates
-        except Exception as e:
-            logger.error(f"Error getting all templates: {str(e)}", exc_info=True)
+        except Exception:
+            logger.exception("Error getting all templates")
             raise
 
+    async def list_templates(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100
+    ) -> List[schemas.NotificationTemplate]:
+        """Список шаблонов через кэш: шаблоны общие и меняются редко."""
+        async def load() -> List[schemas.NotificationTemplate]:
+            templates = await self.get_all(db, skip=skip, limit=limit)
+            return [schemas.NotificationTemplate.model_validate(t) for t in templates]
+
+        return await cache.get_or_load(
+            "templates", f"{skip}:{limit}", load, TEMPLATE_LIST, tags=["templates"]
+        )
+
 
 class NotificationSettingsService(BaseService[models.NotificationSettings]):
     def __init__(self):
         super().__init__(models.NotificationSettings)
 
+    def cache_tags(self, settings: models.NotificationSettings) -> Iterable[str]:
+        return [user_tag("notification_settings", settings.user_id)]
+
     async def get_user_settings(
         self, db: AsyncSession, user_id: int
     ) -> Optional[models.NotificationSettings]:
@@ -70,17 +91,25 @@ class NotificationSettingsService(BaseService[models.NotificationSettings]):
         result = await db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_cached_user_settings(
+        self, db: AsyncSession, user_id: int
+    ) -> Optional[schemas.NotificationSettings]:
+        """Настройки пользователя через кэш."""
+        async def load() -> Optional[schemas.NotificationSettings]:
+            db_settings = await self.get_user_settings(db, user_id)
+            if db_settings is None:
+                return None
+            return schemas.NotificationSettings.model_validate(db_settings)
+
+        return await cache.get_or_load(
+            "notification_settings", str(user_id), load, USER_SETTINGS,
+            tags=[user_tag("notification_settings", user_id)],
+        )
+
     async def create_settings(
         self, db: AsyncSession, settings: schemas.NotificationSettingsCreate, user_id: int
     ) -> models.NotificationSettings:
-        db_settings = models.NotificationSettings(
-            **settings.model_dump(),
-            user_id=user_id
-        )
-        db.add(db_settings)
-        await db.commit()
-        await db.refresh(db_settings)
-        return db_settings
+        return await self.create(db, **settings.model_dump(), user_id=user_id)
 
     async def update_settings(
         self, db: AsyncSession, user_id: int, settings: schemas.NotificationSettingsUpdate
@@ -95,6 +124,7 @@ class NotificationSettingsService(BaseService[models.NotificationSettings]):
 
         await db.commit()
         await db.refresh(db_settings)
+        await self.invalidate_cache([db_settings])
         return db_settings
 
 
@@ -105,14 +135,7 @@ class NotificationService(BaseService[models.Notification]):
     async def create_notification(
         self, db: AsyncSession, notification: schemas.NotificationCreate, user_id: int
     ) -> models.Notification:
-        db_notification = models.Notification(
-            **notification.model_dump(),
-            user_id=user_id
-        )
-        db.add(db_notification)
-        await db.commit()
-        await db.refresh(db_notification)
-        return db_notification
+        return await self.create(db, **notification.model_dump(), user_id=user_id)
 
     async def get_pending_notifications(
         self, db: AsyncSession, limit: int = 100
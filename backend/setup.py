@@ -15,5 +15,6 @@ setup(
         "passlib",
         "python-multipart",
         "redis",
+        "orjson",
     ],
 ) 
\ No newline at end of file
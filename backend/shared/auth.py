@@ -0,0 +1,136 @@
+"""Проверка access-токена в сервисах без обращения к таблице users.
+
+Auth-сервис подписывает в токене id пользователя и его флаги
+(см. UserService.token_claims), поэтому здесь достаточно проверить
+подпись и срок действия. Деактивированных пользователей отсекает
+короткоживущий список отзыва: каждый процесс периодически подгружает
+из token_revocations записи не старше срока жизни токена и отклоняет
+токены, выпущенные до момента отзыва.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import Base, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="http://localhost:8000/token")
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    revoked_at = Column(DateTime, nullable=False, index=True)
+
+
+class TokenUser(BaseModel):
+    """Пользователь, восстановленный из подписанных claims токена."""
+    id: int
+    username: str
+    email: Optional[str] = None
+    is_active: bool = True
+    is_superuser: bool = False
+
+
+class RevocationList:
+    """Отозванные пользователи: user_id -> момент отзыва (UTC)."""
+
+    def __init__(self):
+        self._revoked: Dict[int, datetime] = {}
+
+    def is_revoked(self, user_id: int, issued_at: datetime) -> bool:
+        revoked_at = self._revoked.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    async def refresh(self, db: AsyncSession) -> None:
+        # Старше срока жизни токена записи не нужны: такие токены уже истекли
+        horizon = datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        result = await db.execute(
+            select(TokenRevocation.user_id, TokenRevocation.revoked_at)
+            .filter(TokenRevocation.revoked_at >= horizon)
+        )
+        self._revoked = {row.user_id: row.revoked_at for row in result}
+
+
+revocations = RevocationList()
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: int) -> None:
+    """Отзывает все выпущенные до этого момента токены пользователя.
+
+    Выполняется в транзакции вызывающего кода.
+    """
+    now = datetime.utcnow()
+    await db.execute(
+        insert(TokenRevocation)
+        .values(user_id=user_id, revoked_at=now)
+        .on_conflict_do_update(index_elements=["user_id"], set_={"revoked_at": now})
+    )
+
+
+async def run_revocation_refresher() -> None:
+    """Фоновое обновление списка отзыва, запускается на старте сервиса."""
+    while True:
+        try:
+            async with SessionLocal() as db:
+                await revocations.refresh(db)
+        except Exception:
+            logger.warning("Failed to refresh token revocations", exc_info=True)
+        await asyncio.sleep(settings.REVOCATION_REFRESH_SECONDS)
+
+
+def decode_access_token(token: str) -> Optional[TokenUser]:
+    """Проверяет подпись и срок действия; None, если токен недействителен."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+
+    user_id = payload.get("uid")
+    username = payload.get("sub")
+    if user_id is None or username is None:
+        # Токен выпущен до появления claims — нужен повторный вход
+        return None
+
+    issued_at = datetime.utcfromtimestamp(payload.get("iat", 0))
+    if revocations.is_revoked(user_id, issued_at):
+        return None
+
+    return TokenUser(
+        id=user_id,
+        username=username,
+        email=payload.get("email"),
+        is_active=payload.get("active", True),
+        is_superuser=payload.get("su", False),
+    )
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenUser:
+    user = decode_access_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+async def get_current_active_user(
+    current_user: TokenUser = Depends(get_current_user),
+) -> TokenUser:
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
@@ -0,0 +1,43 @@
+"""Фоновые задачи сервиса на всё время его работы.
+
+Цикл событий держит на задачи только слабые ссылки: задачу, запущенную
+create_task без сохранения, сборщик мусора может уничтожить посреди
+работы. Поэтому задачи хранятся в app.state.background_tasks и
+отменяются при остановке приложения.
+"""
+import asyncio
+import logging
+from typing import Coroutine, List
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+
+def _tasks(app: FastAPI) -> List[asyncio.Task]:
+    if not hasattr(app.state, "background_tasks"):
+        app.state.background_tasks = []
+
+        async def stop() -> None:
+            await stop_background_tasks(app)
+
+        app.add_event_handler("shutdown", stop)
+    return app.state.background_tasks
+
+
+def start_background_task(app: FastAPI, coro: Coroutine) -> asyncio.Task:
+    """Запускает задачу и хранит ссылку на неё до остановки приложения."""
+    task = asyncio.create_task(coro)
+    _tasks(app).append(task)
+    return task
+
+
+async def stop_background_tasks(app: FastAPI) -> None:
+    """Отменяет фоновые задачи и дожидается их завершения."""
+    tasks = getattr(app.state, "background_tasks", [])
+    for task in tasks:
+        task.cancel()
+    for task, result in zip(tasks, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(result, Exception):
+            logger.error("Background task %s failed", task.get_name(), exc_info=result)
+    tasks.clear()
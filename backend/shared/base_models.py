@@ -15,4 +15,17 @@ class TimestampMixin(BaseSchema):
 class ResponseSchema(BaseSchema):
     success: bool
     message: str
-    data: Optional[dict] = None 
\ No newline at end of file
+    data: Optional[dict] = None 
+
+
+class DeletionJobResponse(BaseSchema):
+    id: int
+    entity_type: str
+    entity_id: int
+    status: str
+    current_step: Optional[str] = None
+    deleted_rows: int = 0
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,235 @@
+"""Кэш результатов чтения с инвалидацией по тегам.
+
+Два уровня: L1 — LRU в памяти процесса, за ним общий бэкенд (Redis или,
+без REDIS_URL, память процесса). В кэш кладутся уже готовые схемы
+ответов, сериализованные в JSON через TypeAdapter.
+
+Инвалидация — через версии тегов. Запись кэша хранит версии своих
+тегов на момент чтения из БД; изменение данных увеличивает версию
+тега, и все записи со старой версией перестают считаться попаданием.
+Удалять ключи по шаблону не нужно, а запись, прочитанная из БД до
+изменения и сохранённая после него, автоматически устаревает.
+
+Сбрасывать теги нужно после commit, иначе параллельный запрос может
+успеть закэшировать ещё не изменённые данные с новой версией тега.
+
+L1 сверяется только с локальными версиями тегов. Изменения других
+процессов доходят до него через шину инвалидации (shared/invalidation.py);
+если шина не работает — с задержкой до CACHE_LOCAL_TTL_SECONDS.
+"""
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from pydantic import TypeAdapter
+
+from .config import settings
+from .invalidation import bus
+from .lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# После ошибки бэкенда столько секунд работаем только с L1 и БД
+BACKEND_RETRY_INTERVAL = 5.0
+
+# TTL для сущностей, которых нет в CACHE_TTL_SECONDS
+DEFAULT_TTL_SECONDS = 30.0
+
+
+class InMemoryBackend:
+    """Бэкенд в памяти процесса: для тестов и запуска без Redis."""
+
+    def __init__(self, maxsize: int = 100000):
+        self._values = TTLCache(maxsize=maxsize, ttl=24 * 3600)
+        self._tags: Dict[str, int] = {}
+
+    async def get(self, key: str, tags: Sequence[str]) -> Tuple[Optional[bytes], List[int]]:
+        return self._values.get(key), [self._tags.get(tag, 0) for tag in tags]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._values.set(key, value, ttl=ttl)
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Бэкенд в Redis, общий для всех процессов и сервисов."""
+
+    def __init__(self, url: str, prefix: str = "cache"):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._prefix = prefix
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}:tag:{tag}"
+
+    async def get(self, key: str, tags: Sequence[str]) -> Tuple[Optional[bytes], List[int]]:
+        # Значение и версии тегов — за одно обращение к Redis
+        pipe = self._client.pipeline(transaction=False)
+        pipe.get(f"{self._prefix}:{key}")
+        if tags:
+            pipe.mget([self._tag_key(tag) for tag in tags])
+        result = await pipe.execute()
+        versions = [int(version or 0) for version in result[1]] if tags else []
+        return result[0], versions
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(f"{self._prefix}:{key}", value, px=max(1, int(ttl * 1000)))
+
+    async def bump(self, tags: Iterable[str]) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(self._tag_key(tag))
+        await pipe.execute()
+
+
+class Cache:
+    def __init__(
+        self,
+        backend,
+        local_maxsize: int,
+        local_ttl: float,
+        ttls: Dict[str, float],
+    ):
+        self.backend = backend
+        self._local = TTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self._local_tags: Dict[str, int] = {}
+        self._ttls = ttls
+        self._backend_retry_at = 0.0
+        self._stats: Dict[str, Counter] = defaultdict(Counter)
+        self._invalidations = 0
+        self._remote_invalidations = 0
+
+    def ttl_for(self, entity: str) -> float:
+        return self._ttls.get(entity, DEFAULT_TTL_SECONDS)
+
+    def _backend_available(self) -> bool:
+        return time.monotonic() >= self._backend_retry_at
+
+    def _backend_failed(self, entity: str, error: Exception) -> None:
+        logger.warning("Cache backend unavailable, reading from database: %s", error)
+        self._backend_retry_at = time.monotonic() + BACKEND_RETRY_INTERVAL
+        self._stats[entity]["errors"] += 1
+
+    async def get_or_load(
+        self,
+        entity: str,
+        key: str,
+        loader: Callable[[], Awaitable[T]],
+        adapter: TypeAdapter,
+        tags: Sequence[str] = (),
+    ) -> T:
+        """Значение из кэша или результат loader(), который затем кэшируется.
+
+        entity — вид данных: от него зависят TTL и метрики.
+        tags — теги, сброс любого из которых делает запись недействительной.
+        """
+        ttl = self.ttl_for(entity)
+        if ttl <= 0:
+            return await loader()
+
+        stats = self._stats[entity]
+        cache_key = f"{entity}:{key}"
+        local_versions = tuple(self._local_tags.get(tag, 0) for tag in tags)
+
+        entry = self._local.get(cache_key)
+        if entry is not None and entry[1] == local_versions:
+            stats["local_hits"] += 1
+            return entry[0]
+
+        versions = None
+        if self._backend_available():
+            try:
+                raw, versions = await self.backend.get(cache_key, tags)
+                if raw is not None:
+                    envelope = json.loads(raw)
+                    if envelope["t"] == versions:
+                        value = adapter.validate_python(envelope["v"])
+                        self._local.set(cache_key, (value, local_versions), ttl=ttl)
+                        stats["hits"] += 1
+                        return value
+            except Exception as e:
+                versions = None
+                self._backend_failed(entity, e)
+
+        stats["misses"] += 1
+        value = await loader()
+        self._local.set(cache_key, (value, local_versions), ttl=ttl)
+        if versions is not None:
+            envelope = {"t": versions, "v": adapter.dump_python(value, mode="json")}
+            try:
+                await self.backend.set(cache_key, json.dumps(envelope).encode(), ttl)
+            except Exception as e:
+                self._backend_failed(entity, e)
+        return value
+
+    def _bump_local(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._local_tags[tag] = self._local_tags.get(tag, 0) + 1
+
+    def apply_remote(self, tags: List[str]) -> None:
+        """Событие шины: другой процесс уже сбросил теги в бэкенде."""
+        self._remote_invalidations += 1
+        self._bump_local(tags)
+
+    def clear_local(self) -> None:
+        self._local.clear()
+
+    async def invalidate(self, *tags: str) -> None:
+        """Сбрасывает теги. Вызывать после commit изменяющей транзакции."""
+        if not tags:
+            return
+        self._invalidations += 1
+        self._bump_local(tags)
+        bus.publish(tags)
+        if self._backend_available():
+            try:
+                await self.backend.bump(tags)
+            except Exception as e:
+                # Записи в бэкенде доживут до своего TTL
+                self._backend_failed("invalidate", e)
+
+    def stats(self) -> Dict[str, Any]:
+        entities = {}
+        for entity, counts in self._stats.items():
+            lookups = counts["local_hits"] + counts["hits"] + counts["misses"]
+            entities[entity] = {
+                "local_hits": counts["local_hits"],
+                "hits": counts["hits"],
+                "misses": counts["misses"],
+                "errors": counts["errors"],
+                "hit_ratio": round((lookups - counts["misses"]) / lookups, 4) if lookups else 0.0,
+            }
+        return {
+            "backend": "redis" if isinstance(self.backend, RedisBackend) else "memory",
+            "local_entries": len(self._local),
+            "invalidations": self._invalidations,
+            "remote_invalidations": self._remote_invalidations,
+            "entities": entities,
+        }
+
+
+def user_tag(kind: str, user_id: int) -> str:
+    """Тег «все данные вида kind пользователя», например hives:user:5."""
+    return f"{kind}:user:{user_id}"
+
+
+def build_cache() -> Cache:
+    backend = RedisBackend(settings.REDIS_URL) if settings.REDIS_URL else InMemoryBackend()
+    return Cache(
+        backend,
+        local_maxsize=settings.CACHE_LOCAL_MAXSIZE,
+        local_ttl=settings.CACHE_LOCAL_TTL_SECONDS,
+        ttls=settings.CACHE_TTL_SECONDS,
+    )
+
+
+cache = build_cache()
+bus.add_handler(cache.apply_remote, cache.clear_local)
@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,77 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-for-jwt"  # В продакшене должен быть безопасный ключ
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Как часто сервисы перечитывают список отозванных токенов
+    REVOCATION_REFRESH_SECONDS: int = 15
+    # Как часто искать брошенные и упавшие задачи фонового удаления
+    DELETION_SWEEP_INTERVAL_SECONDS: float = 60
+
+    # Пул соединений с БД на процесс (см. раздел о размерах пула в README)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+    DB_POOL_TIMEOUT: float = 30
+    # Пересоздавать соединения старше этого числа секунд (-1 — никогда)
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Отдельный пул только для чтения (get_read_db)
+    DB_READ_POOL_SIZE: int = 5
+    DB_READ_MAX_OVERFLOW: int = 10
+    # Кэш подготовленных выражений на соединение; 0 — для PgBouncer в режиме transaction
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # statement_timeout на стороне сервера в миллисекундах; 0 — без ограничения
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+
+    # Реплики для чтения через запятую; пусто — всё читается с основного сервера
+    DB_REPLICA_URLS: str = ""
+    # Реплика с отставанием больше этого исключается из ротации
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5
+    DB_REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    # Столько секунд после записи клиент читает с основного сервера
+    DB_READ_YOUR_WRITES_SECONDS: float = 10
+
+    # Общий кэш чтения (shared/cache.py); без REDIS_URL — в памяти процесса
+    REDIS_URL: Optional[str] = None
+    CACHE_LOCAL_MAXSIZE: int = 10000
+    # Сколько секунд L1 в памяти процесса верит записи без сверки с бэкендом
+    CACHE_LOCAL_TTL_SECONDS: float = 5
+    # TTL по видам данных, 0 — не кэшировать
+    CACHE_TTL_SECONDS: Dict[str, float] = {
+        "hive_list": 30,
+        "sensor_list": 30,
+        "sensor_stats": 15,
+        "templates": 300,
+        "notification_settings": 120,
+    }
+
+    # Шина инвалидации между процессами (shared/invalidation.py)
+    INVALIDATION_BUS_ENABLED: bool = True
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_RECONNECT_SECONDS: float = 1
+    INVALIDATION_MAX_RECONNECT_SECONDS: float = 30
+    # Проверка соединения слушателя, если событий давно не было
+    INVALIDATION_HEALTHCHECK_SECONDS: float = 10
+
+    # Логирование (shared/log.py)
+    LOG_LEVEL: str = "INFO"
+    # Уровни отдельных логгеров, например {"sqlalchemy.engine": "INFO"}
+    LOG_LEVELS: Dict[str, str] = {"uvicorn.access": "WARNING"}
+    # json или text
+    LOG_FORMAT: str = "json"
+    # Доля запросов в журнале; 5xx и медленные запросы пишутся всегда
+    LOG_REQUEST_SAMPLE_RATE: float = 0.1
+    # Доли для отдельных маршрутов, по шаблону пути
+    LOG_REQUEST_SAMPLE_RATES: Dict[str, float] = {"/health": 0.0}
+    LOG_SLOW_REQUEST_MS: float = 1000
+
+    # Профилировщик SQL (shared/profiler.py)
+    SQL_PROFILER_ENABLED: bool = False
+    # Больше выражений на запрос — предупреждение в логе
+    SQL_PROFILER_QUERY_BUDGET: int = 10
+    # Бюджеты отдельных маршрутов, по шаблону пути
+    SQL_PROFILER_QUERY_BUDGETS: Dict[str, int] = {}
+    # Столько повторов одного выражения за запрос считаются N+1
+    SQL_PROFILER_REPEAT_THRESHOLD: int = 3
 
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
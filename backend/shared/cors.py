@@ -1,77 +1,138 @@
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
-from starlette.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+"""CORS для сервисов (чистый ASGI).
+
+Заголовки собираются в байтовые кортежи один раз при создании
+middleware, origin проверяется поиском в множестве. Предварительный
+запрос (OPTIONS с Access-Control-Request-Method) обрабатывается здесь
+же, без вызова приложения; готовые заголовки ответа на него кэшируются
+по origin, а браузер кэширует сам ответ на Access-Control-Max-Age.
+
+Для обычных запросов заголовки добавляются в http.response.start —
+без отдельной задачи и потоков тела, как у BaseHTTPMiddleware.
+"""
 import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
 
 logger = logging.getLogger(__name__)
 
-class CORSDebugMiddleware(BaseHTTPMiddleware):
-    """Middleware для отладки CORS запросов"""
-    
-    def __init__(self, app, allowed_origins):
-        super().__init__(app)
-        self.allowed_origins = allowed_origins
-    
-    async def dispatch(self, request: Request, call_next):
-        origin = request.headers.get("origin")
-        method = request.method
-        logger.info(f"🌐 CORS Debug: {method} {request.url} from origin: {origin}")
-        
-        if method == "OPTIONS":
-            # Предварительные запросы CORS
-            response = Response(status_code=200)
-        else:
-            response = await call_next(request)
-        
-        # Определяем правильный origin для ответа
-        if origin:
-            if any(origin.startswith(allowed.replace('*', '')) for allowed in self.allowed_origins if '*' in allowed) or origin in self.allowed_origins:
-                response.headers["Access-Control-Allow-Origin"] = origin
-            else:
-                # Если origin не разрешен, используем первый разрешенный
-                response.headers["Access-Control-Allow-Origin"] = self.allowed_origins[0]
-        else:
-            # Если origin не указан, используем первый разрешенный
-            response.headers["Access-Control-Allow-Origin"] = self.allowed_origins[0]
-            
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-        response.headers["Access-Control-Allow-Headers"] = "Authorization, Content-Type, Accept, Origin, X-Requested-With"
-        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range"
-        response.headers["Access-Control-Max-Age"] = "3600"
-        
-        logger.info(f"✅ CORS Response: {response.status_code} with origin: {response.headers.get('Access-Control-Allow-Origin')}")
-        return response
+Headers = List[Tuple[bytes, bytes]]
+
+# Список разрешенных origins
+ALLOWED_ORIGINS = [
+    "http://localhost:3000",
+    "http://127.0.0.1:3000",
+    "http://0.0.0.0:3000",
+    "http://localhost:5173",  # Vite default port
+    "http://127.0.0.1:5173",
+    "http://0.0.0.0:5173",
+    "http://localhost:5174",  # Vite custom port
+    "http://127.0.0.1:5174",
+    "*",  # Разрешаем все origins в режиме разработки
+]
+ALLOWED_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"]
+ALLOWED_HEADERS = ["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With"]
+EXPOSE_HEADERS = ["Content-Length", "Content-Range"]
+
+# Не храним заголовки предварительных ответов для бесконечного числа origin
+PREFLIGHT_CACHE_SIZE = 256
+
+
+def _header(name: str, values: Iterable[str]) -> Tuple[bytes, bytes]:
+    return name.encode("latin-1"), ", ".join(values).encode("latin-1")
+
+
+class CORSMiddleware:
+    """CORS с заранее собранными заголовками.
+
+    Разрешённый origin возвращается в Access-Control-Allow-Origin как
+    есть (с учётными данными "*" браузеры не принимают), поэтому ответ
+    всегда помечается Vary: Origin. Запросы без Origin и с чужим origin
+    проходят без CORS-заголовков — браузер сам отклонит ответ.
+    """
+
+    def __init__(
+        self,
+        app,
+        allow_origins: Sequence[str],
+        allow_methods: Sequence[str] = ALLOWED_METHODS,
+        allow_headers: Sequence[str] = ALLOWED_HEADERS,
+        expose_headers: Sequence[str] = EXPOSE_HEADERS,
+        allow_credentials: bool = True,
+        max_age: int = 3600,
+    ):
+        self.app = app
+        self.allow_all = "*" in allow_origins
+        self.origins = frozenset(o.encode("latin-1") for o in allow_origins if o != "*")
+
+        common: Headers = [(b"vary", b"Origin")]
+        if allow_credentials:
+            common.append((b"access-control-allow-credentials", b"true"))
+        self.simple_headers: Headers = common + [_header("access-control-expose-headers", expose_headers)]
+        self.preflight_headers: Headers = common + [
+            _header("access-control-allow-methods", allow_methods),
+            _header("access-control-allow-headers", allow_headers),
+            (b"access-control-max-age", str(max_age).encode()),
+            (b"content-length", b"0"),
+        ]
+        self._preflight_cache: Dict[bytes, Headers] = {}
+
+    def is_allowed(self, origin: bytes) -> bool:
+        return self.allow_all or origin in self.origins
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin: Optional[bytes] = None
+        preflight = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                preflight = True
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if preflight and scope["method"] == "OPTIONS":
+            await self.preflight(origin, send)
+            return
+
+        if not self.is_allowed(origin):
+            logger.debug("CORS: origin %r is not allowed", origin)
+            await self.app(scope, receive, send)
+            return
+
+        extra = self.simple_headers + [(b"access-control-allow-origin", origin)]
+
+        async def send_with_cors(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + extra
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def preflight(self, origin: bytes, send) -> None:
+        if not self.is_allowed(origin):
+            logger.debug("CORS: preflight from disallowed origin %r", origin)
+            await send({"type": "http.response.start", "status": 400, "headers": [(b"content-length", b"0")]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers = self._preflight_cache.get(origin)
+        if headers is None:
+            headers = self.preflight_headers + [(b"access-control-allow-origin", origin)]
+            if len(self._preflight_cache) >= PREFLIGHT_CACHE_SIZE:
+                self._preflight_cache.clear()
+            self._preflight_cache[origin] = headers
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+
 
 def setup_cors(app: FastAPI):
     """Настройка CORS для FastAPI приложения"""
-    
-    # Список разрешенных origins
-    allowed_origins = [
-        "http://localhost:3000",
-        "http://127.0.0.1:3000", 
-        "http://0.0.0.0:3000",
-        "http://localhost:5173",  # Vite default port
-        "http://127.0.0.1:5173",
-        "http://0.0.0.0:5173",
-        "http://localhost:5174",  # Vite custom port
-        "http://127.0.0.1:5174",
-        "*"  # Разрешаем все origins в режиме разработки
-    ]
-    
-    # Добавляем стандартный CORS middleware первым
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=allowed_origins,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-        expose_headers=["*"],
-        max_age=3600,
-    )
-    
-    # Добавляем middleware для отладки CORS после основного
-    app.add_middleware(CORSDebugMiddleware, allowed_origins=allowed_origins)
\ No newline at end of file
+    app.add_middleware(CORSMiddleware, allow_origins=ALLOWED_ORIGINS)
@@ -0,0 +1,242 @@
+"""Фоновое каскадное удаление ульев и датчиков.
+
+Запрос на удаление только помечает сущность флагом deleting и создаёт
+запись в deletion_jobs; сами строки (показания, алерты, осмотры)
+удаляются небольшими пачками в фоне, каждая пачка — отдельная
+транзакция. Прогресс хранится в deletion_jobs, поэтому задачу можно
+продолжить после перезапуска сервиса.
+
+Таблицы описаны облегчёнными table()/column(), чтобы сервисы не
+импортировали модели друг друга.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, and_, column, insert, or_, select, table, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .database import Base, SessionLocal, TimestampMixin
+
+logger = logging.getLogger(__name__)
+
+# Сколько строк удаляется за одну транзакцию
+DELETION_BATCH_SIZE = 1000
+
+# Задача в статусе running без прогресса дольше этого считается брошенной
+STALE_JOB_TIMEOUT = timedelta(minutes=5)
+
+# Через сколько повторять задачу, завершившуюся ошибкой
+FAILED_JOB_RETRY_DELAY = timedelta(minutes=5)
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+
+class DeletionJob(Base, TimestampMixin):
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, nullable=False, default=STATUS_PENDING, index=True)
+    current_step = Column(String, nullable=True)
+    deleted_rows = Column(Integer, nullable=False, default=0)
+    error_message = Column(String, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+_hives = table("hives", column("id"), column("deleting"))
+_sensors = table("sensors", column("id"), column("hive_id"), column("deleting"))
+_measurements = table("measurements", column("id"), column("sensor_id"))
+_alerts = table("alerts", column("id"), column("sensor_id"), column("hive_id"))
+_inspections = table("inspections", column("id"), column("hive_id"))
+
+# Шаг удаления: (таблица, условие отбора строк)
+Step = Tuple[object, object]
+
+
+def _hive_steps(hive_id: int) -> List[Step]:
+    sensor_ids = select(_sensors.c.id).where(_sensors.c.hive_id == hive_id)
+    return [
+        (_measurements, _measurements.c.sensor_id.in_(sensor_ids)),
+        (_alerts, or_(_alerts.c.hive_id == hive_id, _alerts.c.sensor_id.in_(sensor_ids))),
+        (_inspections, _inspections.c.hive_id == hive_id),
+        (_sensors, _sensors.c.hive_id == hive_id),
+        (_hives, _hives.c.id == hive_id),
+    ]
+
+
+def _sensor_steps(sensor_id: int) -> List[Step]:
+    return [
+        (_measurements, _measurements.c.sensor_id == sensor_id),
+        (_alerts, _alerts.c.sensor_id == sensor_id),
+        (_sensors, _sensors.c.id == sensor_id),
+    ]
+
+
+def _hive_marks(hive_id: int) -> List[Step]:
+    return [
+        (_hives, _hives.c.id == hive_id),
+        (_sensors, _sensors.c.hive_id == hive_id),
+    ]
+
+
+def _sensor_marks(sensor_id: int) -> List[Step]:
+    return [(_sensors, _sensors.c.id == sensor_id)]
+
+
+# entity_type -> (что пометить флагом deleting, план удаления)
+ENTITIES: Dict[str, Tuple[Callable[[int], List[Step]], Callable[[int], List[Step]]]] = {
+    "hive": (_hive_marks, _hive_steps),
+    "sensor": (_sensor_marks, _sensor_steps),
+}
+
+
+async def schedule_deletion(
+    db: AsyncSession, entity_type: str, entity_id: int, user_id: int
+) -> DeletionJob:
+    """Помечает сущность как удаляемую и создаёт задачу на очистку."""
+    marks, _ = ENTITIES[entity_type]
+    for target, condition in marks(entity_id):
+        await db.execute(update(target).where(condition).values(deleting=True))
+    result = await db.execute(
+        insert(DeletionJob)
+        .values(entity_type=entity_type, entity_id=entity_id, user_id=user_id)
+        .returning(DeletionJob)
+    )
+    job = result.scalar_one()
+    await db.commit()
+    return job
+
+
+async def get_deletion_job(
+    db: AsyncSession, job_id: int, user_id: int
+) -> Optional[DeletionJob]:
+    query = (
+        select(DeletionJob)
+        .filter(DeletionJob.id == job_id)
+        .filter(DeletionJob.user_id == user_id)
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def _claim(db: AsyncSession, job_id: int) -> Optional[DeletionJob]:
+    """Атомарно забирает задачу, чтобы её не выполняли два воркера сразу."""
+    now = datetime.utcnow()
+    query = (
+        update(DeletionJob)
+        .where(DeletionJob.id == job_id)
+        .where(
+            or_(
+                DeletionJob.status == STATUS_PENDING,
+                and_(
+                    DeletionJob.status == STATUS_RUNNING,
+                    DeletionJob.updated_at < now - STALE_JOB_TIMEOUT,
+                ),
+                # Шаги идемпотентны, так что упавшую задачу можно повторить
+                and_(
+                    DeletionJob.status == STATUS_FAILED,
+                    DeletionJob.updated_at < now - FAILED_JOB_RETRY_DELAY,
+                ),
+            )
+        )
+        .values(status=STATUS_RUNNING, updated_at=now, error_message=None, finished_at=None)
+        .returning(DeletionJob)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(query)
+    job = result.scalar_one_or_none()
+    await db.commit()
+    return job
+
+
+async def _delete_batch(db: AsyncSession, target, condition, batch_size: int) -> int:
+    batch = select(target.c.id).where(condition).limit(batch_size)
+    result = await db.execute(target.delete().where(target.c.id.in_(batch)))
+    return result.rowcount
+
+
+async def run_deletion_job(job_id: int, batch_size: int = DELETION_BATCH_SIZE) -> None:
+    """Выполняет задачу удаления. Безопасно вызывать повторно."""
+    async with SessionLocal() as db:
+        job = await _claim(db, job_id)
+        if job is None:
+            return
+
+        _, plan = ENTITIES[job.entity_type]
+        try:
+            for target, condition in plan(job.entity_id):
+                job.current_step = target.name
+                while True:
+                    deleted = await _delete_batch(db, target, condition, batch_size)
+                    job.deleted_rows += deleted
+                    job.updated_at = datetime.utcnow()
+                    await db.commit()
+                    if deleted < batch_size:
+                        break
+
+            job.status = STATUS_COMPLETED
+            job.current_step = None
+            job.finished_at = datetime.utcnow()
+            await db.commit()
+            logger.info(
+                "Deletion job %s finished: %s %s, %d rows",
+                job.id, job.entity_type, job.entity_id, job.deleted_rows,
+            )
+        except Exception as e:
+            logger.error("Deletion job %s failed", job_id, exc_info=True)
+            await db.rollback()
+            await db.execute(
+                update(DeletionJob)
+                .where(DeletionJob.id == job_id)
+                .values(
+                    status=STATUS_FAILED,
+                    error_message=str(e),
+                    finished_at=datetime.utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+async def resume_deletion_jobs(entity_types: Iterable[str]) -> None:
+    """Продолжает незавершённые и упавшие задачи.
+
+    Задачи, которые ещё нельзя забрать (running у живого воркера или
+    недавно упавшие), пропускаются — их подберёт следующий проход.
+    """
+    async with SessionLocal() as db:
+        query = (
+            select(DeletionJob.id)
+            .filter(DeletionJob.entity_type.in_(list(entity_types)))
+            .filter(DeletionJob.status.in_([STATUS_PENDING, STATUS_RUNNING, STATUS_FAILED]))
+            .order_by(DeletionJob.id)
+        )
+        result = await db.execute(query)
+        job_ids = result.scalars().all()
+
+    for job_id in job_ids:
+        await run_deletion_job(job_id)
+
+
+async def run_deletion_sweeper(entity_types: Iterable[str]) -> None:
+    """Периодически подбирает брошенные и упавшие задачи удаления.
+
+    Одного прохода при старте мало: задача, оставшаяся в running после
+    падения процесса, становится доступной только через
+    STALE_JOB_TIMEOUT, а упавшие — через FAILED_JOB_RETRY_DELAY.
+    """
+    entity_types = list(entity_types)
+    while True:
+        try:
+            await resume_deletion_jobs(entity_types)
+        except Exception:
+            logger.exception("Deletion sweep failed")
+        await asyncio.sleep(settings.DELETION_SWEEP_INTERVAL_SECONDS)
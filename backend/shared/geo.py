@@ -0,0 +1,101 @@
+"""Геохеш и вспомогательные функции для координат ульев.
+
+Геохеш хранится в колонке с обычным B-tree индексом: ячейки сетки
+любого размера — это префиксы строки, поэтому агрегация по ячейкам
+сводится к GROUP BY по substr(geohash, 1, precision).
+"""
+import math
+from typing import Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(_BASE32)}
+
+# Точность хранимого геохеша (~5 м)
+GEOHASH_PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0088
+# Из того же радиуса, что и haversine_km, иначе bbox_around меньше круга
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+BBox = Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        coordinate_range, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (coordinate_range[0] + coordinate_range[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            coordinate_range[0] = mid
+        else:
+            value <<= 1
+            coordinate_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> BBox:
+    """Границы ячейки геохеша: (min_lat, min_lon, max_lat, max_lon)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            coordinate_range = lon_range if even else lat_range
+            mid = (coordinate_range[0] + coordinate_range[1]) / 2
+            if (value >> shift) & 1:
+                coordinate_range[0] = mid
+            else:
+                coordinate_range[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bbox_around(latitude: float, longitude: float, radius_km: float) -> BBox:
+    """Прямоугольник, содержащий круг радиуса radius_km вокруг точки.
+
+    Если прямоугольник пересекает антимеридиан, min_lon > max_lon.
+    """
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - d_lat, -90.0)
+    max_lat = min(latitude + d_lat, 90.0)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 0:
+        return min_lat, -180.0, max_lat, 180.0
+    d_lon = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    if d_lon >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+
+    min_lon = longitude - d_lon
+    max_lon = longitude + d_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, min_lon, max_lat, max_lon
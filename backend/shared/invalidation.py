@@ -0,0 +1,218 @@
+"""Шина инвалидации кэшей между процессами через Postgres LISTEN/NOTIFY.
+
+Каждый процесс держит одно выделенное соединение asyncpg вне пула: на
+нём он слушает канал и через него же публикует свои события. После
+commit код вызывает publish(tags); теги, накопленные за FLUSH_INTERVAL,
+уходят одним NOTIFY, поэтому поток записей не превращается в поток
+уведомлений. Получив событие от другого процесса, шина вызывает
+обработчики, которые сбрасывают локальные кэши (L1 в shared/cache.py,
+снимки пользователей в auth).
+
+Postgres не хранит уведомления для отключившихся слушателей. Поэтому
+после переподключения обработчики получают сигнал сброса и очищают
+кэши целиком: пропущенные события не могут оставить устаревшие записи.
+
+Нужен прямой доступ к Postgres: через PgBouncer в режиме transaction
+LISTEN не работает.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+from .config import settings
+from .database import SQLALCHEMY_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Предел payload у NOTIFY — 8000 байт; оставляем запас на обёртку
+MAX_PAYLOAD_BYTES = 7000
+
+# Сколько секунд копить теги перед отправкой одного NOTIFY
+FLUSH_INTERVAL = 0.01
+
+# Не больше стольких тегов ждут отправки, пока соединения нет;
+# остальные отбрасываются — их записи доживут до TTL
+MAX_PENDING_TAGS = 100000
+
+# По стольким последним событиям считается задержка доставки
+LAG_WINDOW = 1000
+
+TagsHandler = Callable[[List[str]], None]
+ResetHandler = Callable[[], None]
+
+
+def _asyncpg_dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://")
+
+
+class InvalidationBus:
+    def __init__(self, channel: str):
+        self.channel = channel
+        # События собственного процесса уже применены локально
+        self.origin = uuid.uuid4().hex
+        self._tag_handlers: List[TagsHandler] = []
+        self._reset_handlers: List[ResetHandler] = []
+        self._pending: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._conn = None
+        self._lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.reconnects = 0
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.error: Optional[str] = None
+
+    def add_handler(self, on_tags: TagsHandler, on_reset: ResetHandler) -> None:
+        """on_tags(tags) — другой процесс изменил данные с этими тегами;
+        on_reset() — события могли потеряться, сбросить всё."""
+        self._tag_handlers.append(on_tags)
+        self._reset_handlers.append(on_reset)
+
+    def publish(self, tags: Iterable[str]) -> None:
+        """Ставит теги в очередь на отправку. Вызывать после commit."""
+        if self._task is None:
+            return
+        for tag in tags:
+            if len(self._pending) >= MAX_PENDING_TAGS:
+                self.dropped += 1
+                continue
+            self._pending.add(tag)
+        self._wakeup.set()
+
+    def start(self, url: str) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(_asyncpg_dsn(url)))
+
+    async def _run(self, dsn: str) -> None:
+        import asyncpg
+
+        delay = settings.INVALIDATION_RECONNECT_SECONDS
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(dsn)
+                self._conn.add_termination_listener(lambda conn: self._on_lost(lost))
+                await self._conn.add_listener(self.channel, self._on_notify)
+                if self.reconnects:
+                    logger.info("Invalidation bus reconnected")
+                self.connected = True
+                self.error = None
+                delay = settings.INVALIDATION_RECONNECT_SECONDS
+                # Пока соединения не было, события могли пройти мимо
+                self._reset()
+                await self._publish_loop(lost)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.connected or self.error is None:
+                    logger.warning("Invalidation bus disconnected, retrying: %s", e)
+                self.error = str(e)
+            finally:
+                self.connected = False
+                if self._conn is not None and not self._conn.is_closed():
+                    self._conn.terminate()
+                self._conn = None
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.INVALIDATION_MAX_RECONNECT_SECONDS)
+
+    def _on_lost(self, lost: asyncio.Event) -> None:
+        lost.set()
+        self._wakeup.set()
+
+    async def _publish_loop(self, lost: asyncio.Event) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.INVALIDATION_HEALTHCHECK_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # Тишина: проверяем, что соединение живо
+                await self._conn.execute("SELECT 1")
+            if lost.is_set():
+                raise ConnectionError("listener connection closed")
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+            await asyncio.sleep(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            tags, self._pending = sorted(self._pending), set()
+            try:
+                for payload in self._payloads(tags):
+                    await self._conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+                    self.published += 1
+            except Exception:
+                # Неотправленное уйдёт после переподключения
+                self._pending.update(tags)
+                raise
+
+    def _payloads(self, tags: List[str]) -> Iterable[str]:
+        batch: List[str] = []
+        size = 0
+        for tag in tags:
+            if batch and size + len(tag) + 3 > MAX_PAYLOAD_BYTES:
+                yield self._payload(batch)
+                batch, size = [], 0
+            batch.append(tag)
+            size += len(tag) + 3
+        if batch:
+            yield self._payload(batch)
+
+    def _payload(self, tags: List[str]) -> str:
+        return json.dumps({"o": self.origin, "ts": time.time(), "tags": tags})
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Malformed invalidation event: %.200s", payload)
+            return
+        if event.get("o") == self.origin:
+            return
+        self.received += 1
+        self._lags.append(max(0.0, time.time() - event.get("ts", time.time())))
+        for handler in self._tag_handlers:
+            try:
+                handler(event.get("tags", []))
+            except Exception:
+                logger.exception("Invalidation handler failed")
+
+    def _reset(self) -> None:
+        for handler in self._reset_handlers:
+            try:
+                handler()
+            except Exception:
+                logger.exception("Invalidation reset handler failed")
+
+    def stats(self) -> Dict[str, Any]:
+        lags = list(self._lags)
+        return {
+            "enabled": self._task is not None,
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "published": self.published,
+            "received": self.received,
+            "pending_tags": len(self._pending),
+            "dropped_tags": self.dropped,
+            "lag_ms": {
+                "last": round(lags[-1] * 1000, 3) if lags else None,
+                "avg": round(sum(lags) / len(lags) * 1000, 3) if lags else None,
+                "max": round(max(lags) * 1000, 3) if lags else None,
+            },
+            "error": self.error,
+        }
+
+
+bus = InvalidationBus(settings.INVALIDATION_CHANNEL)
+
+
+def start_invalidation_bus() -> None:
+    """Запускает шину на старте сервиса."""
+    if settings.INVALIDATION_BUS_ENABLED:
+        bus.start(SQLALCHEMY_DATABASE_URL)
@@ -0,0 +1,77 @@
+"""Общий жизненный цикл сервисов: фоновые задачи и служебные метрики.
+
+Раньше каждый сервис повторял одни и те же startup-обработчики и
+эндпоинты /metrics/*. setup_lifecycle регистрирует их один раз:
+фоновые задачи запускаются в lifespan приложения (вместо устаревшего
+on_event), а их остановка остаётся за shared.background.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Sequence
+
+from fastapi import FastAPI
+
+from .auth import run_revocation_refresher
+from .background import start_background_task
+from .cache import cache
+from .database import pool_stats, replica_stats, start_replica_health_checks
+from .deletion import run_deletion_sweeper
+from .invalidation import bus, start_invalidation_bus
+
+
+async def db_pool_metrics() -> Dict[str, Any]:
+    """Состояние пула соединений с БД"""
+    return pool_stats()
+
+
+async def invalidation_metrics() -> Dict[str, Any]:
+    """Состояние шины инвалидации кэшей"""
+    return bus.stats()
+
+
+async def db_replica_metrics() -> Dict[str, Any]:
+    """Состояние реплик для чтения"""
+    return replica_stats()
+
+
+async def cache_metrics() -> Dict[str, Any]:
+    """Попадания и промахи кэша чтения"""
+    return cache.stats()
+
+
+def setup_lifecycle(
+    app: FastAPI,
+    *,
+    revocations: bool = True,
+    deletion_entities: Sequence[str] = (),
+) -> None:
+    """Фоновые задачи сервиса и GET /metrics/db-pool, /invalidation, /db-replicas, /cache.
+
+    revocations — обновлять список отозванных токенов (не нужен auth,
+    который проверяет пользователя в своей БД); deletion_entities —
+    типы сущностей, чьи незавершённые удаления подбирает сервис.
+    """
+    # Обработчики on_startup/on_shutdown (в т.ч. остановка фоновых задач)
+    # выполняет исходный lifespan роутера
+    parent = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[Any]:
+        async with parent(app) as state:
+            if revocations:
+                # Список отозванных токенов обновляется в фоне, а не на каждый запрос
+                start_background_task(app, run_revocation_refresher())
+            # Проверка отставания реплик для get_read_db
+            start_replica_health_checks(app)
+            # Слушаем изменения, сделанные другими процессами
+            start_invalidation_bus()
+            if deletion_entities:
+                # Незавершённые и упавшие удаления подбираются в фоне, в том числе после перезапуска
+                start_background_task(app, run_deletion_sweeper(list(deletion_entities)))
+            yield state
+
+    app.router.lifespan_context = lifespan
+
+    app.add_api_route("/metrics/db-pool", db_pool_metrics, methods=["GET"])
+    app.add_api_route("/metrics/invalidation", invalidation_metrics, methods=["GET"])
+    app.add_api_route("/metrics/db-replicas", db_replica_metrics, methods=["GET"])
+    app.add_api_route("/metrics/cache", cache_metrics, methods=["GET"])
@@ -0,0 +1,150 @@
+"""Настройка логирования сервисов.
+
+Обработчики логгеров только кладут запись в очередь (QueueHandler), а
+форматирование в JSON и запись в stdout выполняет поток QueueListener,
+поэтому ввод-вывод не блокирует event loop. В потоке запроса остаются
+подстановка аргументов в сообщение и копирование записи.
+
+Сообщения пишутся в ленивом виде: logger.info("... %s", value) —
+аргументы подставляются, только если запись пройдёт по уровню.
+
+Уровни: LOG_LEVEL для корневого логгера и LOG_LEVELS для отдельных.
+Журнал запросов (RequestLogMiddleware) пишется выборочно: доля запросов
+задаётся для каждого маршрута, ошибки 5xx и медленные запросы
+пишутся всегда.
+"""
+import atexit
+import copy
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from fastapi import FastAPI
+from pythonjsonlogger import jsonlogger
+
+from .config import settings
+
+request_logger = logging.getLogger("requests")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class _PreparedQueueHandler(QueueHandler):
+    """QueueHandler, который отдаёт в поток сообщение и трассировку
+    текстом, но оставляет поля extra для JSON."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Аргументы подставляются здесь: к моменту записи в потоке
+        # объекты из args могут измениться
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _formatter(service: str) -> logging.Formatter:
+    if settings.LOG_FORMAT == "text":
+        return logging.Formatter(TEXT_FORMAT)
+    return jsonlogger.JsonFormatter(
+        TEXT_FORMAT,
+        rename_fields={"asctime": "time", "levelname": "level", "name": "logger"},
+        static_fields={"service": service},
+        json_ensure_ascii=False,
+    )
+
+
+def configure_logging(service: str) -> None:
+    """Направляет все логгеры процесса в очередь; повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(_formatter(service))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    handler = _PreparedQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+
+    # uvicorn ставит свои обработчики; пишем его логи тем же путём
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+
+class RequestLogMiddleware:
+    """Журнал запросов с выборкой по маршрутам (чистый ASGI)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.default_rate = settings.LOG_REQUEST_SAMPLE_RATE
+        self.rates = settings.LOG_REQUEST_SAMPLE_RATES
+        self.slow_ms = settings.LOG_SLOW_REQUEST_MS
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            # Шаблон маршрута (/hives/{hive_id}) вместо пути: и для выборки,
+            # и чтобы записи группировались
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            if status_code >= 500 or duration_ms >= self.slow_ms:
+                level = logging.WARNING
+            elif random.random() < self.rates.get(path, self.default_rate):
+                level = logging.INFO
+            else:
+                level = None
+            if level is not None and request_logger.isEnabledFor(level):
+                request_logger.log(
+                    level,
+                    "%s %s %d %.1fms",
+                    scope["method"],
+                    path,
+                    status_code,
+                    duration_ms,
+                    extra={
+                        "method": scope["method"],
+                        "route": path,
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 3),
+                    },
+                )
+
+
+def setup_logging(app: FastAPI, service: str) -> None:
+    """Логирование и журнал запросов для FastAPI приложения."""
+    configure_logging(service)
+    app.add_middleware(RequestLogMiddleware)
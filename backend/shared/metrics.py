@@ -0,0 +1,295 @@
+"""Метрики сервисов в текстовом формате Prometheus (GET /metrics).
+
+Счётчики, gauge и гистограммы агрегируются сразу при наблюдении:
+гистограмма — это массив счётчиков по корзинам, так что на запрос
+приходится поиск корзины и пара сложений. Блокировок нет: значения
+меняются только из потока event loop (события SQLAlchemy async тоже
+вызываются в нём), а текст собирается лишь при чтении /metrics.
+
+Метрики общие для процесса; при нескольких воркерах uvicorn каждый
+отдаёт свои, и Prometheus должен опрашивать их по отдельности.
+
+Состояние пулов соединений не хранится, а читается в момент опроса
+через register_collector.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+
+# charset=utf-8 Starlette добавляет сам
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Секунды; запросы к API и к БД
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # Последняя корзина — +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """Метрика с набором меток; значение на каждую комбинацию меток
+    создаётся при первом обращении и дальше берётся из словаря."""
+
+    type = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional["Registry"] = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            # Метрика без меток видна в /metrics сразу, с нулём
+            self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_value(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        value = self._values.get(values)
+        if value is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            value = self._values[values] = self._new_value()
+        return value
+
+    def _label_str(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(v))}"' for name, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, value in list(self._values.items()):
+            lines.extend(self._render_value(values, value))
+        return lines
+
+    def _render_value(self, values, value) -> Iterable[str]:
+        return [f"{self.name}{self._label_str(values)} {_format_value(value.value)}"]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_value(self) -> _CounterValue:
+        return _CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def _new_value(self) -> _GaugeValue:
+        return _GaugeValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS, registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_value(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_value(self, values, value: _HistogramValue) -> Iterable[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), value.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{self._label_str(values, le)} {cumulative}")
+        labels = self._label_str(values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(value.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+
+    def register(self, metric: Metric) -> None:
+        self._metrics.append(metric)
+
+    def register_collector(self, collector: Callable[[], Iterable[Metric]]) -> None:
+        """collector вызывается при каждом опросе и возвращает свежие метрики
+        (созданные без registry)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"], registry=registry,
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route"], registry=registry,
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed", registry=registry,
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time",
+    ["pool", "operation"], buckets=QUERY_BUCKETS, registry=registry,
+)
+db_query_errors = Counter(
+    "db_query_errors_total", "SQL statements that raised an error",
+    ["pool"], registry=registry,
+)
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def _operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in _OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: Engine, pool: str) -> None:
+    """Замер каждого SQL-выражения через события курсора.
+
+    Для AsyncEngine передаётся engine.sync_engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started_at = getattr(context, "_metrics_started_at", None)
+        if started_at is not None:
+            db_query_duration.labels(pool, _operation(statement)).observe(time.perf_counter() - started_at)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        db_query_errors.labels(pool).inc()
+
+
+class MetricsMiddleware:
+    """Задержка, статусы и число запросов в работе (чистый ASGI)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = http_requests_in_flight.labels()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # Шаблон маршрута, а не путь: иначе число рядов не ограничено
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, path).observe(time.perf_counter() - started_at)
+            http_requests.labels(method, path, str(status_code)).inc()
+
+
+async def metrics_endpoint() -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def setup_metrics(app: FastAPI) -> None:
+    """Middleware метрик и GET /metrics для FastAPI приложения."""
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,196 @@
+"""Профилировщик SQL-запросов на один HTTP-запрос.
+
+Включается настройкой SQL_PROFILER_ENABLED. Тогда на каждый запрос
+считаются число SQL-выражений, суммарное время в БД и повторы одного и
+того же выражения (форма запроса — текст с параметрами, свёрнутыми в
+"?"). Итог отдаётся заголовком Server-Timing и пишется в лог
+sql_profiler. Запросы, превысившие бюджет (SQL_PROFILER_QUERY_BUDGET
+или бюджет маршрута из SQL_PROFILER_QUERY_BUDGETS), и запросы с
+повторами (вероятный N+1) пишутся с уровнем WARNING.
+
+Выражения ловятся событиями before/after_cursor_execute на всех
+Engine процесса; профиль текущего запроса хранится в contextvar,
+SQLAlchemy async передаёт его в greenlet драйвера.
+
+В тестах настройка не нужна:
+
+    with record_requests() as profiles:
+        client.get("/hives/")
+    assert profiles[0].count <= 2
+
+    with profile_queries() as profile:
+        await service.list_hives(db, user_id=1)
+    assert not profile.repeated()
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("sql_profiler")
+
+# Списки параметров asyncpg ($1, $2) и DBAPI (?, ?) сворачиваются в один "?"
+_PARAMS = re.compile(r"(?:\$\d+|\?)(?:\s*,\s*(?:\$\d+|\?))*")
+
+_current: ContextVar[Optional["QueryProfile"]] = ContextVar("sql_profile", default=None)
+
+# Списки, в которые record_requests собирает профили запросов
+_recorders: List[List["QueryProfile"]] = []
+
+_installed = False
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAMS.sub("?", " ".join(statement.split()))
+
+
+class QueryProfile:
+    """SQL-выражения, выполненные в рамках одного запроса."""
+
+    def __init__(self, method: Optional[str] = None, route: Optional[str] = None):
+        self.method = method
+        self.route = route
+        self.count = 0
+        self.duration = 0.0
+        self.statements: List[str] = []
+        self.shapes: "Counter[str]" = Counter()
+
+    def add(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements.append(statement)
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        """Формы, выполненные не меньше threshold раз."""
+        threshold = threshold or settings.SQL_PROFILER_REPEAT_THRESHOLD
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+    def server_timing(self) -> bytes:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'.encode()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._profiler_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started_at = getattr(context, "_profiler_started_at", None)
+    if profile is not None and started_at is not None:
+        profile.add(statement, time.perf_counter() - started_at)
+
+
+def install() -> None:
+    """Подключает события ко всем Engine; повторный вызов ничего не делает."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Профиль SQL-выражений, выполненных внутри блока в текущем контексте."""
+    install()
+    profile = QueryProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def record_requests() -> Iterator[List[QueryProfile]]:
+    """Профили всех HTTP-запросов, завершившихся внутри блока.
+
+    Работает и при выключенном SQL_PROFILER_ENABLED, и с TestClient,
+    который выполняет приложение в другом потоке.
+    """
+    install()
+    profiles: List[QueryProfile] = []
+    _recorders.append(profiles)
+    try:
+        yield profiles
+    finally:
+        _recorders.remove(profiles)
+
+
+class QueryProfilerMiddleware:
+    """Профиль SQL на каждый запрос (чистый ASGI); без профилирования
+    обходится одной проверкой."""
+
+    def __init__(self, app):
+        self.app = app
+        self.budget = settings.SQL_PROFILER_QUERY_BUDGET
+        self.budgets = settings.SQL_PROFILER_QUERY_BUDGETS
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not (settings.SQL_PROFILER_ENABLED or _recorders):
+            await self.app(scope, receive, send)
+            return
+
+        install()
+        profile = QueryProfile(method=scope["method"])
+        token = _current.set(profile)
+
+        async def send_with_timing(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"server-timing", profile.server_timing())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            profile.route = getattr(route, "path", None) or scope["path"]
+            for profiles in _recorders:
+                profiles.append(profile)
+            self.report(profile)
+
+    def report(self, profile: QueryProfile) -> None:
+        budget = self.budgets.get(profile.route, self.budget)
+        repeated = profile.repeated()
+        over_budget = profile.count > budget
+        level = logging.WARNING if over_budget or repeated else logging.DEBUG
+        if not logger.isEnabledFor(level):
+            return
+        logger.log(
+            level,
+            "%s %s: %d queries, %.1fms in DB%s%s",
+            profile.method,
+            profile.route,
+            profile.count,
+            profile.duration * 1000,
+            f", over budget {budget}" if over_budget else "",
+            ", repeated statements" if repeated else "",
+            extra={
+                "method": profile.method,
+                "route": profile.route,
+                "queries": profile.count,
+                "db_ms": round(profile.duration * 1000, 3),
+                "budget": budget,
+                "repeated": [{"statement": shape[:500], "count": n} for shape, n in repeated.items()],
+            },
+        )
+
+
+def setup_query_profiler(app: FastAPI) -> None:
+    """Профилировщик SQL для FastAPI приложения."""
+    app.add_middleware(QueryProfilerMiddleware)
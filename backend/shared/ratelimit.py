@@ -0,0 +1,153 @@
+"""Ограничение частоты запросов алгоритмом token bucket.
+
+У каждого ключа (IP, логин) есть корзина на capacity токенов, которая
+пополняется со скоростью rate токенов в секунду; запрос забирает токен
+или отклоняется с подсказкой, через сколько секунд повторить.
+
+RedisTokenBucket хранит корзины в Redis, чтобы лимит был общим для всех
+воркеров. Если Redis недоступен, лимиты продолжают действовать в памяти
+процесса через InMemoryTokenBucket.
+"""
+import logging
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from .lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# (разрешён ли запрос, через сколько секунд появится токен)
+Decision = Tuple[bool, float]
+
+# После ошибки Redis столько секунд не обращаемся к нему вовсе
+REDIS_RETRY_INTERVAL = 5.0
+
+# Корзина пополняется и списывается атомарно на стороне Redis.
+# Время берётся с сервера Redis, чтобы воркеры с разными часами
+# видели одну и ту же корзину.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+
+class InMemoryTokenBucket:
+    """Корзины в памяти процесса. Рассчитан на один event loop."""
+
+    def __init__(self, capacity: float, rate: float, maxsize: int = 100000):
+        self.capacity = capacity
+        self.rate = rate
+        # Через capacity / rate секунд корзина заведомо полна,
+        # поэтому такую запись можно просто забыть
+        self._buckets = TTLCache(maxsize=maxsize, ttl=capacity / rate)
+
+    async def take(self, key: str, cost: float = 1) -> Decision:
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - ts) * self.rate)
+        if tokens >= cost:
+            self._buckets.set(key, (tokens - cost, now))
+            return True, 0.0
+        self._buckets.set(key, (tokens, now))
+        return False, (cost - tokens) / self.rate
+
+
+class RedisTokenBucket:
+    """Корзины в Redis, общие для всех процессов сервиса."""
+
+    def __init__(self, client, prefix: str, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._client = client
+        self._prefix = prefix
+        self._script = client.register_script(_TAKE_SCRIPT)
+        self._fallback = InMemoryTokenBucket(capacity, rate)
+        self._redis_retry_at = 0.0
+        self.fallbacks = 0
+
+    async def take(self, key: str, cost: float = 1) -> Decision:
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                allowed, retry_after = await self._script(
+                    keys=[f"{self._prefix}:{key}"],
+                    args=[self.capacity, self.rate, cost],
+                )
+                return bool(allowed), float(retry_after)
+            except Exception as e:
+                # Каждый запрос не должен ждать таймаута недоступного Redis
+                logger.warning("Redis rate limiter unavailable, using in-memory buckets: %s", e)
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        self.fallbacks += 1
+        return await self._fallback.take(key, cost)
+
+
+class RateLimiter:
+    """Набор именованных корзин с общей статистикой."""
+
+    def __init__(self, redis_url: Optional[str] = None, prefix: str = "ratelimit"):
+        self._client = None
+        if redis_url:
+            import redis.asyncio as redis
+
+            # Короткие таймауты: лимитер не должен сам становиться узким местом
+            self._client = redis.from_url(
+                redis_url, socket_timeout=0.2, socket_connect_timeout=0.2
+            )
+        self._prefix = prefix
+        self._buckets: Dict[str, object] = {}
+        self._allowed: Dict[str, int] = {}
+        self._rejected: Dict[str, int] = {}
+
+    def add_bucket(self, name: str, capacity: float, per_minute: float) -> None:
+        rate = per_minute / 60
+        if self._client is not None:
+            bucket = RedisTokenBucket(self._client, f"{self._prefix}:{name}", capacity, rate)
+        else:
+            bucket = InMemoryTokenBucket(capacity, rate)
+        self._buckets[name] = bucket
+        self._allowed[name] = 0
+        self._rejected[name] = 0
+
+    async def take(self, name: str, key: str, cost: float = 1) -> Decision:
+        allowed, retry_after = await self._buckets[name].take(key, cost)
+        if allowed:
+            self._allowed[name] += 1
+        else:
+            self._rejected[name] += 1
+        return allowed, retry_after
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "backend": "redis" if isinstance(bucket, RedisTokenBucket) else "memory",
+                "capacity": bucket.capacity,
+                "per_minute": round(bucket.rate * 60, 3),
+                "allowed": self._allowed[name],
+                "rejected": self._rejected[name],
+                "redis_fallbacks": getattr(bucket, "fallbacks", 0),
+            }
+            for name, bucket in self._buckets.items()
+        }
+
+
+def retry_after_header(retry_after: float) -> str:
+    return str(max(1, math.ceil(retry_after)))
@@ -0,0 +1,166 @@
+"""Маршрутизация чтения на реплики Postgres.
+
+Реплики перебираются по кругу; фоновая проверка периодически измеряет
+отставание каждой из них и исключает недоступные или отстающие дольше
+REPLICA_MAX_LAG_SECONDS. Если подходящих реплик нет, чтение идёт на
+основной сервер.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from .lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд не обращаться к Redis после ошибки
+REDIS_RETRY_INTERVAL = 5.0
+
+# Отставание в секундах; на догнавшей реплике — 0, даже если
+# на основном сервере давно не было записей
+_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class Replica:
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = url
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+        )
+        # До первой проверки реплика не используется
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        urls: List[str],
+        engine_factory: Callable[[str], AsyncEngine],
+        max_lag: float,
+    ):
+        self.replicas = [Replica(url, engine_factory(url)) for url in urls]
+        self.max_lag = max_lag
+        self._counter = itertools.count()
+
+    def pick(self) -> Optional[Replica]:
+        """Следующая по кругу здоровая реплика или None."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as conn:
+                lag = float((await conn.execute(_LAG_QUERY)).scalar())
+        except Exception as e:
+            if replica.healthy:
+                logger.warning("Replica %s is unavailable: %s", _safe_url(replica.url), e)
+            replica.healthy = False
+            replica.lag = None
+            replica.error = str(e)
+            return
+
+        replica.lag = lag
+        replica.error = None
+        healthy = lag <= self.max_lag
+        if replica.healthy and not healthy:
+            logger.warning("Replica %s lags %.1fs, routing reads elsewhere", _safe_url(replica.url), lag)
+        replica.healthy = healthy
+
+    async def run_health_checks(self, interval: float) -> None:
+        """Фоновая проверка реплик, запускается на старте сервиса."""
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> List[Dict[str, object]]:
+        return [
+            {
+                "url": _safe_url(replica.url),
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
+
+
+class RecentWriters:
+    """Клиенты, недавно выполнявшие запись.
+
+    Их чтения идут на основной сервер, чтобы они сразу видели свои
+    изменения несмотря на отставание реплик. Отметка хранится в памяти
+    процесса и, если задан redis_url, в Redis — тогда её видят все
+    воркеры и сервисы: следующий запрос клиента может попасть в другой
+    процесс, прочитать отстающую реплику и положить устаревшие данные
+    в кэш чтения. Если Redis недоступен, чтение идёт на основной сервер.
+    """
+
+    def __init__(self, ttl: float, redis_url: Optional[str] = None, prefix: str = "ryw"):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._local = TTLCache(maxsize=100000, ttl=ttl)
+        self._client = None
+        self._redis_retry_at = 0.0
+        if redis_url:
+            import redis.asyncio as redis
+
+            self._client = redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _redis_failed(self, error: Exception) -> None:
+        logger.warning("Redis unavailable, reading from primary: %s", error)
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    async def mark(self, key: str) -> None:
+        self._local.set(key, True)
+        if self._client is None or self.ttl <= 0 or time.monotonic() < self._redis_retry_at:
+            return
+        try:
+            await self._client.set(self._redis_key(key), 1, px=int(self.ttl * 1000))
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def seen(self, key: str) -> bool:
+        if key in self._local:
+            return True
+        if self._client is None:
+            return False
+        # Без Redis не знаем, писал ли клиент через другой процесс
+        if time.monotonic() < self._redis_retry_at:
+            return True
+        try:
+            return bool(await self._client.exists(self._redis_key(key)))
+        except Exception as e:
+            self._redis_failed(e)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+
+def _safe_url(url: str) -> str:
+    """URL без пароля — для логов и метрик."""
+    scheme, sep, rest = url.partition("://")
+    if "@" not in rest:
+        return url
+    credentials, _, host = rest.rpartition("@")
+    user = credentials.split(":", 1)[0]
+    return f"{scheme}{sep}{user}@{host}"
@@ -0,0 +1,91 @@
+"""Ответы API с сериализацией в JSON за один проход.
+
+Если эндпоинт возвращает модель и объявляет response_model, FastAPI ещё
+раз валидирует результат, превращает его в dict и только потом кодирует
+в JSON. Здесь ORM-объекты валидируются схемой один раз, а готовые модели
+сразу сериализуются в байты через pydantic-core, без промежуточных dict.
+
+response_model в декораторах остаётся — он нужен для OpenAPI-схемы;
+возвращённый Response FastAPI отдаёт как есть.
+
+Большие списки читаются строками Core (BaseService.columns_for) и
+отдаются через rows_response — вовсе без ORM-объектов и моделей.
+
+Остальные ответы (dict, метрики) по умолчанию кодирует ORJSONResponse.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.engine import Row
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+__all__ = [
+    "ORJSONResponse",
+    "ModelResponse",
+    "list_adapter",
+    "list_response",
+    "model_response",
+    "rows_response",
+]
+
+
+class ModelResponse(Response):
+    """JSON-ответ из уже провалидированных моделей, без повторной валидации."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        adapter: Optional[TypeAdapter] = None,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        # render() вызывается из конструктора Response
+        self._adapter = adapter
+        super().__init__(content, status_code=status_code, headers=headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        if self._adapter is not None:
+            return self._adapter.dump_json(content)
+        return content.__pydantic_serializer__.to_json(content)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """TypeAdapter для List[schema]; строится один раз на схему."""
+    return TypeAdapter(List[schema])
+
+
+def model_response(schema: Type[BaseModel], obj: Any, status_code: int = 200) -> ModelResponse:
+    """Ответ из ORM-объекта или готовой модели схемы schema."""
+    if not isinstance(obj, schema):
+        obj = schema.model_validate(obj)
+    return ModelResponse(obj, status_code=status_code)
+
+
+def list_response(schema: Type[BaseModel], objs: Iterable[Any], status_code: int = 200) -> ModelResponse:
+    """Ответ-список: ORM-объекты валидируются одним вызовом TypeAdapter,
+    готовые модели схемы schema — не валидируются вовсе."""
+    adapter = list_adapter(schema)
+    items = objs if isinstance(objs, list) else list(objs)
+    if not all(type(item) is schema for item in items):
+        items = adapter.validate_python(items, from_attributes=True)
+    return ModelResponse(items, adapter=adapter, status_code=status_code)
+
+
+def rows_response(rows: Sequence[Row], status_code: int = 200) -> ORJSONResponse:
+    """Ответ-список из строк Core: строка -> dict -> orjson.
+
+    Значения не валидируются, поэтому колонки должны совпадать с полями
+    схемы ответа — их даёт BaseService.columns_for. Наивные datetime и
+    float orjson кодирует так же, как pydantic.
+    """
+    if not rows:
+        return ORJSONResponse([], status_code=status_code)
+    keys = rows[0]._fields
+    return ORJSONResponse([dict(zip(keys, row)) for row in rows], status_code=status_code)
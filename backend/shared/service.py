@@ -1,27 +1,104 @@
-from typing import Generic, TypeVar, Type, Optional, List
+from datetime import datetime
+from typing import Any, Dict, Generic, Iterable, Iterator, Sequence, TypeVar, Type, Optional, List
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import any_, bindparam, select, update, delete, insert
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.exc import SQLAlchemyError
+from .cache import cache
 from .database import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+# Строк на один запрос в массовых операциях: держит число bind-параметров
+# заметно ниже предела Postgres (32767) даже для широких таблиц
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class BaseService(Generic[ModelType]):
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
-    async def create(self, db: AsyncSession, **kwargs) -> ModelType:
+    def cache_tags(self, obj: ModelType) -> Iterable[str]:
+        """Теги кэша, которые сбрасываются при изменении obj.
+
+        Методы записи ниже сбрасывают их сами после commit; при commit=False
+        и в собственных методах записи сервиса нужно вызвать invalidate_cache.
+        """
+        return ()
+
+    async def invalidate_cache(self, objs: Iterable[ModelType]) -> None:
+        tags = {tag for obj in objs for tag in self.cache_tags(obj)}
+        if tags:
+            await cache.invalidate(*tags)
+
+    def columns_for(self, schema: Type[BaseModel]) -> List[Any]:
+        """Колонки таблицы в порядке полей схемы ответа.
+
+        Для списков, которые читаются строками Core и отдаются через
+        rows_response: без ORM-объектов, identity map и моделей pydantic.
+        """
+        table = self.model.__table__
+        return [table.c[name] for name in schema.model_fields]
+
+    def _id_in(self, ids: Sequence[int]):
+        """id = ANY(:ids) — один параметр-массив вместо IN с параметром на каждый id,
+        поэтому текст запроса не зависит от числа id и хорошо кэшируется."""
+        return self.model.id == any_(
+            bindparam("ids", list(ids), type_=ARRAY(self.model.id.type))
+        )
+
+    async def create(self, db: AsyncSession, commit: bool = True, **kwargs) -> ModelType:
+        """INSERT ... RETURNING: строка со всеми значениями по умолчанию
+        возвращается тем же запросом, без отдельного SELECT на refresh."""
         try:
-            db_obj = self.model(**kwargs)
-            db.add(db_obj)
-            await db.commit()
-            await db.refresh(db_obj)
+            query = insert(self.model).values(**kwargs).returning(self.model)
+            result = await db.execute(query)
+            db_obj = result.scalar_one()
+            if commit:
+                await db.commit()
+                await self.invalidate_cache([db_obj])
             return db_obj
         except SQLAlchemyError as e:
             await db.rollback()
             raise e
 
+    async def create_many(
+        self,
+        db: AsyncSession,
+        rows: Sequence[Dict[str, Any]],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        commit: bool = True,
+    ) -> List[ModelType]:
+        """Многострочный INSERT ... RETURNING, по chunk_size строк на запрос.
+
+        Все пачки — одна транзакция. С commit=False фиксацию выполняет
+        вызывающий код (например, чтобы в той же транзакции обновить сводки).
+        Возвращённые объекты идут в порядке rows.
+        """
+        if not rows:
+            return []
+        try:
+            created: List[ModelType] = []
+            for chunk in _chunks(rows, chunk_size):
+                # Без sort_by_parameter_order Postgres не обещает, что
+                # RETURNING вернёт строки в порядке VALUES
+                query = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+                result = await db.execute(query, chunk)
+                created.extend(result.scalars().all())
+            if commit:
+                await db.commit()
+                await self.invalidate_cache(created)
+            return created
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise e
+
     async def get(self, db: AsyncSession, id: int) -> Optional[ModelType]:
         query = select(self.model).filter(self.model.id == id)
         result = await db.execute(query)
@@ -36,18 +113,126 @@ class BaseService(Generic[ModelType]):
         try:
             query = update(self.model).where(self.model.id == id).values(**kwargs).returning(self.model)
             result = await db.execute(query)
+            db_obj = result.scalar_one_or_none()
             await db.commit()
-            return result.scalar_one_or_none()
+            if db_obj is not None:
+                await self.invalidate_cache([db_obj])
+            return db_obj
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise e
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        ids: Sequence[int],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        commit: bool = True,
+        **kwargs,
+    ) -> List[ModelType]:
+        """Одинаковые значения для многих строк: UPDATE ... WHERE id = ANY(:ids) RETURNING."""
+        if not ids:
+            return []
+        try:
+            updated: List[ModelType] = []
+            for chunk in _chunks(list(ids), chunk_size):
+                query = (
+                    update(self.model)
+                    .where(self._id_in(chunk))
+                    .values(**kwargs)
+                    .returning(self.model)
+                    .execution_options(synchronize_session=False, populate_existing=True)
+                )
+                result = await db.execute(query)
+                updated.extend(result.scalars().all())
+            if commit:
+                await db.commit()
+                await self.invalidate_cache(updated)
+            return updated
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise e
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        rows: Sequence[Dict[str, Any]],
+        index_elements: Sequence[str],
+        update_columns: Optional[Sequence[str]] = None,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        commit: bool = True,
+    ) -> List[ModelType]:
+        """INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING.
+
+        update_columns — что обновлять при конфликте; по умолчанию все
+        переданные колонки, кроме ключа конфликта, id и created_at.
+        Если обновлять нечего, конфликтующие строки пропускаются и не
+        попадают в результат.
+        """
+        if not rows:
+            return []
+        if update_columns is None:
+            skip = set(index_elements) | {"id", "created_at"}
+            update_columns = [key for key in rows[0] if key not in skip]
+        try:
+            upserted: List[ModelType] = []
+            for chunk in _chunks(rows, chunk_size):
+                query = pg_insert(self.model)
+                if update_columns:
+                    set_ = {name: query.excluded[name] for name in update_columns}
+                    if "updated_at" in self.model.__table__.c and "updated_at" not in set_:
+                        set_["updated_at"] = datetime.utcnow()
+                    query = query.on_conflict_do_update(index_elements=index_elements, set_=set_)
+                else:
+                    query = query.on_conflict_do_nothing(index_elements=index_elements)
+                query = query.returning(self.model).execution_options(populate_existing=True)
+                result = await db.execute(query, chunk)
+                upserted.extend(result.scalars().all())
+            if commit:
+                await db.commit()
+                await self.invalidate_cache(upserted)
+            return upserted
         except SQLAlchemyError as e:
             await db.rollback()
             raise e
 
     async def delete(self, db: AsyncSession, id: int) -> bool:
         try:
-            query = delete(self.model).where(self.model.id == id)
+            query = delete(self.model).where(self.model.id == id).returning(self.model)
             result = await db.execute(query)
+            deleted = result.scalars().all()
             await db.commit()
-            return result.rowcount > 0
+            await self.invalidate_cache(deleted)
+            return len(deleted) > 0
+        except SQLAlchemyError as e:
+            await db.rollback()
+            raise e
+
+    async def delete_many(
+        self,
+        db: AsyncSession,
+        ids: Sequence[int],
+        chunk_size: int = BULK_CHUNK_SIZE,
+        commit: bool = True,
+    ) -> int:
+        """DELETE ... WHERE id = ANY(:ids) RETURNING. Возвращает число удалённых строк."""
+        if not ids:
+            return 0
+        try:
+            deleted: List[ModelType] = []
+            for chunk in _chunks(list(ids), chunk_size):
+                query = (
+                    delete(self.model)
+                    .where(self._id_in(chunk))
+                    .returning(self.model)
+                    .execution_options(synchronize_session=False)
+                )
+                result = await db.execute(query)
+                deleted.extend(result.scalars().all())
+            if commit:
+                await db.commit()
+                await self.invalidate_cache(deleted)
+            return len(deleted)
         except SQLAlchemyError as e:
             await db.rollback()
-            raise e 
\ No newline at end of file
+            raise e
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+import pytest_asyncio
+
+from shared import lru, ratelimit
+
+# Тесты с БД идут только с отдельной базой: таблицы в ней пересоздаются
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # shared.database читает DATABASE_URL при импорте
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+_schema_created = False
+
+
+class FakeClock:
+    """Подменяет time.monotonic в модулях кэша и лимитов."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(lru, "time", fake)
+    monkeypatch.setattr(ratelimit, "time", fake)
+    return fake
+
+
+async def _create_schema(engine, metadata) -> None:
+    from sqlalchemy import text
+
+    global _schema_created
+    if _schema_created:
+        return
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+    _schema_created = True
+
+
+@pytest_asyncio.fixture
+async def db():
+    """Сессия к TEST_DATABASE_URL; после теста все таблицы очищаются."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import text
+
+    # Все модели, чтобы create_all знал о внешних ключах между сервисами
+    from services.auth import models as auth_models  # noqa: F401
+    from services.hive import models as hive_models  # noqa: F401
+    from services.monitoring import models as monitoring_models  # noqa: F401
+    from services.notification import models as notification_models  # noqa: F401
+    from shared import auth, deletion  # noqa: F401
+    from shared.database import Base, SessionLocal, engine, read_engine
+
+    await _create_schema(engine, Base.metadata)
+    try:
+        async with SessionLocal() as session:
+            yield session
+    finally:
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        async with engine.begin() as conn:
+            await conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        # Соединения пула привязаны к event loop теста
+        await engine.dispose()
+        await read_engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def user(db):
+    """Пользователь в тестовой БД, без хеширования пароля."""
+    from services.auth.models import User
+
+    db_user = User(username="alice", email="alice@example.com", hashed_password="-")
+    db.add(db_user)
+    await db.commit()
+    return db_user
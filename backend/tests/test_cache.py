@@ -0,0 +1,129 @@
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from services.notification.service import USER_SETTINGS
+from shared.cache import Cache, InMemoryBackend, user_tag
+
+HIVES = TypeAdapter(List[str])
+
+
+def make_cache(backend: InMemoryBackend) -> Cache:
+    return Cache(backend, local_maxsize=100, local_ttl=5, ttls={"hive_list": 30, "disabled": 0})
+
+
+class Loader:
+    """Источник данных, считающий обращения к «БД»."""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.mark.asyncio
+async def test_miss_then_local_hit():
+    cache = make_cache(InMemoryBackend())
+    loader = Loader(["Hive 1"])
+    tags = [user_tag("hives", 1)]
+    assert await cache.get_or_load("hive_list", "1", loader, HIVES, tags=tags) == ["Hive 1"]
+    assert await cache.get_or_load("hive_list", "1", loader, HIVES, tags=tags) == ["Hive 1"]
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_other_process_hits_shared_backend():
+    backend = InMemoryBackend()
+    first, second = make_cache(backend), make_cache(backend)
+    loader = Loader(["Hive 1"])
+    await first.get_or_load("hive_list", "1", loader, HIVES)
+    assert await second.get_or_load("hive_list", "1", loader, HIVES) == ["Hive 1"]
+    assert loader.calls == 1
+    assert second.stats()["entities"]["hive_list"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_local_entry_is_read_from_backend(clock):
+    cache = make_cache(InMemoryBackend())
+    loader = Loader(["Hive 1"])
+    await cache.get_or_load("hive_list", "1", loader, HIVES)
+    clock.advance(5)
+    assert await cache.get_or_load("hive_list", "1", loader, HIVES) == ["Hive 1"]
+    assert loader.calls == 1
+    counts = cache.stats()["entities"]["hive_list"]
+    assert (counts["local_hits"], counts["hits"], counts["misses"]) == (0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_tag_bump_invalidates_both_levels():
+    backend = InMemoryBackend()
+    writer, reader = make_cache(backend), make_cache(backend)
+    tag = user_tag("hives", 1)
+    loader = Loader(["Hive 1"])
+    await writer.get_or_load("hive_list", "1", loader, HIVES, tags=[tag])
+    await reader.get_or_load("hive_list", "1", loader, HIVES, tags=[tag])
+
+    loader.value = ["Hive 1", "Hive 2"]
+    await writer.invalidate(tag)
+    # L1 процесса, сделавшего запись, и общий бэкенд
+    assert await writer.get_or_load("hive_list", "1", loader, HIVES, tags=[tag]) == ["Hive 1", "Hive 2"]
+    assert loader.calls == 2
+
+    # L1 другого процесса сбрасывается событием шины
+    reader.apply_remote([tag])
+    assert await reader.get_or_load("hive_list", "1", loader, HIVES, tags=[tag]) == ["Hive 1", "Hive 2"]
+    assert loader.calls == 2
+    assert reader.stats()["remote_invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unrelated_tag_keeps_entry():
+    cache = make_cache(InMemoryBackend())
+    loader = Loader(["Hive 1"])
+    await cache.get_or_load("hive_list", "1", loader, HIVES, tags=[user_tag("hives", 1)])
+    await cache.invalidate(user_tag("hives", 2))
+    await cache.get_or_load("hive_list", "1", loader, HIVES, tags=[user_tag("hives", 1)])
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_none_is_a_hit():
+    backend = InMemoryBackend()
+    first, second = make_cache(backend), make_cache(backend)
+    loader = Loader(None)
+    tags = [user_tag("notification_settings", 1)]
+    for cache in (first, first, second):
+        assert await cache.get_or_load("notification_settings", "1", loader, USER_SETTINGS, tags=tags) is None
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_zero_ttl_is_not_cached():
+    cache = make_cache(InMemoryBackend())
+    loader = Loader(["Hive 1"])
+    await cache.get_or_load("disabled", "1", loader, HIVES)
+    await cache.get_or_load("disabled", "1", loader, HIVES)
+    assert loader.calls == 2
+    assert "disabled" not in cache.stats()["entities"]
+
+
+@pytest.mark.asyncio
+async def test_stats():
+    cache = make_cache(InMemoryBackend())
+    loader = Loader(["Hive 1"])
+    for _ in range(4):
+        await cache.get_or_load("hive_list", "1", loader, HIVES)
+    await cache.invalidate(user_tag("hives", 1))
+    assert cache.stats() == {
+        "backend": "memory",
+        "local_entries": 1,
+        "invalidations": 1,
+        "remote_invalidations": 0,
+        "entities": {
+            "hive_list": {"local_hits": 3, "hits": 0, "misses": 1, "errors": 0, "hit_ratio": 0.75},
+        },
+    }
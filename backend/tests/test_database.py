@@ -0,0 +1,37 @@
+import pytest
+from starlette.requests import Request
+
+from services.auth.service import UserService
+from shared.database import _client_key
+from shared.replicas import RecentWriters
+
+
+def make_request(authorization=None) -> Request:
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "method": "GET", "headers": headers, "client": ("10.0.0.1", 5000)})
+
+
+def access_token(user_id: int) -> str:
+    return UserService().create_access_token({"sub": "alice", "uid": user_id})
+
+
+def test_client_key_uses_user_id_from_token():
+    first, rotated = access_token(1), access_token(1)
+    assert first != rotated
+    assert _client_key(make_request(f"Bearer {first}")) == "user:1"
+    assert _client_key(make_request(f"Bearer {rotated}")) == "user:1"
+    assert _client_key(make_request(f"Bearer {access_token(2)}")) == "user:2"
+
+
+def test_client_key_falls_back_to_client_host():
+    assert _client_key(make_request()) == "host:10.0.0.1"
+    assert _client_key(make_request("Bearer not-a-jwt")) == "host:10.0.0.1"
+    assert _client_key(make_request("Basic YWxpY2U6c2VjcmV0")) == "host:10.0.0.1"
+
+
+@pytest.mark.asyncio
+async def test_write_marker_survives_token_rotation():
+    writers = RecentWriters(ttl=10)
+    await writers.mark(_client_key(make_request(f"Bearer {access_token(1)}")))
+    assert await writers.seen(_client_key(make_request(f"Bearer {access_token(1)}")))
+    assert not await writers.seen(_client_key(make_request(f"Bearer {access_token(2)}")))
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select, update
+
+from services.hive import models as hive_models, schemas as hive_schemas
+from services.hive.service import HiveService
+from services.monitoring import models as monitoring_models
+from services.monitoring.service import SensorService
+from shared import deletion
+from shared.deletion import DeletionJob, resume_deletion_jobs, run_deletion_job
+from shared.profiler import profile_queries
+
+hive_service = HiveService()
+sensor_service = SensorService()
+
+
+async def create_hive_with_data(db, user_id: int, measurements: int = 25, inspections: int = 3):
+    hive = await hive_service.create_hive(db, hive_schemas.HiveCreate(
+        name="Hive", location="Apiary", queen_year=2023, frames_count=10,
+    ), user_id)
+    sensor = monitoring_models.Sensor(hive_id=hive.id, user_id=user_id, name="Scale", sensor_type="weight")
+    db.add(sensor)
+    await db.flush()
+    if measurements:
+        await db.execute(insert(monitoring_models.Measurement), [
+            {"sensor_id": sensor.id, "value": i, "battery_level": 90} for i in range(measurements)
+        ])
+    await db.execute(insert(monitoring_models.Alert), [
+        {"sensor_id": sensor.id, "hive_id": hive.id, "alert_type": "weight", "user_id": user_id},
+    ])
+    if inspections:
+        await db.execute(insert(hive_models.Inspection), [
+            {"hive_id": hive.id, "user_id": user_id, "temperature": 34, "humidity": 60, "weight": 40}
+            for _ in range(inspections)
+        ])
+    await db.commit()
+    return hive.id, sensor.id
+
+
+async def count(db, model) -> int:
+    return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+
+async def job_state(db, job_id: int) -> DeletionJob:
+    db.expire_all()
+    return await db.get(DeletionJob, job_id)
+
+
+@pytest.mark.asyncio
+async def test_scheduled_hive_is_hidden_from_reads(db, user):
+    hive_id, sensor_id = await create_hive_with_data(db, user.id)
+    job = await hive_service.schedule_delete(db, hive_id, user.id)
+
+    assert job.status == deletion.STATUS_PENDING
+    assert await hive_service.get(db, hive_id) is None
+    assert await hive_service.get_hives_by_user(db, user.id) == []
+    assert await hive_service.get_owned_hive_ids(db, [hive_id], user.id) == set()
+    # Датчики улья скрыты вместе с ним
+    assert await sensor_service.get_sensor(db, sensor_id, user.id) is None
+    assert await sensor_service.get_sensors_by_user(db, user.id) == []
+    # Сами строки ещё на месте
+    assert await count(db, monitoring_models.Measurement) == 25
+
+
+@pytest.mark.asyncio
+async def test_hive_deletion_runs_in_batches(db, user):
+    hive_id, _ = await create_hive_with_data(db, user.id, measurements=25, inspections=3)
+    other_hive_id, _ = await create_hive_with_data(db, user.id, measurements=2, inspections=1)
+    job = await hive_service.schedule_delete(db, hive_id, user.id)
+
+    with profile_queries() as profile:
+        await run_deletion_job(job.id, batch_size=10)
+
+    # 10 + 10 + 5 показаний — три пачки, каждая в своей транзакции
+    measurement_deletes = [s for s in profile.statements if s.startswith("DELETE FROM measurements")]
+    assert len(measurement_deletes) == 3
+
+    job = await job_state(db, job.id)
+    assert job.status == deletion.STATUS_COMPLETED
+    assert job.finished_at is not None
+    assert job.deleted_rows == 25 + 1 + 3 + 1 + 1
+    assert [row for row in (await db.execute(select(hive_models.Hive.id))).scalars()] == [other_hive_id]
+    assert await count(db, monitoring_models.Measurement) == 2
+    assert await count(db, hive_models.Inspection) == 1
+    assert await count(db, monitoring_models.Alert) == 1
+
+
+@pytest.mark.asyncio
+async def test_sensor_deletion_keeps_hive(db, user):
+    hive_id, sensor_id = await create_hive_with_data(db, user.id)
+    job = await sensor_service.schedule_delete(db, sensor_id, user.id)
+    await run_deletion_job(job.id, batch_size=10)
+
+    assert (await job_state(db, job.id)).status == deletion.STATUS_COMPLETED
+    assert await count(db, monitoring_models.Sensor) == 0
+    assert await count(db, monitoring_models.Measurement) == 0
+    assert await hive_service.get(db, hive_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_completed_job_is_not_run_again(db, user):
+    hive_id, _ = await create_hive_with_data(db, user.id)
+    job = await hive_service.schedule_delete(db, hive_id, user.id)
+    await run_deletion_job(job.id)
+    finished_at = (await job_state(db, job.id)).finished_at
+
+    await run_deletion_job(job.id)
+    assert (await job_state(db, job.id)).finished_at == finished_at
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_after_delay(db, user, monkeypatch):
+    hive_id, _ = await create_hive_with_data(db, user.id)
+    job = await hive_service.schedule_delete(db, hive_id, user.id)
+
+    delete_batch = deletion._delete_batch
+    calls = 0
+
+    async def failing_once(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("connection lost")
+        return await delete_batch(*args, **kwargs)
+
+    monkeypatch.setattr(deletion, "_delete_batch", failing_once)
+    await run_deletion_job(job.id, batch_size=10)
+    failed = await job_state(db, job.id)
+    assert failed.status == deletion.STATUS_FAILED
+    assert failed.error_message == "connection lost"
+
+    # Сразу после ошибки задачу не берут
+    await resume_deletion_jobs(["hive"])
+    assert (await job_state(db, job.id)).status == deletion.STATUS_FAILED
+
+    await db.execute(
+        update(DeletionJob)
+        .where(DeletionJob.id == job.id)
+        .values(updated_at=datetime.utcnow() - deletion.FAILED_JOB_RETRY_DELAY - timedelta(seconds=1))
+    )
+    await db.commit()
+    await resume_deletion_jobs(["hive"])
+
+    retried = await job_state(db, job.id)
+    assert retried.status == deletion.STATUS_COMPLETED
+    assert retried.error_message is None
+    assert await count(db, hive_models.Hive) == 0
+    assert await count(db, monitoring_models.Measurement) == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_running_job_is_resumed(db, user):
+    hive_id, _ = await create_hive_with_data(db, user.id)
+    job = await hive_service.schedule_delete(db, hive_id, user.id)
+
+    async def set_running(updated_at: datetime) -> None:
+        await db.execute(
+            update(DeletionJob)
+            .where(DeletionJob.id == job.id)
+            .values(status=deletion.STATUS_RUNNING, updated_at=updated_at)
+        )
+        await db.commit()
+
+    # Задача живого воркера
+    await set_running(datetime.utcnow())
+    await resume_deletion_jobs(["hive"])
+    assert (await job_state(db, job.id)).status == deletion.STATUS_RUNNING
+
+    # Брошенная после падения процесса
+    await set_running(datetime.utcnow() - deletion.STALE_JOB_TIMEOUT - timedelta(seconds=1))
+    await resume_deletion_jobs(["hive"])
+    assert (await job_state(db, job.id)).status == deletion.STATUS_COMPLETED
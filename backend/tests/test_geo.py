@@ -0,0 +1,52 @@
+import pytest
+
+from shared.geo import bbox_around, geohash_bounds, geohash_center, geohash_encode, haversine_km
+
+
+def test_geohash_encode_known_value():
+    assert geohash_encode(57.64911, 10.40744, precision=11) == "u4pruydqqvj"
+
+
+def test_geohash_prefixes_are_coarser_cells():
+    geohash = geohash_encode(55.7558, 37.6173)
+    assert len(geohash) == 9
+    assert geohash_encode(55.7558, 37.6173, precision=5) == geohash[:5]
+
+
+def test_geohash_bounds_contain_point():
+    latitude, longitude = 55.7558, 37.6173
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash_encode(latitude, longitude))
+    assert min_lat <= latitude <= max_lat
+    assert min_lon <= longitude <= max_lon
+    center_lat, center_lon = geohash_center(geohash_encode(latitude, longitude))
+    assert center_lat == pytest.approx(latitude, abs=1e-4)
+    assert center_lon == pytest.approx(longitude, abs=1e-4)
+
+
+def test_haversine_km():
+    assert haversine_km(55.0, 37.0, 55.0, 37.0) == 0
+    # Один градус широты
+    assert haversine_km(0.0, 0.0, 1.0, 0.0) == pytest.approx(111.2, abs=0.1)
+    # Через антимеридиан — короткий путь
+    assert haversine_km(0.0, 179.5, 0.0, -179.5) == pytest.approx(111.2, abs=0.1)
+
+
+def test_bbox_around_contains_circle():
+    min_lat, min_lon, max_lat, max_lon = bbox_around(55.0, 37.0, 10)
+    assert min_lat < 55.0 < max_lat
+    assert min_lon < 37.0 < max_lon
+    assert haversine_km(55.0, 37.0, max_lat, 37.0) >= 10 - 1e-9
+    assert haversine_km(55.0, 37.0, 55.0, max_lon) >= 10 - 1e-9
+
+
+def test_bbox_around_crosses_antimeridian():
+    min_lat, min_lon, max_lat, max_lon = bbox_around(0.0, 179.9, 50)
+    assert min_lon > max_lon
+    assert min_lon < 179.9
+    assert -180 < max_lon < -179
+
+
+def test_bbox_around_pole_covers_all_longitudes():
+    min_lat, min_lon, max_lat, max_lon = bbox_around(89.9, 0.0, 50)
+    assert max_lat == 90.0
+    assert (min_lon, max_lon) == (-180.0, 180.0)
@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from services.hive.main import app
+from shared.auth import get_current_active_user
+from shared.database import get_read_conn, get_read_db
+
+
+async def _no_db():
+    yield None
+
+
+@pytest.fixture
+def client():
+    # Проверка параметров идёт до обращения к БД, поэтому БД не нужна
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    app.dependency_overrides[get_read_db] = _no_db
+    app.dependency_overrides[get_read_conn] = _no_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("url", [
+    "/hives/?skip=-1",
+    "/hives/?limit=0",
+    "/hives/1?inspections_skip=-1",
+    "/hives/1?inspections_limit=0",
+    "/hives/1?inspections_limit=101",
+    "/hives/1/inspections/?skip=-1",
+    "/search/hives?q=hive&limit=0",
+    "/search/hives?q=hive&limit=101",
+    "/geo/hives/bbox?min_lat=0&min_lon=0&max_lat=1&max_lon=1&limit=5001",
+    "/geo/hives/nearby?lat=0&lon=0&k=0",
+])
+def test_out_of_range_paging_is_rejected(client, url):
+    assert client.get(url).status_code == 422
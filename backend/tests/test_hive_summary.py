@@ -0,0 +1,183 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from services.hive import models, schemas
+from services.hive.service import (
+    HiveService,
+    InspectionService,
+    apply_inspections_to_summary,
+    recalculate_hive_summaries,
+)
+
+hive_service = HiveService()
+inspection_service = InspectionService()
+
+SUMMARY_FIELDS = (
+    "inspection_count", "last_inspection_at", "last_inspection_status",
+    "avg_temperature", "avg_humidity", "avg_weight",
+    "temperature_count", "humidity_count", "weight_count",
+)
+START = datetime(2024, 5, 1, 12, 0)
+
+
+async def create_hive(db, user) -> int:
+    hive = await hive_service.create_hive(db, schemas.HiveCreate(
+        name="Hive", location="Apiary", queen_year=2023, frames_count=10,
+    ), user.id)
+    return hive.id
+
+
+async def summary(db, hive_id: int) -> dict:
+    columns = [getattr(models.Hive, field) for field in SUMMARY_FIELDS]
+    row = (await db.execute(select(*columns).filter(models.Hive.id == hive_id))).one()
+    return dict(zip(SUMMARY_FIELDS, row))
+
+
+def batch_item(hive_id: int, temperature: float, hours: int, status: str = "healthy"):
+    return schemas.InspectionBatchItem(
+        hive_id=hive_id, temperature=temperature, humidity=60, weight=40,
+        status=status, created_at=START + timedelta(hours=hours),
+    )
+
+
+async def add_raw_inspections(db, user, hive_id: int, readings) -> None:
+    """Осмотры в обход схем — в том числе с пустыми показаниями из старых данных."""
+    inspections = [
+        models.Inspection(
+            hive_id=hive_id, user_id=user.id, temperature=temperature, humidity=humidity,
+            weight=weight, status="healthy", created_at=START + timedelta(hours=hours),
+        )
+        for hours, (temperature, humidity, weight) in enumerate(readings)
+    ]
+    db.add_all(inspections)
+    await db.flush()
+    await apply_inspections_to_summary(db, inspections)
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_new_hive_has_empty_summary(db, user):
+    hive_id = await create_hive(db, user)
+    assert await summary(db, hive_id) == {
+        "inspection_count": 0, "last_inspection_at": None, "last_inspection_status": None,
+        "avg_temperature": None, "avg_humidity": None, "avg_weight": None,
+        "temperature_count": 0, "humidity_count": 0, "weight_count": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_inspection_updates_summary(db, user):
+    hive_id = await create_hive(db, user)
+    for temperature, status in ((34.0, "healthy"), (36.0, "warning")):
+        await inspection_service.create_inspection(db, schemas.InspectionCreate(
+            hive_id=hive_id, temperature=temperature, humidity=60, weight=40, status=status,
+        ), user.id)
+
+    result = await summary(db, hive_id)
+    assert result["inspection_count"] == 2
+    assert result["last_inspection_status"] == "warning"
+    assert result["avg_temperature"] == pytest.approx(35.0)
+    assert result["temperature_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_create_keeps_latest_by_time(db, user):
+    hive_id = await create_hive(db, user)
+    await inspection_service.create_inspections(db, [
+        batch_item(hive_id, 30, hours=5, status="critical"),
+        batch_item(hive_id, 32, hours=1),
+    ], user.id)
+    # Более ранний осмотр, загруженный позже, не становится последним
+    await inspection_service.create_inspections(db, [batch_item(hive_id, 40, hours=3)], user.id)
+
+    result = await summary(db, hive_id)
+    assert result["inspection_count"] == 3
+    assert result["last_inspection_at"] == START + timedelta(hours=5)
+    assert result["last_inspection_status"] == "critical"
+    assert result["avg_temperature"] == pytest.approx(34.0)
+
+
+@pytest.mark.asyncio
+async def test_update_recalculates_summary(db, user):
+    hive_id = await create_hive(db, user)
+    first, second = await inspection_service.create_inspections(db, [
+        batch_item(hive_id, 30, hours=1),
+        batch_item(hive_id, 32, hours=2),
+    ], user.id)
+
+    await inspection_service.update_inspection(
+        db, second.id, schemas.InspectionUpdate(temperature=40, status="critical"), user.id
+    )
+
+    result = await summary(db, hive_id)
+    assert result["avg_temperature"] == pytest.approx(35.0)
+    assert result["last_inspection_status"] == "critical"
+    assert result["inspection_count"] == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_recalculates_summary(db, user):
+    hive_id = await create_hive(db, user)
+    first, second = await inspection_service.create_inspections(db, [
+        batch_item(hive_id, 30, hours=1, status="warning"),
+        batch_item(hive_id, 32, hours=2),
+    ], user.id)
+
+    assert await inspection_service.delete_inspection(db, second.id, user.id)
+    result = await summary(db, hive_id)
+    assert result["inspection_count"] == 1
+    assert result["last_inspection_at"] == START + timedelta(hours=1)
+    assert result["last_inspection_status"] == "warning"
+    assert result["avg_temperature"] == pytest.approx(30.0)
+
+    assert await inspection_service.delete_inspection(db, first.id, user.id)
+    result = await summary(db, hive_id)
+    assert result["inspection_count"] == 0
+    assert result["last_inspection_at"] is None
+    assert result["avg_temperature"] is None
+    assert result["temperature_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_null_readings_are_left_out_of_averages(db, user):
+    hive_id = await create_hive(db, user)
+    await add_raw_inspections(db, user, hive_id, [(30.0, None, 40.0), (None, None, 44.0)])
+    await add_raw_inspections(db, user, hive_id, [(36.0, 70.0, None)])
+
+    result = await summary(db, hive_id)
+    assert result["inspection_count"] == 3
+    # Среднее делится на число непустых значений поля, а не осмотров
+    assert result["avg_temperature"] == pytest.approx(33.0)
+    assert result["avg_humidity"] == pytest.approx(70.0)
+    assert result["avg_weight"] == pytest.approx(42.0)
+    assert (result["temperature_count"], result["humidity_count"], result["weight_count"]) == (2, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_recalculation_matches_incremental_summary(db, user):
+    hive_ids = [await create_hive(db, user) for _ in range(3)]
+    rng = random.Random(42)
+
+    def reading(low, high):
+        return None if rng.random() < 0.2 else round(rng.uniform(low, high), 2)
+
+    for hive_id in hive_ids:
+        for _ in range(3):
+            await add_raw_inspections(db, user, hive_id, [
+                (reading(30, 38), reading(40, 80), reading(20, 60))
+                for _ in range(rng.randint(1, 5))
+            ])
+    incremental = [await summary(db, hive_id) for hive_id in hive_ids]
+
+    await recalculate_hive_summaries(db)
+    await db.commit()
+    recalculated = [await summary(db, hive_id) for hive_id in hive_ids]
+
+    for before, after in zip(incremental, recalculated):
+        assert after == {
+            field: pytest.approx(value) if isinstance(value, float) else value
+            for field, value in before.items()
+        }
@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from services.hive import models, schemas
+from services.hive.main import app
+from services.hive.service import MAX_INSPECTIONS_BATCH, HiveService, parse_inspections_csv
+from shared.auth import TokenUser, get_current_active_user
+from shared.database import get_db
+
+HEADER = "hive_id,temperature,humidity,weight,notes,status,created_at\n"
+
+
+def test_parse_csv_with_optional_columns():
+    items = parse_inspections_csv(
+        HEADER
+        + "1,34.5,60,40.2,Queen seen,warning,2024-05-01T12:00:00\n"
+        + "2,35,61,41,,,\n"
+    )
+    assert [(i.hive_id, i.temperature, i.notes, i.status) for i in items] == [
+        (1, 34.5, "Queen seen", "warning"),
+        (2, 35.0, None, "healthy"),
+    ]
+    assert items[0].created_at == datetime(2024, 5, 1, 12, 0)
+    assert items[1].created_at is None
+
+
+def test_parse_csv_reports_bad_rows_by_line():
+    with pytest.raises(ValueError) as error:
+        parse_inspections_csv(
+            HEADER
+            + "1,34.5,60,40,,,\n"
+            + "x,34.5,60,40,,,\n"
+            + "1,34.5,,40,,unknown,\n"
+        )
+    message = str(error.value)
+    assert "line 3: hive_id" in message
+    assert "line 4: humidity" in message
+    assert "line 4: status" in message
+    assert "line 2" not in message
+
+
+def test_parse_csv_requires_reading_columns():
+    with pytest.raises(ValueError, match="Missing CSV columns: humidity, weight"):
+        parse_inspections_csv("hive_id,temperature\n1,34\n")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-05-01T12:00:00+03:00", datetime(2024, 5, 1, 9, 0)),
+    ("2024-05-01T12:00:00Z", datetime(2024, 5, 1, 12, 0)),
+    ("2024-05-01T23:30:00-02:00", datetime(2024, 5, 2, 1, 30)),
+    ("2024-05-01T12:00:00", datetime(2024, 5, 1, 12, 0)),
+])
+def test_batch_item_created_at_is_naive_utc(value, expected):
+    item = schemas.InspectionBatchItem(hive_id=1, temperature=34, humidity=60, weight=40, created_at=value)
+    assert item.created_at == expected
+    assert item.created_at.tzinfo is None
+
+
+@pytest.fixture
+def offline_client():
+    """Клиент без БД: ответы, которые отдаются до обращения к ней."""
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_current_active_user] = lambda: TokenUser(id=1, username="alice")
+    app.dependency_overrides[get_db] = no_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_batch_over_limit_is_rejected(offline_client):
+    item = {"hive_id": 1, "temperature": 34, "humidity": 60, "weight": 40}
+    response = offline_client.post("/inspections/batch", json={"inspections": [item] * (MAX_INSPECTIONS_BATCH + 1)})
+    assert response.status_code == 413
+
+
+def test_import_over_limit_is_rejected(offline_client):
+    content = HEADER + "1,34,60,40,,,\n" * (MAX_INSPECTIONS_BATCH + 1)
+    response = offline_client.post("/inspections/import", files={"file": ("inspections.csv", content, "text/csv")})
+    assert response.status_code == 413
+
+
+def test_import_invalid_csv_is_rejected(offline_client):
+    response = offline_client.post(
+        "/inspections/import", files={"file": ("inspections.csv", HEADER + "1,hot,60,40,,,\n", "text/csv")}
+    )
+    assert response.status_code == 422
+    assert "line 2: temperature" in response.json()["detail"]
+
+
+@pytest_asyncio.fixture
+async def client(db, user):
+    async def session():
+        yield db
+
+    app.dependency_overrides[get_current_active_user] = lambda: TokenUser(id=user.id, username=user.username)
+    app.dependency_overrides[get_db] = session
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://hive") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def create_hive(db, user_id: int) -> int:
+    hive = await HiveService().create_hive(db, schemas.HiveCreate(
+        name="Hive", location="Apiary", queen_year=2023, frames_count=10,
+    ), user_id)
+    return hive.id
+
+
+@pytest.mark.asyncio
+async def test_import_creates_inspections(client, db, user):
+    hive_id = await create_hive(db, user.id)
+    content = (
+        "\ufeff" + HEADER
+        + f"{hive_id},34,60,40,,,2024-05-01T12:00:00+03:00\n"
+        + f"{hive_id},35,61,41,Calm,,2024-05-02T08:00:00Z\n"
+    )
+    response = await client.post("/inspections/import", files={"file": ("inspections.csv", content, "text/csv")})
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
+
+    rows = (await db.execute(
+        select(models.Inspection.created_at, models.Inspection.notes).order_by(models.Inspection.id)
+    )).all()
+    assert rows == [(datetime(2024, 5, 1, 9, 0), None), (datetime(2024, 5, 2, 8, 0), "Calm")]
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_inspections_in_request_order(client, db, user):
+    hive_id = await create_hive(db, user.id)
+    temperatures = [30 + i for i in range(20)]
+    response = await client.post("/inspections/batch", json={"inspections": [
+        {"hive_id": hive_id, "temperature": t, "humidity": 60, "weight": 40} for t in temperatures
+    ]})
+    assert response.status_code == 200
+    assert [item["temperature"] for item in response.json()] == temperatures
+
+
+@pytest.mark.asyncio
+async def test_batch_for_foreign_hive_is_not_found(client, db, user):
+    from services.auth.models import User
+
+    other = User(username="bob", email="bob@example.com", hashed_password="-")
+    db.add(other)
+    await db.commit()
+    foreign_hive_id = await create_hive(db, other.id)
+
+    response = await client.post("/inspections/batch", json={"inspections": [
+        {"hive_id": foreign_hive_id, "temperature": 34, "humidity": 60, "weight": 40},
+    ]})
+    assert response.status_code == 404
+    assert (await db.execute(select(models.Inspection.id))).first() is None
@@ -0,0 +1,53 @@
+import importlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from shared import lifecycle
+
+
+@pytest.fixture
+def started(monkeypatch):
+    calls = []
+    monkeypatch.setattr(lifecycle, "run_revocation_refresher", lambda: _noop(calls, "revocations"))
+    monkeypatch.setattr(lifecycle, "run_deletion_sweeper", lambda entities: _noop(calls, ("deletions", entities)))
+    monkeypatch.setattr(lifecycle, "start_replica_health_checks", lambda app: calls.append("replicas"))
+    monkeypatch.setattr(lifecycle, "start_invalidation_bus", lambda: calls.append("bus"))
+    return calls
+
+
+async def _noop(calls, name):
+    calls.append(name)
+
+
+def test_lifespan_starts_and_stops_background_tasks(started):
+    app = FastAPI()
+    lifecycle.setup_lifecycle(app, deletion_entities=["hive"])
+    with TestClient(app):
+        assert len(app.state.background_tasks) == 2
+    assert sorted(map(str, started)) == sorted(map(str, ["replicas", "bus", "revocations", ("deletions", ["hive"])]))
+    assert app.state.background_tasks == []
+
+
+def test_revocations_can_be_disabled(started):
+    app = FastAPI()
+    lifecycle.setup_lifecycle(app, revocations=False)
+    with TestClient(app):
+        pass
+    assert started == ["replicas", "bus"]
+
+
+def test_metrics_endpoints():
+    app = FastAPI()
+    lifecycle.setup_lifecycle(app)
+    client = TestClient(app)
+    for path in ("/metrics/db-pool", "/metrics/invalidation", "/metrics/db-replicas", "/metrics/cache"):
+        assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize("service", ["auth", "hive", "monitoring", "notification"])
+def test_services_start_tasks_in_lifespan(service):
+    app = importlib.import_module(f"services.{service}.main").app
+    # Без устаревших @app.on_event("startup")
+    assert app.router.on_startup == []
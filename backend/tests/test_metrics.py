@@ -0,0 +1,69 @@
+import pytest
+
+from shared.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter_with_labels():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ["method", "status"], registry=registry)
+    requests.labels("GET", "200").inc()
+    requests.labels("GET", "200").inc(2)
+    requests.labels("POST", "201").inc()
+    assert registry.render() == (
+        "# HELP requests_total Requests\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET",status="200"} 3\n'
+        'requests_total{method="POST",status="201"} 1\n'
+    )
+
+
+def test_unlabeled_metrics_start_at_zero():
+    registry = Registry()
+    Counter("events_total", "Events", registry=registry)
+    gauge = Gauge("in_flight", "In flight", registry=registry)
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    lines = registry.render().splitlines()
+    assert "events_total 0" in lines
+    assert "in_flight 1" in lines
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    Counter("errors_total", "Errors", ["message"], registry=registry).labels('bad "quote"\n').inc()
+    assert 'errors_total{message="bad \\"quote\\"\\n"} 1' in registry.render().splitlines()
+
+
+def test_wrong_label_count_is_rejected():
+    counter = Counter("requests_total", "Requests", ["method"])
+    with pytest.raises(ValueError):
+        counter.labels("GET", "200")
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram("latency_seconds", "Latency", ["route"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels("/hives/").observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/hives/",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/hives/",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/hives/",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/hives/"} 3.65' in lines
+    assert 'latency_seconds_count{route="/hives/"} 4' in lines
+
+
+def test_collectors_are_rendered_on_each_scrape():
+    registry = Registry()
+    calls = []
+
+    def collect():
+        calls.append(1)
+        gauge = Gauge("pool_size", "Pool size")
+        gauge.set(len(calls))
+        return [gauge]
+
+    registry.register_collector(collect)
+    assert "pool_size 1" in registry.render().splitlines()
+    assert "pool_size 2" in registry.render().splitlines()
@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from services.monitoring.main import app
+from shared.auth import get_current_active_user
+from shared.database import get_read_conn, get_read_db
+
+
+async def _no_db():
+    yield None
+
+
+@pytest.fixture
+def client():
+    # Проверка параметров идёт до обращения к БД, поэтому БД не нужна
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    app.dependency_overrides[get_read_db] = _no_db
+    app.dependency_overrides[get_read_conn] = _no_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("url", [
+    "/sensors/?skip=-1",
+    "/sensors/?limit=0",
+    "/sensors/?limit=1001",
+    "/sensors/1/measurements/?limit=0",
+    "/sensors/1/measurements/?limit=1001",
+    "/measurements/?skip=-1",
+    "/measurements/?limit=0",
+    "/alerts/?skip=-1",
+    "/alerts/?limit=1001",
+])
+def test_out_of_range_paging_is_rejected(client, url):
+    assert client.get(url).status_code == 422
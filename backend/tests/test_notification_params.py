@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from services.notification.main import app
+from shared.auth import get_current_active_user
+from shared.database import get_db, get_read_db
+
+
+async def _no_db():
+    yield None
+
+
+@pytest.fixture
+def client():
+    # Проверка параметров идёт до обращения к БД, поэтому БД не нужна
+    app.dependency_overrides[get_current_active_user] = lambda: None
+    app.dependency_overrides[get_db] = _no_db
+    app.dependency_overrides[get_read_db] = _no_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("url", [
+    "/templates/?skip=-1",
+    "/templates/?limit=0",
+    "/notifications/?skip=-1",
+    "/notifications/?limit=1001",
+    "/notifications/pending/?limit=0",
+    "/notifications/pending/?limit=1001",
+])
+def test_out_of_range_paging_is_rejected(client, url):
+    assert client.get(url).status_code == 422
@@ -0,0 +1,93 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from shared.profiler import profile_queries, record_requests, setup_query_profiler, statement_shape
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE hives (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO hives (name) VALUES ('a'), ('b'), ('c')"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(engine) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/hives/")
+    def list_hives():
+        with engine.connect() as conn:
+            return [dict(row) for row in conn.execute(text("SELECT id, name FROM hives")).mappings()]
+
+    @app.get("/hives/names/")
+    def list_hive_names():
+        # Намеренный N+1: имя каждого улья отдельным запросом
+        with engine.connect() as conn:
+            ids = conn.execute(text("SELECT id FROM hives")).scalars().all()
+            return [
+                conn.execute(text("SELECT name FROM hives WHERE id = :id"), {"id": hive_id}).scalar()
+                for hive_id in ids
+            ]
+
+    setup_query_profiler(app)
+    return TestClient(app)
+
+
+def test_statement_shape_collapses_parameters():
+    assert statement_shape("SELECT *\n  FROM hives WHERE id = $1") == "SELECT * FROM hives WHERE id = ?"
+    assert statement_shape("SELECT * FROM hives WHERE id IN ($1, $2, $3)") == "SELECT * FROM hives WHERE id IN (?)"
+    assert statement_shape("INSERT INTO hives VALUES (?, ?)") == "INSERT INTO hives VALUES (?)"
+
+
+def test_record_requests_counts_queries_per_request(client):
+    with record_requests() as profiles:
+        response = client.get("/hives/")
+    assert response.status_code == 200
+    assert len(response.json()) == 3
+    assert len(profiles) == 1
+    profile = profiles[0]
+    assert (profile.method, profile.route) == ("GET", "/hives/")
+    assert profile.count == 1
+    assert not profile.repeated()
+    assert 'desc="1 queries"' in response.headers["server-timing"]
+
+
+def test_record_requests_reports_repeated_statements(client):
+    with record_requests() as profiles:
+        client.get("/hives/names/")
+    profile = profiles[0]
+    assert profile.count == 4
+    assert profile.repeated(threshold=3) == {"SELECT name FROM hives WHERE id = ?": 3}
+
+
+def test_record_requests_stops_after_block(client):
+    with record_requests() as profiles:
+        client.get("/hives/")
+    response = client.get("/hives/")
+    assert len(profiles) == 1
+    assert "server-timing" not in response.headers
+
+
+def test_service_health_runs_no_queries():
+    from services.hive.main import app
+
+    with record_requests() as profiles:
+        response = TestClient(app).get("/health")
+    assert response.status_code == 200
+    assert profiles[0].route == "/health"
+    assert profiles[0].count == 0
+
+
+def test_profile_queries_outside_requests(engine):
+    with profile_queries() as profile:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT count(*) FROM hives")).scalar()
+    assert profile.count == 1
+    assert profile.duration > 0
@@ -0,0 +1,52 @@
+import pytest
+
+from shared.ratelimit import InMemoryTokenBucket, RateLimiter, retry_after_header
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_rejects(clock):
+    bucket = InMemoryTokenBucket(capacity=3, rate=1)
+    for _ in range(3):
+        assert await bucket.take("ip") == (True, 0.0)
+    allowed, retry_after = await bucket.take("ip")
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_bucket_refills_over_time(clock):
+    bucket = InMemoryTokenBucket(capacity=2, rate=0.5)
+    await bucket.take("ip")
+    await bucket.take("ip")
+    clock.advance(1)
+    allowed, retry_after = await bucket.take("ip")
+    assert not allowed
+    assert retry_after == pytest.approx(1.0)
+    clock.advance(1)
+    assert (await bucket.take("ip"))[0]
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_per_key(clock):
+    bucket = InMemoryTokenBucket(capacity=1, rate=1)
+    assert (await bucket.take("a"))[0]
+    assert not (await bucket.take("a"))[0]
+    assert (await bucket.take("b"))[0]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_stats(clock):
+    limiter = RateLimiter()
+    limiter.add_bucket("account", capacity=1, per_minute=6)
+    assert (await limiter.take("account", "alice"))[0]
+    allowed, retry_after = await limiter.take("account", "alice")
+    assert not allowed
+    assert retry_after == pytest.approx(10.0)
+    stats = limiter.stats()["account"]
+    assert stats["backend"] == "memory"
+    assert (stats["allowed"], stats["rejected"]) == (1, 1)
+
+
+def test_retry_after_header_rounds_up():
+    assert retry_after_header(0.1) == "1"
+    assert retry_after_header(2.01) == "3"
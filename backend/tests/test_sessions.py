@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from services.auth import models
+from services.auth.service import SessionService
+
+sessions = SessionService()
+
+
+async def session_state(db, refresh_token: str) -> models.UserSession:
+    session_id = int(refresh_token.partition(".")[0])
+    db.expire_all()
+    return await sessions.get(db, session_id)
+
+
+@pytest.mark.asyncio
+async def test_rotate_issues_new_token(db, user):
+    token = await sessions.create_session(db, user.id, user_agent="pytest")
+    rotated_user, new_token = await sessions.rotate(db, token)
+
+    assert rotated_user.id == user.id
+    assert new_token != token
+    assert new_token.partition(".")[0] == token.partition(".")[0]
+    # Новый токен продлевается дальше
+    assert await sessions.rotate(db, new_token) is not None
+
+
+@pytest.mark.asyncio
+async def test_replayed_token_revokes_session(db, user):
+    token = await sessions.create_session(db, user.id)
+    _, new_token = await sessions.rotate(db, token)
+
+    assert await sessions.rotate(db, token) is None
+    assert (await session_state(db, token)).revoked_at is not None
+    # Вместе с сессией отозван и токен, выданный при продлении
+    assert await sessions.rotate(db, new_token) is None
+
+
+@pytest.mark.asyncio
+async def test_wrong_secret_revokes_session(db, user):
+    token = await sessions.create_session(db, user.id)
+    session_id = token.partition(".")[0]
+    assert await sessions.rotate(db, f"{session_id}.guessed-secret") is None
+    assert await sessions.rotate(db, token) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token", ["", "no-dot", "1.", ".secret", "x.secret", "999.secret"])
+async def test_malformed_or_unknown_token(db, user, token):
+    await sessions.create_session(db, user.id)
+    assert await sessions.rotate(db, token) is None
+
+
+@pytest.mark.asyncio
+async def test_expired_session_is_not_rotated(db, user):
+    token = await sessions.create_session(db, user.id)
+    await db.execute(
+        update(models.UserSession).values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await db.commit()
+    assert await sessions.rotate(db, token) is None
+    assert await sessions.get_active_sessions(db, user.id) == []
+
+
+@pytest.mark.asyncio
+async def test_inactive_user_is_not_rotated(db, user):
+    token = await sessions.create_session(db, user.id)
+    await db.execute(update(models.User).values(is_active=False))
+    await db.commit()
+    assert await sessions.rotate(db, token) is None
+
+
+@pytest.mark.asyncio
+async def test_revoke_by_token(db, user):
+    token = await sessions.create_session(db, user.id)
+    other_token = await sessions.create_session(db, user.id)
+    session_id = token.partition(".")[0]
+
+    # Чужой секрет не отзывает сессию
+    assert not await sessions.revoke_by_token(db, f"{session_id}.guessed-secret")
+    assert not await sessions.revoke_by_token(db, "garbage")
+    assert await sessions.revoke_by_token(db, token)
+    await db.commit()
+    assert not await sessions.revoke_by_token(db, token)
+
+    assert await sessions.rotate(db, token) is None
+    assert [s.id for s in await sessions.get_active_sessions(db, user.id)] == [
+        int(other_token.partition(".")[0])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_revoke_all(db, user):
+    tokens = [await sessions.create_session(db, user.id) for _ in range(3)]
+    await sessions.revoke_all(db, user.id)
+    await db.commit()
+    assert await sessions.get_active_sessions(db, user.id) == []
+    for token in tokens:
+        assert await sessions.rotate(db, token) is None
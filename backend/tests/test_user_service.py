@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import select
+
+from services.auth import schemas
+from services.auth.service import SessionService, UserService
+from shared.auth import TokenRevocation
+
+user_service = UserService()
+
+
+async def create_user(db, username: str = "alice", superuser: bool = False):
+    user = await user_service.create_user(db, schemas.UserCreate(
+        username=username, email=f"{username}@example.com", password="secret-password",
+    ))
+    if superuser:
+        user = await user_service.update(db, user.id, is_superuser=True)
+    return user
+
+
+async def revoked_users(db):
+    return set((await db.execute(select(TokenRevocation.user_id))).scalars())
+
+
+def profile(user, **changes) -> schemas.UserUpdate:
+    data = {"username": user.username, "email": user.email, **changes}
+    return schemas.UserUpdate(**data)
+
+
+@pytest.mark.asyncio
+async def test_update_missing_user_returns_none(db):
+    update = schemas.UserUpdate(username="ghost", email="ghost@example.com", is_active=False)
+    assert await user_service.update_user(db, 999, update) is None
+    assert await revoked_users(db) == set()
+
+
+@pytest.mark.asyncio
+async def test_deactivation_revokes_tokens_and_sessions(db):
+    user = await create_user(db)
+    refresh_token = await SessionService().create_session(db, user.id)
+
+    updated = await user_service.update_user(db, user.id, profile(user, is_active=False))
+
+    assert updated.is_active is False
+    assert await revoked_users(db) == {user.id}
+    assert await SessionService().rotate(db, refresh_token) is None
+
+
+@pytest.mark.asyncio
+async def test_profile_update_keeps_tokens(db):
+    user = await create_user(db)
+    await user_service.update_user(db, user.id, schemas.UserUpdate(username="alice", email="new@example.com"))
+    assert await revoked_users(db) == set()
+
+
+@pytest.mark.asyncio
+async def test_superuser_demotion_revokes_tokens_and_sessions(db):
+    admin = await create_user(db, "admin", superuser=True)
+    refresh_token = await SessionService().create_session(db, admin.id)
+
+    updated = await user_service.update_user(db, admin.id, profile(admin, is_superuser=False))
+
+    assert updated.is_superuser is False
+    assert await revoked_users(db) == {admin.id}
+    assert await SessionService().rotate(db, refresh_token) is None
+
+
+@pytest.mark.asyncio
+async def test_unchanged_superuser_flag_keeps_tokens(db):
+    admin = await create_user(db, "admin", superuser=True)
+    await user_service.update_user(db, admin.id, profile(admin, is_superuser=True))
+    assert await revoked_users(db) == set()
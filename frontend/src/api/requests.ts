@@ -1,5 +1,5 @@
 // frontend/src/api/requests.ts
-import axios, { AxiosError } from 'axios';
+import axios, { AxiosError, InternalAxiosRequestConfig } from 'axios';
 
 // Base configuration for all services
 const baseConfig = {
@@ -42,9 +42,47 @@ const responseInterceptor = (response: any) => {
   return response;
 };
 
+// Один общий запрос на продление, даже если 401 пришёл сразу нескольким запросам
+let refreshPromise: Promise<string | null> | null = null;
+
+const refreshAccessToken = async (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return null;
+  }
+  try {
+    const response = await axios.post<{ access_token: string; refresh_token: string }>(
+      `${authApi.defaults.baseURL}/token/refresh`,
+      { refresh_token: refreshToken }
+    );
+    const { access_token, refresh_token } = response.data;
+    localStorage.setItem('token', access_token);
+    localStorage.setItem('refreshToken', refresh_token);
+    setAuthToken(access_token);
+    return access_token;
+  } catch {
+    return null;
+  }
+};
+
 const errorInterceptor = async (error: AxiosError) => {
+  const config = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
   if (error.response?.status === 401) {
+    // Сначала пробуем продлить сессию refresh-токеном и повторить запрос
+    if (config && !config._retried && !config.url?.includes('/token')) {
+      config._retried = true;
+      refreshPromise = refreshPromise ?? refreshAccessToken().finally(() => {
+        refreshPromise = null;
+      });
+      const accessToken = await refreshPromise;
+      if (accessToken) {
+        config.headers['Authorization'] = `Bearer ${accessToken}`;
+        return axios.request(config);
+      }
+    }
+
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     if (!window.location.pathname.includes('/login')) {
       window.location.href = '/login';
     }
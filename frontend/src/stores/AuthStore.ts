@@ -59,20 +59,23 @@ export class AuthStore {
       const formData = createAuthFormData(email, password);
       console.log('Sending login request to /token...');
       
-      const response = await authApi.post<{ access_token: string, token_type: string }>('/token', formData, {
+      const response = await authApi.post<{ access_token: string, token_type: string, refresh_token?: string }>('/token', formData, {
         headers: {
           'Content-Type': 'application/x-www-form-urlencoded'
         }
       });
 
       console.log('Login response:', response.data);
-      const { access_token } = response.data;
+      const { access_token, refresh_token } = response.data;
       
       if (!access_token) {
         throw new Error('No access token received');
       }
 
       localStorage.setItem('token', access_token);
+      if (refresh_token) {
+        localStorage.setItem('refreshToken', refresh_token);
+      }
       setAuthToken(access_token);
 
       const userSuccess = await this.checkAuth();
@@ -147,7 +150,13 @@ export class AuthStore {
   @action
   logout = () => {
     console.log('Logging out...');
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      // Отзываем сессию на сервере, результат не ждём
+      authApi.post('/logout', { refresh_token: refreshToken }).catch(() => undefined);
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     setAuthToken(null);
     this.setUser(null);
     this.isAuthenticated = false;
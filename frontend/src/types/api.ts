@@ -10,6 +10,8 @@ export interface User {
 export interface LoginResponse {
   access_token: string;
   token_type: string;
+  refresh_token?: string;
+  expires_in?: number;
 }
 
 export interface ApiError {